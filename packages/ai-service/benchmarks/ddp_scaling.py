@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Scaling efficiency of data-parallel training (DDP over gloo) on this host.
+
+For each process count, runs a fixed number of training steps on
+synthetic batches with the same per-process batch size (the way
+train_custom_model.py --nproc scales) and reports samples/sec over all
+processes and the efficiency relative to one process:
+
+    efficiency(n) = samples_per_sec(n) / (n * samples_per_sec(1))
+
+Processes split the host's CPUs evenly, as they do in training.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.ddp_scaling --max_procs 8 --model custom_cnn --output ddp_scaling.json
+"""
+
+import argparse
+import json
+import os
+import time
+
+import torch
+import torch.multiprocessing as mp
+import torch.nn as nn
+from torch.nn.parallel import DistributedDataParallel
+
+from src import distributed, serving
+from src.custom_model_handler import CustomCNN
+from src.stub_model_handler import StubCNN
+from src.training_mode import TrainingMode
+
+MODELS = {'stub': StubCNN, 'custom_cnn': CustomCNN}
+
+
+def process_counts(max_procs):
+    """1, 2, 4, ... up to max_procs (always included)."""
+    counts = []
+    n = 1
+    while n < max_procs:
+        counts.append(n)
+        n *= 2
+    counts.append(max_procs)
+    return counts
+
+
+def _worker(rank, world_size, port, model_name, batch_size, image_size, steps, warmup, results):
+    os.environ.update(RANK=str(rank), WORLD_SIZE=str(world_size), LOCAL_RANK=str(rank),
+                      LOCAL_WORLD_SIZE=str(world_size), MASTER_ADDR='127.0.0.1', MASTER_PORT=str(port))
+    if world_size > 1:
+        distributed.init_from_env()
+    TrainingMode(threads=distributed.threads_per_process()).configure_threads()
+
+    # Same initial weights everywhere (DDP also broadcasts them from rank 0)
+    torch.manual_seed(0)
+    model = MODELS[model_name](num_classes=2)
+    runner = DistributedDataParallel(model) if world_size > 1 else model
+    optimizer = torch.optim.Adam(model.parameters(), lr=0.001)
+    criterion = nn.CrossEntropyLoss()
+    generator = torch.Generator().manual_seed(rank)
+    data = torch.randn(batch_size, 3, image_size, image_size, generator=generator)
+    target = torch.randint(0, 2, (batch_size,), generator=generator)
+
+    def step():
+        optimizer.zero_grad()
+        criterion(runner(data), target).backward()
+        optimizer.step()
+
+    for _ in range(warmup):
+        step()
+    distributed.barrier()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    distributed.barrier()
+    elapsed = time.perf_counter() - start
+
+    # Replicas must hold identical weights after synchronized steps
+    checksum = sum(float(p.detach().double().sum()) for p in model.parameters())
+    checksums = [None] * world_size
+    if world_size > 1:
+        torch.distributed.all_gather_object(checksums, checksum)
+    else:
+        checksums = [checksum]
+    if rank == 0:
+        results.put({
+            'processes': world_size,
+            'threads_per_process': torch.get_num_threads(),
+            'samples_per_sec': steps * batch_size * world_size / elapsed,
+            'replicas_in_sync': max(checksums) - min(checksums) <= 1e-6 * max(1.0, abs(checksum)),
+        })
+    distributed.cleanup()
+
+
+def measure(world_size, model='stub', batch_size=16, image_size=64, steps=10, warmup=2):
+    context = mp.get_context('spawn')
+    results = context.SimpleQueue()
+    mp.start_processes(_worker, nprocs=world_size, start_method='spawn',
+                       args=(world_size, distributed.free_port(), model, batch_size, image_size,
+                             steps, warmup, results))
+    return results.get()
+
+
+def run(counts, **kwargs):
+    """Measurements for each process count, with efficiency relative to the first (one process)."""
+    rows = [measure(n, **kwargs) for n in counts]
+    single = rows[0]['samples_per_sec'] / rows[0]['processes']
+    for row in rows:
+        row['efficiency'] = row['samples_per_sec'] / (row['processes'] * single)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure DDP (gloo) training scaling on this host')
+    parser.add_argument('--max_procs', type=int, default=min(8, len(serving.available_cpus())),
+                        help='Largest number of processes to try')
+    parser.add_argument('--model', choices=sorted(MODELS), default='custom_cnn',
+                        help='Architecture to train')
+    parser.add_argument('--batch_size', type=int, default=16,
+                        help='Batch size per process')
+    parser.add_argument('--image_size', type=int, default=224,
+                        help='Side of the synthetic square images')
+    parser.add_argument('--steps', type=int, default=10,
+                        help='Timed training steps per run')
+    parser.add_argument('--output', type=str, default=None,
+                        help='Where to write the results JSON')
+    args = parser.parse_args()
+
+    rows = run(process_counts(args.max_procs), model=args.model, batch_size=args.batch_size,
+               image_size=args.image_size, steps=args.steps)
+
+    print(f'{"procs":>5} {"threads":>7} {"samples/s":>10} {"efficiency":>10}')
+    for row in rows:
+        print(f'{row["processes"]:>5} {row["threads_per_process"]:>7} '
+              f'{row["samples_per_sec"]:>10.1f} {row["efficiency"]:>9.0%}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'cpus': len(serving.available_cpus()), 'model': args.model, 'batch_size': args.batch_size,
+                       'results': rows}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+"""
+Closed-loop load generator for the HTTP service.
+
+Starts the service under gunicorn with the stub model (or targets --url),
+then for each concurrency level runs that many clients that each send a
+request, wait for the response and immediately send the next one. Reports
+throughput, p50/p95/p99 latency and error/429 rates per level, and the
+saturation knee: the level after which more clients stop adding throughput.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.load_test --workers 2 --concurrency 1,2,4,8,16 --mix mixed
+    python -m benchmarks.load_test --url http://localhost:5000 --mix frames --duration 30
+"""
+
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+import requests
+
+from benchmarks.synthetic import RESOLUTIONS, make_jpeg, write_video
+
+# Request mixes: (weight, kind, resolution)
+MIXES = {
+    'frames-small': [(1.0, 'frame', '360p')],
+    'frames': [(0.5, 'frame', '360p'), (0.5, 'frame', '1080p')],
+    'videos': [(1.0, 'video', '360p')],
+    'mixed': [(0.6, 'frame', '360p'), (0.2, 'frame', '1080p'), (0.2, 'video', '360p')],
+}
+
+VIDEO_SECONDS = 2
+IMAGES_PER_RESOLUTION = 8
+STARTUP_TIMEOUT = 120
+
+
+class Payloads:
+    """Pre-generated request bodies so clients spend no time producing media."""
+
+    def __init__(self, mix, data_dir):
+        self.choices = MIXES[mix]
+        self.weights = [weight for weight, _, _ in self.choices]
+        self.images = {}
+        self.videos = {}
+        for _, kind, resolution in self.choices:
+            width, height = RESOLUTIONS[resolution]
+            if kind == 'frame' and resolution not in self.images:
+                self.images[resolution] = [make_jpeg(width, height, i) for i in range(IMAGES_PER_RESOLUTION)]
+            elif kind == 'video' and resolution not in self.videos:
+                path = os.path.join(data_dir, f'load_{resolution}_{VIDEO_SECONDS}s.mp4')
+                if not os.path.exists(path):
+                    write_video(path, width, height, VIDEO_SECONDS, gop=12)
+                with open(path, 'rb') as f:
+                    self.videos[resolution] = f.read()
+
+    def pick(self, rng):
+        _, kind, resolution = rng.choices(self.choices, weights=self.weights)[0]
+        if kind == 'frame':
+            body = rng.choice(self.images[resolution])
+            return kind, '/inference/analyze-frame', {'image': ('frame.jpg', body, 'image/jpeg')}
+        return kind, '/inference/analyze-video', {'video': ('clip.mp4', self.videos[resolution], 'video/mp4')}
+
+
+def run_client(client_index, base_url, payloads, start_at, stop_at, timeout, records):
+    rng = random.Random(client_index)
+    session = requests.Session()
+    headers = {'X-Client-Id': f'load-{client_index}'}
+    while time.monotonic() < stop_at:
+        kind, path, files = payloads.pick(rng)
+        started = time.monotonic()
+        try:
+            response = session.post(base_url + path, files=files, headers=headers, timeout=timeout)
+            status = response.status_code
+            frames = response.json().get('framesAnalyzed', 1) if status == 200 and kind == 'video' else 1
+        except requests.RequestException:
+            status, frames = 'error', 0
+        finished = time.monotonic()
+        # Requests that started during warmup are sent but not counted
+        if started >= start_at:
+            records.append((kind, status, finished - started, frames, finished))
+
+
+def run_level(base_url, payloads, concurrency, duration, warmup, timeout):
+    records = []
+    now = time.monotonic()
+    start_at, stop_at = now + warmup, now + warmup + duration
+    clients = [
+        threading.Thread(target=run_client, daemon=True,
+                         args=(i, base_url, payloads, start_at, stop_at, timeout, records))
+        for i in range(concurrency)
+    ]
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    # Measure over the window in which counted requests actually completed
+    window = max(max((r[4] for r in records), default=stop_at) - start_at, 1e-9)
+    return summarize(concurrency, records, window)
+
+
+def summarize(concurrency, records, window):
+    total = len(records)
+    ok = [r for r in records if r[1] == 200]
+    latencies_ms = np.array([r[2] * 1000 for r in ok], dtype=np.float64)
+
+    def pct(q):
+        return round(float(np.percentile(latencies_ms, q)), 1) if latencies_ms.size else None
+
+    by_kind = {}
+    for kind in sorted({r[0] for r in records}):
+        kind_ok = [r[2] * 1000 for r in ok if r[0] == kind]
+        by_kind[kind] = {
+            'requests': sum(1 for r in records if r[0] == kind),
+            'p95_ms': round(float(np.percentile(kind_ok, 95)), 1) if kind_ok else None,
+        }
+
+    return {
+        'concurrency': concurrency,
+        'requests': total,
+        'throughput_rps': round(len(ok) / window, 2),
+        'frames_per_sec': round(sum(r[3] for r in ok) / window, 2),
+        'p50_ms': pct(50),
+        'p95_ms': pct(95),
+        'p99_ms': pct(99),
+        'rejected_429_rate': round(sum(1 for r in records if r[1] == 429) / total, 4) if total else 0.0,
+        'error_rate': round(sum(1 for r in records if r[1] not in (200, 429)) / total, 4) if total else 0.0,
+        'by_kind': by_kind,
+    }
+
+
+def find_knee(levels, min_gain=0.05, max_error_rate=0.01):
+    """
+    Returns the concurrency at which the service saturates: the last level
+    before throughput grows by less than min_gain or errors/429s exceed
+    max_error_rate. None if throughput was still growing at the last level.
+    """
+    levels = sorted(levels, key=lambda level: level['concurrency'])
+    for previous, current in zip(levels, levels[1:]):
+        failing = current['error_rate'] + current['rejected_429_rate'] > max_error_rate
+        flat = current['throughput_rps'] < previous['throughput_rps'] * (1 + min_gain)
+        if failing or flat:
+            return previous['concurrency']
+    return None
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers, threads, port, log_path):
+    """Starts gunicorn with the stub model and waits until /health answers."""
+    env = dict(os.environ, MODEL_TYPE='stub', PORT=str(port),
+               SERVING_WORKERS=str(workers), SERVING_THREADS=str(threads))
+    log = open(log_path, 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', '--bind', f'127.0.0.1:{port}', 'wsgi:app'],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited during startup, see {log_path}')
+        try:
+            if requests.get(base_url + '/health', timeout=1).ok:
+                return process, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError(f'Server did not become healthy within {STARTUP_TIMEOUT}s, see {log_path}')
+
+
+def print_levels(levels):
+    print(f"\n{'clients':>8}{'req/s':>9}{'frames/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'429':>8}{'errors':>8}")
+    print('-' * 70)
+    for level in levels:
+        print(f"{level['concurrency']:>8}{level['throughput_rps']:>9.2f}{level['frames_per_sec']:>10.2f}"
+              f"{level['p50_ms'] or 0:>9.1f}{level['p95_ms'] or 0:>9.1f}{level['p99_ms'] or 0:>9.1f}"
+              f"{level['rejected_429_rate']:>8.1%}{level['error_rate']:>8.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Closed-loop load test with a concurrency sweep')
+    parser.add_argument('--url', type=str, default=None,
+                        help='Target an already running service instead of starting one')
+    parser.add_argument('--workers', type=int, default=2, help='gunicorn workers for the local server')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--concurrency', type=str, default='1,2,4,8,16',
+                        help='Comma-separated concurrency levels')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='Request mix')
+    parser.add_argument('--duration', type=float, default=15, help='Measured seconds per level')
+    parser.add_argument('--warmup', type=float, default=3, help='Unmeasured seconds before each level')
+    parser.add_argument('--timeout', type=float, default=60, help='Per-request timeout in seconds')
+    parser.add_argument('--output', type=str, default='load_results.json',
+                        help='Where to write the results JSON')
+    args = parser.parse_args()
+
+    levels_to_run = [int(c) for c in args.concurrency.split(',') if c.strip()]
+    data_dir = tempfile.mkdtemp(prefix='ai-load-')
+    print(f'Preparing {args.mix} payloads...')
+    payloads = Payloads(args.mix, data_dir)
+
+    process = None
+    base_url = args.url
+    if base_url is None:
+        log_path = os.path.join(data_dir, 'server.log')
+        print(f'Starting server: {args.workers} workers x {args.threads} threads (log: {log_path})')
+        process, base_url = start_server(args.workers, args.threads, free_port(), log_path)
+
+    levels = []
+    try:
+        for concurrency in levels_to_run:
+            print(f'Running {concurrency} clients for {args.duration:g}s...')
+            levels.append(run_level(base_url, payloads, concurrency, args.duration, args.warmup, args.timeout))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    knee = find_knee(levels)
+    print_levels(levels)
+    if knee is None:
+        print('\nNo saturation knee found; throughput was still growing at the highest level.')
+    else:
+        print(f'\nSaturation knee: {knee} concurrent clients')
+
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'url': args.url,
+            'workers': None if args.url else args.workers,
+            'threads': None if args.url else args.threads,
+            'mix': args.mix,
+            'duration': args.duration,
+            'cpu_count': os.cpu_count(),
+        },
+        'levels': levels,
+        'knee_concurrency': knee,
+    }
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f'Results saved: {args.output}')
+
+
+if __name__ == '__main__':
+    main()
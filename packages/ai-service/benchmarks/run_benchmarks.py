@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the inference service.
+
+Runs predict, analyze_frame and analyze_video in-process against the stub
+model (no Hugging Face download) on deterministic synthetic media, and
+reports frames/sec, latency and per-stage percentiles and peak RSS as JSON.
+
+Usage (from packages/ai-service):
+    python -m benchmarks.run_benchmarks --output bench_results.json
+    python -m benchmarks.run_benchmarks --profile full --baseline benchmarks/baseline.json
+    python -m benchmarks.run_benchmarks --compare bench_results.json --baseline benchmarks/baseline.json
+
+With --baseline, any metric that regressed by more than --threshold
+(default 10%) is listed and the exit code is 1.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+import numpy as np
+import torch
+
+from benchmarks.synthetic import build_dataset
+from src import metrics
+from src.service import InferenceService
+from src.stub_model_handler import StubModelHandler
+from src.utils import load_image_from_bytes
+
+CLIENT_ID = 'benchmark'
+WARMUP_ITERATIONS = 2
+
+# metric path -> True if higher is better
+COMPARED_METRICS = {
+    ('frames_per_sec',): True,
+    ('latency_ms', 'p95'): False,
+    ('peak_rss_mb',): False,
+}
+
+
+class PeakRSS:
+    """Samples this process' RSS in the background and keeps the peak."""
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.peak = metrics.resident_memory_bytes()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, metrics.resident_memory_bytes())
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, metrics.resident_memory_bytes())
+
+
+def percentiles(values_ms):
+    values = np.asarray(values_ms, dtype=np.float64)
+    if values.size == 0:
+        return {}
+    return {
+        'mean': round(float(values.mean()), 3),
+        'p50': round(float(np.percentile(values, 50)), 3),
+        'p90': round(float(np.percentile(values, 90)), 3),
+        'p95': round(float(np.percentile(values, 95)), 3),
+        'p99': round(float(np.percentile(values, 99)), 3),
+    }
+
+
+def measure(fn, items, frames_of=lambda result: 1):
+    """Calls fn(item) for every item and summarises latency, stage timings, throughput and RSS."""
+    for item in items[:WARMUP_ITERATIONS]:
+        fn(item)
+
+    latencies = []
+    stage_samples = defaultdict(list)
+    frames = 0
+    with PeakRSS() as rss:
+        started = time.perf_counter()
+        for item in items:
+            with metrics.collect_stages() as samples:
+                call_start = time.perf_counter()
+                result = fn(item)
+                latencies.append((time.perf_counter() - call_start) * 1000)
+            frames += frames_of(result)
+            for name, seconds in samples:
+                stage_samples[name].append(seconds * 1000)
+        elapsed = time.perf_counter() - started
+
+    return {
+        'items': len(items),
+        'frames': frames,
+        'seconds': round(elapsed, 4),
+        'frames_per_sec': round(frames / elapsed, 3) if elapsed > 0 else 0.0,
+        'latency_ms': percentiles(latencies),
+        'stages_ms': {name: dict(percentiles(values), count=len(values))
+                      for name, values in sorted(stage_samples.items())},
+        'peak_rss_mb': round(rss.peak / (1024 * 1024), 1),
+    }
+
+
+def run_suite(data, repeats=3):
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    handler = service.model_handler
+    results = {}
+
+    for image_set in data['images']:
+        name = image_set['name']
+        jpegs = image_set['jpegs'] * repeats
+        pil_images = [load_image_from_bytes(jpeg) for jpeg in jpegs]
+
+        with metrics.request_scope('benchmark_predict', 'stub'):
+            results[f'predict[{name}]'] = measure(handler.predict, pil_images)
+        with metrics.request_scope('benchmark_analyze_frame', 'stub'):
+            results[f'analyze_frame[{name}]'] = measure(
+                lambda jpeg: service.analyze_frame(CLIENT_ID, jpeg), jpegs)
+
+    for video in data['videos']:
+        with metrics.request_scope('benchmark_analyze_video', 'stub'):
+            results[f"analyze_video[{video['name']}]"] = measure(
+                lambda path: service.analyze_video(CLIENT_ID, path),
+                [video['path']] * repeats,
+                frames_of=lambda result: result['framesAnalyzed'])
+
+    if service.executor is not None:
+        service.executor.shutdown()
+    return results
+
+
+def _get(entry, path):
+    for key in path:
+        entry = entry.get(key, {}) if isinstance(entry, dict) else {}
+    return entry if isinstance(entry, (int, float)) else None
+
+
+def compare(baseline, current, threshold=0.10):
+    """Returns a list of regressions of current against baseline beyond threshold (a fraction)."""
+    regressions = []
+    for name, entry in current['benchmarks'].items():
+        base_entry = baseline.get('benchmarks', {}).get(name)
+        if base_entry is None:
+            continue
+        for path, higher_is_better in COMPARED_METRICS.items():
+            old, new = _get(base_entry, path), _get(entry, path)
+            if not old or new is None:
+                continue
+            change = (new - old) / old
+            worse = -change if higher_is_better else change
+            if worse > threshold:
+                regressions.append({
+                    'benchmark': name, 'metric': '.'.join(path),
+                    'baseline': old, 'current': new, 'change_pct': round(change * 100, 1)
+                })
+    return regressions
+
+
+def print_summary(results):
+    print(f"\n{'benchmark':<36}{'frames/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'peak MB':>10}")
+    print('-' * 76)
+    for name, entry in results['benchmarks'].items():
+        latency = entry['latency_ms']
+        print(f"{name:<36}{entry['frames_per_sec']:>10.2f}{latency.get('p50', 0):>10.2f}"
+              f"{latency.get('p95', 0):>10.2f}{entry['peak_rss_mb']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the inference service with a stub model')
+    parser.add_argument('--profile', choices=['quick', 'full'], default='quick',
+                        help='Size of the synthetic workload')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='Times each image set / video is processed')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='torch intra-op threads (0 keeps the default)')
+    parser.add_argument('--data_dir', type=str, default=None,
+                        help='Directory to cache generated media (default: a temp dir)')
+    parser.add_argument('--output', type=str, default='bench_results.json',
+                        help='Where to write the results JSON')
+    parser.add_argument('--baseline', type=str, default=None,
+                        help='Baseline results JSON to compare against')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='Compare an existing results JSON against --baseline without running')
+    parser.add_argument('--threshold', type=float, default=0.10,
+                        help='Allowed relative regression before failing (0.10 = 10%%)')
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare) as f:
+            results = json.load(f)
+    else:
+        if args.threads:
+            torch.set_num_threads(args.threads)
+        data_dir = args.data_dir or tempfile.mkdtemp(prefix='ai-bench-')
+        print(f'Generating {args.profile} workload in {data_dir}...')
+        data = build_dataset(data_dir, args.profile)
+
+        results = {
+            'meta': {
+                'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+                'profile': args.profile,
+                'repeats': args.repeats,
+                'python': platform.python_version(),
+                'torch': torch.__version__,
+                'torch_threads': torch.get_num_threads(),
+                'cpu_count': os.cpu_count(),
+                'platform': platform.platform(),
+            },
+            'benchmarks': run_suite(data, args.repeats),
+        }
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'Results saved: {args.output}')
+
+    print_summary(results)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f'\nRegressions beyond {args.threshold:.0%}:')
+            for r in regressions:
+                print(f"  {r['benchmark']} {r['metric']}: {r['baseline']} -> {r['current']} ({r['change_pct']:+.1f}%)")
+            sys.exit(1)
+        print(f'\nNo regressions beyond {args.threshold:.0%} against {args.baseline}')
+
+
+if __name__ == '__main__':
+    main()
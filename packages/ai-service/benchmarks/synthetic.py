@@ -0,0 +1,108 @@
+"""
+Deterministic synthetic media for benchmarks and load tests.
+
+Frames contain a moving gradient, moving blocks and noise so that JPEG and
+video codecs do realistic work (a flat colour clip compresses to almost nothing).
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+# (name, width, height)
+RESOLUTIONS = {
+    '360p': (640, 360),
+    '720p': (1280, 720),
+    '1080p': (1920, 1080),
+}
+
+PROFILES = {
+    # Small enough for CI and quick before/after checks
+    'quick': {
+        'videos': [('360p', 2, 12), ('720p', 2, 12), ('720p', 2, 120)],
+        'images': [('360p', 8), ('1080p', 4)],
+    },
+    # Covers resolutions, lengths and GOP sizes (GOP matters because analyze_video seeks)
+    'full': {
+        'videos': [
+            ('360p', 2, 12), ('360p', 10, 250),
+            ('720p', 2, 12), ('720p', 10, 12), ('720p', 10, 250),
+            ('1080p', 10, 12), ('1080p', 10, 250),
+        ],
+        'images': [('360p', 16), ('720p', 16), ('1080p', 16)],
+    },
+}
+
+
+def make_frame(width, height, index, rng):
+    """Returns one BGR frame; consecutive indices move smoothly like real footage."""
+    x = np.linspace(0, 255, width, dtype=np.float32)
+    y = np.linspace(0, 255, height, dtype=np.float32)[:, None]
+    shift = index * 4.0
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = (x + shift) % 256
+    frame[..., 1] = (y + shift / 2) % 256
+    frame[..., 2] = ((x[None, :] + y) / 2 + shift) % 256
+
+    block = max(8, min(width, height) // 6)
+    for k in range(3):
+        bx = int((index * (5 + 3 * k) + k * width // 3) % max(1, width - block))
+        by = int((index * (2 + k) + k * height // 4) % max(1, height - block))
+        frame[by:by + block, bx:bx + block] = (60 * k, 255 - 60 * k, 128)
+
+    frame += rng.normal(0, 6, size=frame.shape).astype(np.float32)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def write_video(path, width, height, seconds, gop, fps=30, seed=0):
+    """Writes an MP4 (mp4v) clip; gop sets the keyframe interval where the OpenCV build supports it."""
+    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
+    params = []
+    if gop and hasattr(cv2, 'VIDEOWRITER_PROP_KEY_INTERVAL'):
+        params = [cv2.VIDEOWRITER_PROP_KEY_INTERVAL, int(gop)]
+    out = cv2.VideoWriter(path, cv2.CAP_FFMPEG, fourcc, fps, (width, height), params)
+    if not out.isOpened():
+        out = cv2.VideoWriter(path, fourcc, fps, (width, height))
+    rng = np.random.default_rng(seed)
+    for index in range(int(seconds * fps)):
+        out.write(make_frame(width, height, index, rng))
+    out.release()
+    return path
+
+
+def make_jpeg(width, height, index, seed=0, quality=90):
+    rng = np.random.default_rng(seed + index)
+    ok, encoded = cv2.imencode('.jpg', make_frame(width, height, index * 7, rng),
+                               [cv2.IMWRITE_JPEG_QUALITY, quality])
+    if not ok:
+        raise RuntimeError('JPEG encoding failed')
+    return encoded.tobytes()
+
+
+def build_dataset(data_dir, profile='quick', seed=0):
+    """
+    Generates (or reuses) the media for a profile. Returns
+    {'videos': [{'name', 'path', 'width', 'height', 'seconds', 'gop'}],
+     'images': [{'name', 'width', 'height', 'jpegs': [bytes, ...]}]}
+    """
+    spec = PROFILES[profile]
+    os.makedirs(data_dir, exist_ok=True)
+
+    videos = []
+    for resolution, seconds, gop in spec['videos']:
+        width, height = RESOLUTIONS[resolution]
+        name = f'{resolution}_{seconds}s_gop{gop}'
+        path = os.path.join(data_dir, f'{name}_seed{seed}.mp4')
+        if not os.path.exists(path):
+            write_video(path, width, height, seconds, gop, seed=seed)
+        videos.append({'name': name, 'path': path, 'width': width, 'height': height,
+                       'seconds': seconds, 'gop': gop})
+
+    images = []
+    for resolution, count in spec['images']:
+        width, height = RESOLUTIONS[resolution]
+        jpegs = [make_jpeg(width, height, i, seed=seed) for i in range(count)]
+        images.append({'name': resolution, 'width': width, 'height': height, 'jpegs': jpegs})
+
+    return {'videos': videos, 'images': images}
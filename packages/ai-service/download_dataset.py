@@ -9,19 +9,36 @@ Usage:
     python download_dataset.py --dataset faceforensics --quality raw
     python download_dataset.py --dataset kaggle_140k
     python download_dataset.py --dataset custom --path /path/to/your/images
+
+    # Re-split an existing dataset with new ratios or seed (rewrites manifest.csv and the links)
+    python download_dataset.py --dataset resplit --train_ratio 0.8 --val_ratio 0.1 --seed 1
+
+    # Frames from videos in /path/to/videos/{real,fake}/ (sampled like the video API; resumable)
+    python download_dataset.py --dataset videos --custom_path /path/to/videos --frames_per_video 10 --face_crop
+
+    # Check an existing dataset: undecodable images, duplicates, train/val/test leakage
+    python download_dataset.py --dataset validate
+
+Splits are recorded in dataset/manifest.csv (path, label, split, content hash).
+The dataset/{train,val,test}/{real,fake} folders hold hard links (--layout
+symlink for symlinks, none for no folders), so images are never copied.
+Train from the manifest directly with:
+    python train_custom_model.py --manifest ./dataset/manifest.csv
 """
 
 import os
 import argparse
 import requests
 import zipfile
-import shutil
 from pathlib import Path
 import json
 from tqdm import tqdm
 import cv2
-import numpy as np
 from PIL import Image
+from src.dataset_validation import validate
+from src.frame_extraction import DEFAULT_FRAMES_PER_VIDEO, STATE_FILE, extract_dataset
+from src.manifest import (MANIFEST_FILE, assign_splits, build_manifest, list_images, materialize,
+                          read_manifest, split_counts, write_manifest)
 
 def create_directory_structure(base_path):
     """Create the required directory structure for training"""
@@ -55,7 +72,7 @@ def download_file(url, filename):
             size = file.write(chunk)
             progress_bar.update(size)
 
-def download_kaggle_140k_dataset(base_path):
+def download_kaggle_140k_dataset(base_path, split_options):
     """
     Download the 140k Real and Fake Faces dataset from Kaggle
     
@@ -85,16 +102,16 @@ def download_kaggle_140k_dataset(base_path):
     try:
         os.system("kaggle datasets download -d ciplab/real-and-fake-face-detection")
         
-        # Extract and organize
+        # Extract and organize (the extracted images stay: the manifest and the split folders link to them)
+        source_path = os.path.join(base_path, "dataset_source")
         with zipfile.ZipFile("real-and-fake-face-detection.zip", 'r') as zip_ref:
-            zip_ref.extractall("temp_dataset")
+            zip_ref.extractall(source_path)
         
         # Organize into train/val/test splits
-        organize_kaggle_dataset(base_path, "temp_dataset")
+        organize_dataset(base_path, source_path, **split_options)
         
         # Cleanup
         os.remove("real-and-fake-face-detection.zip")
-        shutil.rmtree("temp_dataset")
         
         print("✅ Kaggle dataset downloaded and organized!")
         return True
@@ -108,15 +125,15 @@ def download_kaggle_140k_dataset(base_path):
         print("4. Run: python download_dataset.py --dataset custom --path /path/to/extracted/folder")
         return False
 
-def organize_kaggle_dataset(base_path, temp_path):
-    """Organize the Kaggle dataset into train/val/test splits"""
+def organize_dataset(base_path, source_path, **split_options):
+    """Find the real and fake image folders under source_path and split them into train/val/test"""
     print("📁 Organizing dataset into train/val/test splits...")
     
     # Find real and fake directories
     real_dir = None
     fake_dir = None
     
-    for root, dirs, files in os.walk(temp_path):
+    for root, dirs, files in os.walk(source_path):
         for dir_name in dirs:
             if 'real' in dir_name.lower():
                 real_dir = os.path.join(root, dir_name)
@@ -127,49 +144,81 @@ def organize_kaggle_dataset(base_path, temp_path):
         print("❌ Could not find real and fake directories")
         return False
     
-    # Split ratios
-    train_ratio = 0.7
-    val_ratio = 0.2
-    test_ratio = 0.1
+    split_dataset({'real': list_images(real_dir), 'fake': list_images(fake_dir)}, base_path, **split_options)
     
-    # Process real images
-    real_images = [f for f in os.listdir(real_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    split_and_copy_images(real_images, real_dir, base_path, 'real', train_ratio, val_ratio, test_ratio)
+    print("✅ Dataset organized successfully!")
+    return True
+
+def split_dataset(images_by_label, base_path, train_ratio=0.7, val_ratio=0.2, seed=0, layout='hardlink',
+                  workers=None):
+    """
+    Split images into train/val/test (the rest after train and val), record the
+    split in dataset/manifest.csv and link the images into the split folders
+    """
+    total = sum(len(images) for images in images_by_label.values())
+    print(f"🔑 Hashing {total} images...")
+    rows = build_manifest(images_by_label, train_ratio, val_ratio, seed, workers)
+    return save_split(rows, base_path, layout, workers)
+
+def resplit_dataset(base_path, train_ratio=0.7, val_ratio=0.2, seed=0, layout='hardlink', workers=None):
+    """Assign new splits to the images of an existing manifest (no hashing, no copying)"""
+    manifest_path = os.path.join(base_path, 'dataset', MANIFEST_FILE)
+    if not os.path.exists(manifest_path):
+        print(f"❌ No manifest found at {manifest_path}")
+        return False
+    if os.path.exists(os.path.join(base_path, 'dataset', STATE_FILE)):
+        # Frames must be split by video, not one by one
+        print("❌ This dataset was extracted from videos: re-run --dataset videos with the new ratios or seed")
+        return False
+    rows = assign_splits(read_manifest(manifest_path), train_ratio, val_ratio, seed)
+    return save_split(rows, base_path, layout, workers)
+
+def save_split(rows, base_path, layout='hardlink', workers=None):
+    """Write the manifest and (unless layout is 'none') the linked split folders"""
+    dataset_path = os.path.join(base_path, 'dataset')
+    os.makedirs(dataset_path, exist_ok=True)
+    manifest_path = write_manifest(rows, os.path.join(dataset_path, MANIFEST_FILE))
+    print(f"✓ Manifest saved: {manifest_path}")
     
-    # Process fake images
-    fake_images = [f for f in os.listdir(fake_dir) if f.lower().endswith(('.jpg', '.jpeg', '.png'))]
-    split_and_copy_images(fake_images, fake_dir, base_path, 'fake', train_ratio, val_ratio, test_ratio)
+    if layout != 'none':
+        linked = materialize(rows, dataset_path, link=layout, workers=workers or 16)
+        print(f"✓ Linked {linked} images into {dataset_path}/{{train,val,test}} ({layout}s)")
     
-    print("✅ Dataset organized successfully!")
+    for split, labels in split_counts(rows).items():
+        for label, count in labels.items():
+            print(f"✓ {count} {label} images in {split}")
     return True
 
-def split_and_copy_images(image_list, source_dir, base_path, label, train_ratio, val_ratio, test_ratio):
-    """Split images into train/val/test and copy to appropriate directories"""
-    np.random.shuffle(image_list)
-    
-    total_images = len(image_list)
-    train_count = int(total_images * train_ratio)
-    val_count = int(total_images * val_ratio)
-    
-    train_images = image_list[:train_count]
-    val_images = image_list[train_count:train_count + val_count]
-    test_images = image_list[train_count + val_count:]
-    
-    # Copy images to appropriate directories
-    splits = [
-        ('train', train_images),
-        ('val', val_images),
-        ('test', test_images)
-    ]
+def extract_video_frames(base_path, video_dir, frames_per_video=DEFAULT_FRAMES_PER_VIDEO, face_crop=False,
+                         train_ratio=0.7, val_ratio=0.2, seed=0, workers=None, **_):
+    """Sample frames (or face crops) from labeled videos into the dataset folders, one split per video"""
+    print(f"🎞️  Extracting {frames_per_video} frames per video from {video_dir}"
+          f"{' (face crops)' if face_crop else ''}...")
+    dataset_path = os.path.join(base_path, 'dataset')
+    progress_bar = tqdm(desc="Extracting videos", unit="video")
     
-    for split_name, images in splits:
-        dest_dir = os.path.join(base_path, 'dataset', split_name, label)
-        for img_name in tqdm(images, desc=f"Copying {label} {split_name} images"):
-            src_path = os.path.join(source_dir, img_name)
-            dest_path = os.path.join(dest_dir, img_name)
-            shutil.copy2(src_path, dest_path)
-        
-        print(f"✓ Copied {len(images)} {label} images to {split_name}")
+    def progress(record, done, total):
+        progress_bar.total = total
+        progress_bar.n = done
+        progress_bar.refresh()
+        if record['error']:
+            progress_bar.write(f"⚠️  {record['video']}: {record['error']}")
+    
+    try:
+        summary = extract_dataset(video_dir, dataset_path, frames_per_video, face_crop, train_ratio, val_ratio,
+                                  seed, workers, progress)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        return False
+    finally:
+        progress_bar.close()
+    
+    print(f"✓ {summary['frames']} frames from {summary['videos']} videos "
+          f"({summary['resumed']} videos already extracted by an earlier run)")
+    if summary['failed']:
+        print(f"⚠️  {len(summary['failed'])} videos could not be read")
+    print(f"✓ Manifest saved: {os.path.join(dataset_path, MANIFEST_FILE)}")
+    return True
 
 def download_sample_dataset(base_path):
     """Download a small sample dataset for quick testing"""
@@ -201,8 +250,28 @@ def download_sample_dataset(base_path):
     
     return True
 
-def validate_dataset(base_path):
-    """Validate the dataset structure and provide statistics"""
+def dataset_images(dataset_path):
+    """(path, split, label) of every image, from the manifest if there is one, else from the split folders"""
+    manifest_path = os.path.join(dataset_path, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        # The manifest is the split, whether or not the folders were linked
+        return [(row['path'], row['split'], row['label']) for row in read_manifest(manifest_path)]
+    
+    images = []
+    for split in ['train', 'val', 'test']:
+        for label in ['real', 'fake']:
+            path = os.path.join(dataset_path, split, label)
+            if os.path.exists(path):
+                images += [(image, split, label) for image in list_images(path)]
+    return images
+
+def validate_dataset(base_path, workers=None, max_distance=4):
+    """
+    Validate the dataset: statistics, plus a decode check of every image and a
+    search for exact and near duplicates (reported when they cross splits).
+    Results are cached in dataset/validation_cache.json, so re-validating
+    only decodes new or changed files
+    """
     print("\n📊 Validating dataset...")
     
     dataset_path = os.path.join(base_path, 'dataset')
@@ -211,19 +280,11 @@ def validate_dataset(base_path):
         print("❌ Dataset directory not found!")
         return False
     
-    stats = {}
-    total_images = 0
-    
-    for split in ['train', 'val', 'test']:
-        stats[split] = {}
-        for label in ['real', 'fake']:
-            path = os.path.join(dataset_path, split, label)
-            if os.path.exists(path):
-                count = len([f for f in os.listdir(path) if f.lower().endswith(('.jpg', '.jpeg', '.png'))])
-                stats[split][label] = count
-                total_images += count
-            else:
-                stats[split][label] = 0
+    images = dataset_images(dataset_path)
+    stats = {split: {'real': 0, 'fake': 0} for split in ['train', 'val', 'test']}
+    for _, split, label in images:
+        stats[split][label] = stats[split].get(label, 0) + 1
+    total_images = len(images)
     
     # Print statistics
     print("\n📈 Dataset Statistics:")
@@ -251,6 +312,34 @@ def validate_dataset(base_path):
     if stats['val']['real'] < 50 or stats['val']['fake'] < 50:
         issues.append("⚠️  Validation set is very small (< 50 per class)")
     
+    # Decode every image and hash it (in parallel, cached by file size and mtime)
+    print(f"\n🔎 Checking {total_images} images...")
+    report = validate(images, os.path.join(dataset_path, 'validation_cache.json'), workers, max_distance)
+    report_path = os.path.join(dataset_path, 'validation_report.json')
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Decoded {report['inspected']} new or changed images "
+          f"({total_images - report['inspected']} unchanged since the last check)")
+    print(f"✓ Full report saved to: {report_path}")
+    
+    if report['corrupt']:
+        issues.append(f"❌ {len(report['corrupt'])} images cannot be decoded (they would crash training):")
+        issues += [f"     {image['path']}: {image['error']}" for image in report['corrupt'][:10]]
+    
+    duplicates = report['duplicate_groups']
+    if duplicates:
+        exact = sum(1 for group in duplicates if group['exact'])
+        issues.append(f"⚠️  {len(duplicates)} groups of duplicate images "
+                      f"({exact} exact, {len(duplicates) - exact} near duplicates)")
+    
+    if report['leaks']:
+        leaked = sum(len(group['images']) for group in report['leaks'])
+        issues.append(f"❌ {len(report['leaks'])} duplicate groups ({leaked} images) span several splits, "
+                      f"so validation/test accuracy is inflated:")
+        for group in report['leaks'][:10]:
+            issues.append("     " + ", ".join(f"{image['split']}:{os.path.basename(image['path'])}"
+                                               for image in group['images']))
+    
     if issues:
         print("\n🔍 Dataset Issues:")
         for issue in issues:
@@ -290,18 +379,44 @@ def create_training_config(base_path, dataset_name):
 def main():
     parser = argparse.ArgumentParser(description='Download and prepare datasets for deepfake detection')
     parser.add_argument('--dataset', type=str, required=True,
-                        choices=['kaggle_140k', 'sample', 'custom'],
-                        help='Dataset to download')
+                        choices=['kaggle_140k', 'sample', 'custom', 'videos', 'resplit', 'validate'],
+                        help='Dataset to download (resplit: new splits for the existing manifest, '
+                             'validate: only check the existing dataset)')
     parser.add_argument('--path', type=str, default='.',
                         help='Base path for dataset (default: current directory)')
     parser.add_argument('--custom_path', type=str,
-                        help='Path to custom dataset (for --dataset custom)')
+                        help='Path to custom dataset (for --dataset custom, or the video folder for --dataset videos)')
+    parser.add_argument('--train_ratio', type=float, default=0.7,
+                        help='Share of each class used for training')
+    parser.add_argument('--val_ratio', type=float, default=0.2,
+                        help='Share of each class used for validation (the rest is test)')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='Seed of the split shuffle')
+    parser.add_argument('--layout', type=str, default='hardlink',
+                        choices=['hardlink', 'symlink', 'none'],
+                        help='How to fill the train/val/test folders (none: manifest only)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Parallel workers for hashing, linking and validation (default: all CPUs)')
+    parser.add_argument('--frames_per_video', type=int, default=DEFAULT_FRAMES_PER_VIDEO,
+                        help='Frames sampled per video for --dataset videos (the video API samples 5)')
+    parser.add_argument('--face_crop', action='store_true',
+                        help='With --dataset videos, save face crops instead of whole frames (as FACE_CROP=1 serving does)')
+    parser.add_argument('--max_distance', type=int, default=4,
+                        help='Perceptual hash bits two images may differ in to count as near duplicates')
     
     args = parser.parse_args()
+    if args.train_ratio + args.val_ratio > 1:
+        parser.error('--train_ratio + --val_ratio must not exceed 1')
+    split_options = {'train_ratio': args.train_ratio, 'val_ratio': args.val_ratio, 'seed': args.seed,
+                     'layout': args.layout, 'workers': args.workers}
     
     print("🚀 Dataset Download and Preparation Tool")
     print("=" * 50)
     
+    if args.dataset == 'validate':
+        validate_dataset(args.path, args.workers, args.max_distance)
+        return
+    
     # Create directory structure
     create_directory_structure(args.path)
     
@@ -309,23 +424,29 @@ def main():
     success = False
     
     if args.dataset == 'kaggle_140k':
-        success = download_kaggle_140k_dataset(args.path)
+        success = download_kaggle_140k_dataset(args.path, split_options)
     elif args.dataset == 'sample':
         success = download_sample_dataset(args.path)
     elif args.dataset == 'custom':
         if args.custom_path:
             print(f"📁 Processing custom dataset from: {args.custom_path}")
-            # Here you would implement custom dataset processing
-            print("📝 Custom dataset processing not implemented yet.")
-            print("Please manually organize your images into the created directory structure.")
-            success = True
+            success = organize_dataset(args.path, args.custom_path, **split_options)
         else:
             print("❌ --custom_path required for custom dataset")
             return
+    elif args.dataset == 'videos':
+        if args.custom_path:
+            success = extract_video_frames(args.path, args.custom_path, args.frames_per_video, args.face_crop,
+                                           **split_options)
+        else:
+            print("❌ --custom_path (the video folder) required for --dataset videos")
+            return
+    elif args.dataset == 'resplit':
+        success = resplit_dataset(args.path, **split_options)
     
     if success:
         # Validate dataset
-        validate_dataset(args.path)
+        validate_dataset(args.path, args.workers, args.max_distance)
         
         # Create training configuration
         create_training_config(args.path, args.dataset)
@@ -335,6 +456,7 @@ def main():
         print("1. Review the dataset statistics above")
         print("2. Check the training_config.json file")
         print("3. Run: python train_custom_model.py --data_dir ./dataset")
+        print("   (or straight from the manifest: python train_custom_model.py --manifest ./dataset/manifest.csv)")
         print("\n📚 For beginners, start with 10 epochs to test:")
         print("   python train_custom_model.py --data_dir ./dataset --epochs 10")
 
@@ -0,0 +1,48 @@
+"""
+Gunicorn configuration for the AI inference service.
+
+The model is loaded once in the master (preload_app) and workers are forked
+from it, sharing the weights copy-on-write. Each worker gets its own slice of
+the CPUs for PyTorch intra-op threads so workers do not oversubscribe cores.
+"""
+
+import os
+
+from src.serving import available_cpus, configure_worker
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+
+# Load the app (and the model) in the master before forking workers
+preload_app = True
+
+workers = int(os.getenv('SERVING_WORKERS', os.getenv('MAX_WORKERS', 2)))
+# Request threads per worker. They mostly wait on uploads and admission control;
+# inference parallelism is bounded by the torch threads configured below.
+worker_class = 'gthread'
+threads = int(os.getenv('SERVING_THREADS', 4))
+timeout = int(os.getenv('SERVING_TIMEOUT', 120))
+
+# Worker recycling (0 disables). Recycled workers are re-forked from the master,
+# so they share the preloaded weights again without reloading the model.
+max_requests = int(os.getenv('SERVING_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('SERVING_MAX_REQUESTS_JITTER', 0))
+
+accesslog = '-'
+
+
+def on_starting(server):
+    cpus = available_cpus()
+    server.log.info(f"Serving with {workers} workers on {len(cpus)} CPUs")
+
+
+def pre_fork(server, worker):
+    # Runs in the master: give the new worker the lowest CPU slot not held by a live worker
+    used = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+    slot = 0
+    while slot in used:
+        slot += 1
+    worker.cpu_slot = slot
+
+
+def post_fork(server, worker):
+    configure_worker(worker.cpu_slot, workers)
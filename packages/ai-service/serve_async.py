@@ -0,0 +1,225 @@
+"""
+Asyncio entry point for the inference API.
+
+    python serve_async.py
+
+Exposes the same routes and JSON contract as app.py (/health, /metrics,
+/inference/analyze-frame, /inference/analyze-video and their -combined
+variants). Uploads are read and
+spooled to disk asynchronously, so a slow client costs a coroutine instead
+of an OS thread for the lifetime of its upload. Decoding and inference are
+blocking and run on a bounded thread pool, which in turn hands model calls
+to the InferenceExecutor. The endpoint logic itself lives in src/service.py
+and is shared with the Flask app.
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp import web
+from dotenv import load_dotenv
+
+from src.service import InferenceService
+from src import metrics
+from src.metrics import stage
+
+load_dotenv()
+
+UPLOAD_CHUNK_SIZE = 256 * 1024
+
+SERVICE = web.AppKey('service', InferenceService)
+BLOCKING_POOL = web.AppKey('blocking_pool', ThreadPoolExecutor)
+
+
+def get_client_id(request):
+    """Identifies the caller for per-client concurrency limits."""
+    return request.headers.get('X-Client-Id') or request.remote or 'anonymous'
+
+
+def json_response(payload, status=200, headers=None, profile=None):
+    metrics.count_request(status)
+    headers = dict(headers or {})
+    if profile is not None:
+        payload['profileId'] = profile.id
+        headers['X-Profile-Id'] = profile.id
+    return web.json_response(payload, status=status, headers=headers)
+
+
+def error_response(service, error, context, profile=None):
+    payload, status, headers = service.error_response(error, context)
+    return json_response(payload, status, headers, profile)
+
+
+async def run_blocking(request, fn, *args):
+    """Runs blocking decode/inference work off the event loop (in the request's context)."""
+    loop = asyncio.get_running_loop()
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(
+        request.app[BLOCKING_POOL], functools.partial(context.run, fn, *args))
+
+
+async def read_multipart(request, file_field, file_path=None):
+    """
+    Reads a multipart form without blocking the event loop.
+    Returns (file_data, form): file_data is the file part's bytes, or
+    file_path once the part has been streamed there, or None if the part is
+    missing; form holds the remaining text fields.
+    """
+    file_data = None
+    form = {}
+    if not request.content_type.startswith('multipart/'):
+        return file_data, form
+
+    reader = await request.multipart()
+    while True:
+        part = await reader.next()
+        if part is None:
+            break
+        if part.name == file_field and part.filename is not None:
+            if file_path is None:
+                file_data = await part.read()
+            else:
+                # Disk writes run on the blocking pool, so a slow disk does not stall the event loop
+                loop = asyncio.get_running_loop()
+                pool = request.app[BLOCKING_POOL]
+                f = await loop.run_in_executor(pool, open, file_path, 'wb')
+                try:
+                    while True:
+                        chunk = await part.read_chunk(UPLOAD_CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        await loop.run_in_executor(pool, f.write, chunk)
+                finally:
+                    await loop.run_in_executor(pool, f.close)
+                file_data = file_path
+        else:
+            form[part.name] = await part.text()
+    return file_data, form
+
+
+async def health_check(request):
+    service = request.app[SERVICE]
+    return web.json_response(await run_blocking(request, service.health))
+
+
+async def metrics_endpoint(request):
+    text = request.app[SERVICE].metrics_text()
+    return web.Response(text=text, headers={'Content-Type': metrics.CONTENT_TYPE})
+
+
+def form_flag(form, name):
+    return str(form.get(name, '')).lower() in ('1', 'true', 'yes')
+
+
+def frame_handler(endpoint, forensic):
+    async def analyze_frame(request):
+        arrival = time.monotonic()
+        service = request.app[SERVICE]
+        with service.profile_request(request.headers) as profile, \
+                service.request_scope(endpoint):
+            try:
+                client_id = get_client_id(request)
+                service.check_admission(client_id)
+
+                with stage('upload_receive'):
+                    image_bytes, form = await read_multipart(request, 'image')
+                if image_bytes is None:
+                    return json_response({'error': 'No image file provided'}, 400)
+
+                deadline = service.parse_deadline(request.headers, form, arrival)
+
+                result = await run_blocking(
+                    request, service.analyze_frame,
+                    client_id, image_bytes, form.get('frameNumber', 0), deadline, forensic,
+                    form_flag(form, 'explain')
+                )
+                return json_response(result, profile=profile)
+
+            except Exception as e:
+                return error_response(service, e, 'frame', profile)
+    return analyze_frame
+
+
+def video_handler(endpoint, forensic):
+    async def analyze_video(request):
+        arrival = time.monotonic()
+        service = request.app[SERVICE]
+        temp_path = None
+        with service.profile_request(request.headers) as profile, \
+                service.request_scope(endpoint):
+            try:
+                client_id = get_client_id(request)
+                service.check_admission(client_id)
+
+                temp_path = service.new_temp_video_path()
+                with stage('upload_receive'):
+                    saved_path, form = await read_multipart(request, 'video', temp_path)
+                if saved_path is None:
+                    return json_response({'error': 'No video file provided'}, 400)
+
+                deadline = service.parse_deadline(request.headers, form, arrival)
+                include_frames = form_flag(form, 'includeFrames') if forensic else True
+
+                result = await run_blocking(
+                    request, service.analyze_video, client_id, temp_path, deadline, forensic, include_frames,
+                    form_flag(form, 'explain'))
+                return json_response(result, profile=profile)
+
+            except Exception as e:
+                return error_response(service, e, 'video', profile)
+            finally:
+                # Cleanup
+                service.remove_temp_file(temp_path)
+    return analyze_video
+
+
+@web.middleware
+async def cors_middleware(request, handler):
+    if request.method == 'OPTIONS':
+        response = web.Response()
+        response.headers['Access-Control-Allow-Methods'] = 'GET, POST, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = request.headers.get(
+            'Access-Control-Request-Headers', '*')
+    else:
+        response = await handler(request)
+    response.headers['Access-Control-Allow-Origin'] = '*'
+    return response
+
+
+async def _load_model(app):
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(app[BLOCKING_POOL], app[SERVICE].get_model)
+
+
+async def _shutdown_pool(app):
+    app[BLOCKING_POOL].shutdown(wait=False)
+
+
+def create_app(service=None):
+    app = web.Application(middlewares=[cors_middleware])
+    app[SERVICE] = service or InferenceService()
+    app[BLOCKING_POOL] = ThreadPoolExecutor(
+        max_workers=int(os.getenv('ASYNC_BLOCKING_THREADS', 8)),
+        thread_name_prefix='blocking'
+    )
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/metrics', metrics_endpoint)
+    app.router.add_post('/inference/analyze-frame', frame_handler('analyze_frame', forensic=False))
+    app.router.add_post('/inference/analyze-video', video_handler('analyze_video', forensic=False))
+    # Combined AI + forensic (ELA, metadata) analysis, see app.py
+    app.router.add_post('/inference/analyze-frame-combined',
+                        frame_handler('analyze_frame_combined', forensic=True))
+    app.router.add_post('/inference/analyze-video-combined',
+                        video_handler('analyze_video_combined', forensic=True))
+    app.on_startup.append(_load_model)
+    app.on_cleanup.append(_shutdown_pool)
+    return app
+
+
+if __name__ == '__main__':
+    port = int(os.getenv('PORT', 5000))
+    web.run_app(create_app(), host='0.0.0.0', port=port)
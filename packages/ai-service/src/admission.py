@@ -0,0 +1,196 @@
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from src.deadline import DeadlineExceeded
+
+# One cost unit is roughly one model forward pass; decoding a 1080p frame
+# costs about as much again, so pixels are normalised against 1920x1080.
+REFERENCE_PIXELS = 1920 * 1080
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted. Maps to HTTP 429."""
+
+    def __init__(self, reason, retry_after, queue_depth=0):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+        self.queue_depth = queue_depth
+
+
+class _Ticket:
+    def __init__(self, client_id, cost):
+        self.client_id = client_id
+        self.cost = cost
+        self.admitted_at = None
+
+
+class AdmissionController:
+    """
+    Cost-weighted admission control for the inference endpoints.
+
+    Requests are admitted while the in-flight cost stays under capacity.
+    Beyond that they wait in a bounded FIFO queue; when the queue (or the
+    caller's per-client concurrency allowance) is exhausted the request is
+    rejected immediately so the caller can back off and retry.
+    """
+
+    def __init__(self, max_inflight_cost=None, max_queue_cost=None,
+                 max_per_client=None, queue_timeout=None,
+                 frame_weight=None, video_weight=None):
+        self.max_inflight_cost = float(max_inflight_cost if max_inflight_cost is not None
+                                       else os.getenv('ADMISSION_MAX_INFLIGHT_COST', 16))
+        self.max_queue_cost = float(max_queue_cost if max_queue_cost is not None
+                                    else os.getenv('ADMISSION_MAX_QUEUE_COST', 64))
+        self.max_per_client = int(max_per_client if max_per_client is not None
+                                  else os.getenv('ADMISSION_MAX_PER_CLIENT', 4))
+        self.queue_timeout = float(queue_timeout if queue_timeout is not None
+                                   else os.getenv('ADMISSION_QUEUE_TIMEOUT', 30))
+        self.frame_weight = float(frame_weight if frame_weight is not None
+                                  else os.getenv('ADMISSION_FRAME_WEIGHT', 1.0))
+        self.video_weight = float(video_weight if video_weight is not None
+                                  else os.getenv('ADMISSION_VIDEO_WEIGHT', 1.5))
+
+        self._cond = threading.Condition()
+        self._waiting = deque()
+        self._queued_cost = 0.0
+        self._inflight_cost = 0.0
+        self._inflight_requests = 0
+        self._per_client = {}
+        self._rejected = 0
+        self._cancelled = 0
+        # Exponentially weighted seconds per cost unit, used for Retry-After
+        self._seconds_per_unit = 0.5
+
+    def request_cost(self, kind, width, height, frames=1):
+        """Estimate the cost of a request from its resolution and frame count."""
+        weight = self.video_weight if kind == 'video' else self.frame_weight
+        pixels = max(int(width or 0) * int(height or 0), 0)
+        cost = weight * max(int(frames), 1) * (1.0 + pixels / REFERENCE_PIXELS)
+        # A single request larger than capacity may still run on an idle service
+        return min(cost, self.max_inflight_cost)
+
+    def check(self, client_id):
+        """
+        Cheap pre-check run before the upload is read. Rejects when the
+        queue is already full or the client is at its concurrency limit.
+        """
+        with self._cond:
+            self._reject_if_over_limits(client_id, 0.0)
+
+    def acquire(self, client_id, cost, deadline=None):
+        """
+        Block until the request is admitted; raises AdmissionRejected.
+        If the request's deadline passes while it is queued, the queued work
+        is cancelled with DeadlineExceeded instead of being run late.
+        """
+        if deadline is not None and deadline.expired():
+            raise DeadlineExceeded('Deadline expired before admission')
+        ticket = _Ticket(client_id, cost)
+        with self._cond:
+            self._reject_if_over_limits(client_id, cost)
+            self._per_client[client_id] = self._per_client.get(client_id, 0) + 1
+
+            if not self._waiting and self._fits(cost):
+                self._admit(ticket)
+                return ticket
+
+            self._waiting.append(ticket)
+            self._queued_cost += cost
+            queue_expires_at = time.monotonic() + self.queue_timeout
+            try:
+                while not (self._waiting[0] is ticket and self._fits(cost)):
+                    if deadline is not None and deadline.expired():
+                        self._cancelled += 1
+                        raise DeadlineExceeded('Deadline expired while queued')
+                    remaining = queue_expires_at - time.monotonic()
+                    if remaining <= 0:
+                        self._reject('Timed out waiting in admission queue')
+                    if deadline is not None:
+                        remaining = min(remaining, deadline.remaining())
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiting.remove(ticket)
+                self._queued_cost -= cost
+                self._release_client(client_id)
+                self._cond.notify_all()
+                raise
+
+            self._waiting.popleft()
+            self._queued_cost -= cost
+            self._admit(ticket)
+            # The next waiter may also fit in the remaining capacity
+            self._cond.notify_all()
+            return ticket
+
+    def release(self, ticket):
+        with self._cond:
+            self._inflight_cost -= ticket.cost
+            self._inflight_requests -= 1
+            self._release_client(ticket.client_id)
+            if ticket.admitted_at is not None and ticket.cost > 0:
+                elapsed = time.monotonic() - ticket.admitted_at
+                self._seconds_per_unit = 0.8 * self._seconds_per_unit + 0.2 * (elapsed / ticket.cost)
+            self._cond.notify_all()
+
+    @contextmanager
+    def admitted(self, client_id, cost, deadline=None):
+        ticket = self.acquire(client_id, cost, deadline)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def snapshot(self):
+        """Current queue depth and load, for /health and monitoring."""
+        with self._cond:
+            return {
+                'queue_depth': len(self._waiting),
+                'queued_cost': round(self._queued_cost, 3),
+                'inflight_requests': self._inflight_requests,
+                'inflight_cost': round(self._inflight_cost, 3),
+                'max_inflight_cost': self.max_inflight_cost,
+                'max_queue_cost': self.max_queue_cost,
+                'rejected_total': self._rejected,
+                'deadline_cancelled_total': self._cancelled,
+            }
+
+    def _fits(self, cost):
+        return self._inflight_cost + cost <= self.max_inflight_cost or self._inflight_requests == 0
+
+    def _admit(self, ticket):
+        ticket.admitted_at = time.monotonic()
+        self._inflight_cost += ticket.cost
+        self._inflight_requests += 1
+
+    def _release_client(self, client_id):
+        remaining = self._per_client.get(client_id, 0) - 1
+        if remaining > 0:
+            self._per_client[client_id] = remaining
+        else:
+            self._per_client.pop(client_id, None)
+
+    def _reject_if_over_limits(self, client_id, cost):
+        if self._per_client.get(client_id, 0) >= self.max_per_client:
+            self._reject('Too many concurrent requests for this client')
+        if cost == 0.0:
+            # Pre-check: is there any room left in the queue at all?
+            queue_full = self._queued_cost >= self.max_queue_cost
+        else:
+            queue_needed = bool(self._waiting) or not self._fits(cost)
+            queue_full = queue_needed and self._queued_cost + cost > self.max_queue_cost
+        if queue_full:
+            self._reject('Admission queue is full')
+
+    def _reject(self, reason):
+        self._rejected += 1
+        raise AdmissionRejected(reason, self._retry_after(), len(self._waiting))
+
+    def _retry_after(self):
+        backlog = self._queued_cost + self._inflight_cost
+        seconds = backlog * self._seconds_per_unit / max(self.max_inflight_cost, 1.0)
+        return max(1, int(math.ceil(seconds)))
@@ -0,0 +1,151 @@
+"""
+Training augmentation on whole batches.
+
+The torchvision transforms in train_custom_model.py flip, rotate and
+colour-jitter one PIL image at a time inside the DataLoader workers.
+BatchAugment does the same to a collated (N, 3, H, W) batch with one
+random draw per sample, in two passes over the whole batch: one
+grid_sample for all flips and rotations, and one per-sample colour matrix
+for the jitter. Workers only decode and collate uint8 tensors.
+
+The colour jitter follows torchvision's definitions for brightness,
+contrast and saturation, but clamps once at the end instead of after every
+step. Hue is shifted by rotating chroma in YIQ space, which is close to
+torchvision's HSV hue shift and much cheaper.
+"""
+
+import math
+
+import torch
+import torch.nn.functional as F
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+# ITU-R 601 luma weights, as used by torchvision's rgb_to_grayscale
+_LUMA = (0.2989, 0.587, 0.114)
+_RGB_TO_YIQ = ((0.299, 0.587, 0.114),
+               (0.596, -0.274, -0.322),
+               (0.211, -0.523, 0.312))
+
+
+class BatchAugment:
+    """
+    Random flip, rotation and colour jitter for a batch, then normalization.
+
+    Takes uint8 (0-255) or float (0-1) batches and returns normalized float
+    batches on the same device. Parameters mean the same as for
+    RandomHorizontalFlip, RandomRotation and ColorJitter.
+    """
+
+    def __init__(self, flip_p=0.5, degrees=10.0, brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1,
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD, generator=None):
+        self.flip_p = flip_p
+        self.degrees = degrees
+        self.brightness = brightness
+        self.contrast = contrast
+        self.saturation = saturation
+        self.hue = hue
+        self.mean = mean
+        self.std = std
+        self.generator = generator
+
+    def __call__(self, batch):
+        images = to_float(batch)
+        images = self.geometry(images)
+        images = self.jitter(images)
+        return normalize(images, self.mean, self.std)
+
+    def _uniform(self, count, low, high, device):
+        values = torch.rand(count, generator=self.generator).to(device)
+        return low + (high - low) * values
+
+    def _flips(self, count, device):
+        return (torch.rand(count, generator=self.generator) < self.flip_p).to(device)
+
+    def geometry(self, images):
+        """
+        Random horizontal flip and rotation about the center (uncovered
+        corners are black). With rotation on, the flip is folded into the
+        same sampling grid, so both cost one grid_sample.
+        """
+        if self.degrees <= 0:
+            if self.flip_p <= 0:
+                return images
+            flip = self._flips(len(images), images.device)
+            images = images.clone()
+            images[flip] = images[flip].flip(-1)
+            return images
+
+        count, device = len(images), images.device
+        flip = self._flips(count, device) if self.flip_p > 0 else torch.zeros(count, dtype=torch.bool, device=device)
+        angles = self._uniform(count, -self.degrees, self.degrees, device) * (math.pi / 180)
+        cos, sin = torch.cos(angles), torch.sin(angles)
+        # Sampling x is mirrored for flipped samples
+        mirror = 1.0 - 2.0 * flip.to(angles.dtype)
+        zeros = torch.zeros_like(angles)
+        theta = torch.stack([torch.stack([cos * mirror, -sin * mirror, zeros], 1),
+                             torch.stack([sin, cos, zeros], 1)], 1)
+        grid = F.affine_grid(theta.to(images.dtype), list(images.shape), align_corners=False)
+        return F.grid_sample(images, grid, mode='bilinear', padding_mode='zeros', align_corners=False)
+
+    def jitter(self, images):
+        """
+        Brightness, contrast, saturation and hue (in that order). Each is an
+        affine colour map, so they are composed into one 3x3 matrix and offset
+        per sample and applied in a single pass, clamped once at the end.
+        """
+        count, device, dtype = len(images), images.device, images.dtype
+        if not (self.brightness > 0 or self.contrast > 0 or self.saturation > 0 or self.hue > 0):
+            return images
+        matrix = torch.eye(3, dtype=dtype, device=device).repeat(count, 1, 1)
+        offset = torch.zeros(count, 3, dtype=dtype, device=device)
+        luma = torch.tensor(_LUMA, dtype=dtype, device=device)
+
+        if self.brightness > 0:
+            factor = self._uniform(count, 1 - self.brightness, 1 + self.brightness, device).to(dtype)
+            matrix = matrix * factor.view(-1, 1, 1)
+        if self.contrast > 0:
+            factor = self._uniform(count, 1 - self.contrast, 1 + self.contrast, device).to(dtype).view(-1, 1)
+            # Mean gray level of the image so far, from the channel means of the input
+            channel_means = images.mean(dim=(2, 3))
+            mean = ((matrix @ channel_means.unsqueeze(-1)).squeeze(-1) + offset) @ luma
+            matrix = matrix * factor.unsqueeze(-1)
+            offset = factor * offset + (1 - factor) * mean.view(-1, 1)
+        if self.saturation > 0:
+            factor = self._uniform(count, 1 - self.saturation, 1 + self.saturation, device).to(dtype).view(-1, 1, 1)
+            blend = factor * torch.eye(3, dtype=dtype, device=device) + (1 - factor) * luma.view(1, 1, 3)
+            matrix, offset = blend @ matrix, (blend @ offset.unsqueeze(-1)).squeeze(-1)
+        if self.hue > 0:
+            shift = self._uniform(count, -self.hue, self.hue, device) * (2 * math.pi)
+            rotation = hue_matrices(shift.to(dtype))
+            matrix, offset = rotation @ matrix, (rotation @ offset.unsqueeze(-1)).squeeze(-1)
+
+        images = torch.bmm(matrix, images.reshape(count, 3, -1)).view_as(images)
+        return images.add_(offset.view(count, 3, 1, 1)).clamp_(0, 1)
+
+
+def to_float(batch):
+    if batch.dtype == torch.uint8:
+        return batch.float().div_(255)
+    return batch.float()
+
+
+def normalize(images, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    mean = torch.tensor(mean, dtype=images.dtype, device=images.device).view(1, -1, 1, 1)
+    std = torch.tensor(std, dtype=images.dtype, device=images.device).view(1, -1, 1, 1)
+    return (images - mean) / std
+
+
+def hue_matrices(angles):
+    """One 3x3 RGB matrix per angle (radians) that rotates chroma in YIQ space."""
+    to_yiq = torch.tensor(_RGB_TO_YIQ, dtype=angles.dtype, device=angles.device)
+    from_yiq = torch.linalg.inv(to_yiq)
+    cos, sin = torch.cos(angles), torch.sin(angles)
+    ones, zeros = torch.ones_like(cos), torch.zeros_like(cos)
+    rotation = torch.stack([
+        torch.stack([ones, zeros, zeros], 1),
+        torch.stack([zeros, cos, -sin], 1),
+        torch.stack([zeros, sin, cos], 1),
+    ], 1)
+    return from_yiq @ rotation @ to_yiq
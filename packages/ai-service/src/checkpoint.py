@@ -0,0 +1,193 @@
+"""
+Background checkpointing for train_custom_model.py.
+
+AsyncCheckpointer.save() copies the training state to CPU memory and returns.
+A single background thread then writes the copy, so training waits only for
+the copy, not for torch.save and the disk. Only one write is in flight at a
+time. The next save() waits for it, which also bounds the memory held by
+snapshots.
+
+Each file is written to a temporary name and renamed into place, so a crash
+never leaves a truncated checkpoint. Retention works like this:
+
+- The most recent keep_last step checkpoints are kept
+  (checkpoint_<name>_step<N>.pth).
+- The keep_best checkpoints with the highest metric are kept
+  (best_model_<name>_step<N>.pth). A best checkpoint is a hard link of the
+  step checkpoint written for the same step.
+
+checkpoints.json in the save directory lists what is kept.
+latest_checkpoint() reads it, so that `--resume latest` can pick up the most
+recent state.
+
+ResumableSampler shuffles with a seed per epoch, like DistributedSampler
+(one replica when not distributed). It can also skip the samples an
+interrupted epoch had already trained on, so a resumed run continues from
+the step it stopped at.
+"""
+
+import copy
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+import torch
+from torch.utils.data.distributed import DistributedSampler
+
+from src import distributed
+
+MANIFEST_FILE = 'checkpoints.json'
+
+
+def snapshot(state):
+    """Copy of state with every tensor cloned to CPU (safe to write while training goes on)."""
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return state
+
+
+def _atomic_write_json(data, path):
+    with open(path + '.tmp', 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def _link(source, target):
+    try:
+        os.link(source, target)
+    except OSError:
+        # File systems without hard links
+        shutil.copyfile(source, target)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def read_manifest(save_dir):
+    try:
+        with open(os.path.join(save_dir, MANIFEST_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'last': [], 'best': []}
+
+
+def latest_checkpoint(save_dir):
+    """Path of the most recent step checkpoint in save_dir, or None."""
+    last = read_manifest(save_dir)['last']
+    return os.path.join(save_dir, last[-1]['file']) if last else None
+
+
+class AsyncCheckpointer:
+    def __init__(self, save_dir, name, keep_last=3, keep_best=1):
+        self.save_dir = save_dir
+        self.name = name
+        self.keep_last = max(1, keep_last)
+        self.keep_best = keep_best
+        # Continue the retention of an earlier run in the same directory
+        self.manifest = read_manifest(save_dir)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='checkpoint')
+        self._pending = None
+
+    def is_best(self, metric):
+        """Whether a checkpoint with this metric would be kept as one of the best."""
+        if self.keep_best <= 0 or metric is None:
+            return False
+        best = self.manifest['best']
+        return len(best) < self.keep_best or metric > min(entry['metric'] for entry in best)
+
+    def save(self, state, step, metric=None):
+        """
+        Snapshots state and writes it in the background as the step checkpoint
+        of step (and as a best checkpoint if metric qualifies). Returns the
+        paths that will be written.
+        """
+        self.wait()
+        file = f'checkpoint_{self.name}_step{step:08d}.pth'
+        best_file = f'best_model_{self.name}_step{step:08d}.pth' if self.is_best(metric) else None
+        last = [entry for entry in self.manifest['last'] if entry['step'] != step]
+        last.append({'file': file, 'step': step})
+        best = [entry for entry in self.manifest['best'] if entry['step'] != step]
+        if best_file:
+            best = sorted(best + [{'file': best_file, 'step': step, 'metric': metric}],
+                          key=lambda entry: entry['metric'], reverse=True)
+        old_files = {entry['file'] for entry in self.manifest['last'] + self.manifest['best']}
+        self.manifest = {'last': last[-self.keep_last:], 'best': best[:max(0, self.keep_best)]}
+        kept = {entry['file'] for entry in self.manifest['last'] + self.manifest['best']}
+        # The files of the new step are written, not removed
+        evicted = sorted(old_files - kept - {file, best_file})
+
+        self._pending = self._executor.submit(self._write_step, snapshot(state), file, best_file,
+                                              copy.deepcopy(self.manifest), evicted)
+        return [os.path.join(self.save_dir, f) for f in (file, best_file) if f]
+
+    def write(self, state, path):
+        """Snapshots state and writes it to path in the background (no retention)."""
+        self.wait()
+        self._pending = self._executor.submit(self._write, snapshot(state), path)
+        return path
+
+    def wait(self):
+        """Blocks until the write in flight is on disk (re-raises its error)."""
+        if self._pending is not None:
+            pending, self._pending = self._pending, None
+            pending.result()
+
+    def close(self):
+        self.wait()
+        self._executor.shutdown()
+
+    def _write(self, state, path):
+        tmp_path = path + '.tmp'
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_step(self, state, file, best_file, manifest, evicted):
+        written = None
+        for name in (file, best_file):
+            if not name:
+                continue
+            path = os.path.join(self.save_dir, name)
+            if written is None:
+                self._write(state, path)
+                written = path
+            else:
+                _remove(path)
+                _link(written, path)
+        # Manifest before removals: it never lists a file that is gone
+        _atomic_write_json(manifest, os.path.join(self.save_dir, MANIFEST_FILE))
+        for name in evicted:
+            _remove(os.path.join(self.save_dir, name))
+
+
+class ResumableSampler(DistributedSampler):
+    """
+    This process's shard of a seeded per-epoch shuffle. skip(n) drops the
+    first n samples of the shard for the current epoch (until set_epoch()).
+    """
+
+    def __init__(self, dataset, shuffle=True, seed=0):
+        super().__init__(dataset, num_replicas=distributed.world_size(), rank=distributed.rank(),
+                         shuffle=shuffle, seed=seed)
+        self.start = 0
+
+    def set_epoch(self, epoch):
+        super().set_epoch(epoch)
+        self.start = 0
+
+    def skip(self, samples):
+        self.start = min(samples, self.num_samples)
+
+    def __iter__(self):
+        return iter(list(super().__iter__())[self.start:])
+
+    def __len__(self):
+        return self.num_samples - self.start
@@ -3,6 +3,7 @@ import torch.nn as nn
 import torchvision.transforms as transforms
 from PIL import Image
 import os
+from src.metrics import stage
 
 class CustomCNN(nn.Module):
     """
@@ -58,6 +59,9 @@ class CustomCNN(nn.Module):
         return x
 
 class CustomModelHandler:
+    # Output index of the fake class (class 0 = Real, class 1 = Fake)
+    fake_index = 1
+
     def __init__(self, model_path: str, model_type: str = "custom_cnn"):
         self.model = None
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
@@ -114,27 +118,33 @@ class CustomModelHandler:
         Run inference on a PIL Image.
         Returns prediction results in the same format as the original handler.
         """
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images):
+        """
+        Run inference on a list of PIL Images in one forward pass.
+        Returns one prediction result per image.
+        """
         if self.model is None:
             raise RuntimeError("Model not initialized")
         
         try:
-            # Preprocess image
-            if isinstance(image, Image.Image):
-                image_tensor = self.transform(image).unsqueeze(0)
-            else:
-                raise ValueError("Input must be a PIL Image")
-            
-            image_tensor = image_tensor.to(self.device)
+            # Preprocess images
+            with stage('preprocess'):
+                if not all(isinstance(image, Image.Image) for image in images):
+                    raise ValueError("Input must be a PIL Image")
+                image_tensor = torch.stack([self.transform(image) for image in images])
+                
+                image_tensor = image_tensor.to(self.device)
             
-            with torch.no_grad():
+            with torch.no_grad(), stage('model_forward'):
                 outputs = self.model(image_tensor)
-                probabilities = torch.nn.functional.softmax(outputs, dim=1)
+                probabilities = torch.nn.functional.softmax(outputs, dim=1).tolist()
                 
+            results = []
+            for real_score, fake_score in probabilities:
                 # Assuming class 0 = Real, class 1 = Fake (adjust based on your training)
-                real_score = probabilities[0][0].item()
-                fake_score = probabilities[0][1].item()
-                
-                return {
+                results.append({
                     "is_fake": fake_score > real_score,
                     "confidence": max(real_score, fake_score),
                     "distribution": {
@@ -142,11 +152,12 @@ class CustomModelHandler:
                         "fake": fake_score
                     },
                     "model_type": "custom_trained"
-                }
+                })
+            return results
                 
         except Exception as e:
             print(f"Custom model inference error: {e}")
-            return {
+            return [{
                 "is_fake": False,
                 "confidence": 0.0,
                 "distribution": {
@@ -155,4 +166,4 @@ class CustomModelHandler:
                 },
                 "error": str(e),
                 "model_type": "custom_trained"
-            }
\ No newline at end of file
+            } for _ in images]
@@ -0,0 +1,165 @@
+"""
+Pre-decoded training images in a memory-mapped uint8 array.
+
+ImageFolder decodes and resizes every JPEG on every epoch. build_cache()
+does that once per split: each image is resized to IMAGE_SIZE and written
+into `images.u8` as (3, H, W) uint8, next to `index.json` with the class
+names and the source file, label, size and mtime of every row. Later runs
+reuse the cache as long as the source files are unchanged.
+
+MemmapImageDataset serves rows as uint8 tensors that share memory with the
+page cache (no decode, no copy), so augmentations run on small uint8
+tensors and only the final dtype conversion produces floats.
+"""
+
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import Dataset
+from torchvision import datasets
+
+IMAGE_SIZE = 224
+IMAGES_FILE = 'images.u8'
+INDEX_FILE = 'index.json'
+
+# Set in each build worker by _init_worker
+_worker_images = None
+
+
+def list_samples(root):
+    """(class names, [(path, label)]) for an ImageFolder-style directory, without decoding."""
+    folder = datasets.ImageFolder(root)
+    return folder.classes, folder.samples
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return stat.st_size, int(stat.st_mtime_ns)
+
+
+def _init_worker(images_path, shape):
+    global _worker_images
+    _worker_images = np.memmap(images_path, dtype=np.uint8, mode='r+', shape=shape)
+
+
+def _decode_into(task):
+    """Decodes one image into its row of the cache; returns (row, error or None)."""
+    row, path, size = task
+    try:
+        with Image.open(path) as image:
+            image = image.convert('RGB').resize((size, size), Image.BILINEAR)
+        _worker_images[row] = np.asarray(image).transpose(2, 0, 1)
+        return row, None
+    except Exception as e:
+        return row, str(e)
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_cache(root, cache_dir, image_size=IMAGE_SIZE, num_workers=None, samples=None, classes=None):
+    """
+    Decodes every image under root (or the given (path, label) samples) into
+    cache_dir. Returns the index. Reuses an existing cache whose files,
+    image size and classes match, so calling this on every run is cheap.
+    """
+    if samples is None:
+        classes, samples = list_samples(root)
+    entries = [{'path': os.path.abspath(path), 'label': int(label), 'fingerprint': list(_fingerprint(path))}
+               for path, label in samples]
+
+    index = _read_index(cache_dir)
+    if (index is not None and index['image_size'] == image_size and index['classes'] == list(classes)
+            and [[e['path'], e['fingerprint']] for e in index['entries']]
+            == [[e['path'], e['fingerprint']] for e in entries]):
+        return index
+
+    os.makedirs(cache_dir, exist_ok=True)
+    images_path = os.path.join(cache_dir, IMAGES_FILE)
+    shape = (len(entries), 3, image_size, image_size)
+    # Sized up front so workers can write their rows in place
+    np.memmap(images_path, dtype=np.uint8, mode='w+', shape=shape).flush()
+
+    num_workers = num_workers or os.cpu_count() or 1
+    tasks = [(row, entry['path'], image_size) for row, entry in enumerate(entries)]
+    failed = {}
+    print(f'Decoding {len(tasks)} images into {images_path} ({num_workers} workers)...')
+    if num_workers > 1:
+        with Pool(num_workers, initializer=_init_worker, initargs=(images_path, shape)) as pool:
+            results = list(pool.imap_unordered(_decode_into, tasks, chunksize=64))
+    else:
+        _init_worker(images_path, shape)
+        results = [_decode_into(task) for task in tasks]
+    for row, error in results:
+        if error is not None:
+            failed[row] = error
+    for row, error in failed.items():
+        print(f'Skipping unreadable image {entries[row]["path"]}: {error}')
+
+    index = {
+        'image_size': image_size,
+        'classes': list(classes),
+        'shape': list(shape),
+        'entries': entries,
+        # Rows served by the dataset (unreadable images are left out)
+        'rows': [row for row in range(len(entries)) if row not in failed],
+    }
+    # The index is written last, so an interrupted build is never mistaken for a valid cache
+    tmp_path = os.path.join(cache_dir, INDEX_FILE + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, os.path.join(cache_dir, INDEX_FILE))
+    return index
+
+
+class MemmapImageDataset(Dataset):
+    """
+    Dataset over a cache written by build_cache(). Items are
+    (uint8 tensor (3, H, W), label); transform is applied to the tensor.
+    The memmap is opened lazily so every DataLoader worker maps it itself.
+    """
+
+    def __init__(self, cache_dir, transform=None):
+        self.cache_dir = cache_dir
+        self.transform = transform
+        index = _read_index(cache_dir)
+        if index is None:
+            raise FileNotFoundError(f'No dataset cache in {cache_dir}')
+        self.classes = index['classes']
+        self.shape = tuple(index['shape'])
+        self.rows = np.asarray(index['rows'], dtype=np.int64)
+        labels = np.asarray([entry['label'] for entry in index['entries']], dtype=np.int64)
+        self.targets = labels[self.rows].tolist()
+        self._images = None
+
+    def __len__(self):
+        return len(self.rows)
+
+    @property
+    def images(self):
+        if self._images is None:
+            # Copy-on-write: rows are writable numpy views without copying the file
+            self._images = np.memmap(os.path.join(self.cache_dir, IMAGES_FILE), dtype=np.uint8,
+                                     mode='c', shape=self.shape)
+        return self._images
+
+    def __getstate__(self):
+        # Workers map the file themselves instead of pickling the array
+        state = self.__dict__.copy()
+        state['_images'] = None
+        return state
+
+    def __getitem__(self, index):
+        image = torch.from_numpy(self.images[self.rows[index]])
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, self.targets[index]
@@ -0,0 +1,186 @@
+"""
+Image-level dataset validation: corrupt files, duplicates and split leakage.
+
+inspect_image() fully decodes an image (PIL's verify() alone misses
+truncated JPEGs, which then crash DataLoader workers mid-epoch). It also
+computes two hashes:
+
+- SHA-256 of the file, which finds exact copies.
+- A 64-bit difference hash (dHash) of the 9x8 grayscale thumbnail, which
+  finds re-encoded, resized or lightly edited copies.
+
+validate() inspects images in a process pool. Results are cached in a JSON
+file keyed by path, with each file's size and mtime, so a re-run only
+decodes new or changed files.
+
+Near-duplicate search splits every dHash into max_distance + 1 bands. By
+the pigeonhole principle, two hashes within max_distance bits share at
+least one band exactly. Only images sharing a band are compared, which
+avoids comparing every pair. Duplicates are grouped transitively. A group
+whose images sit in more than one split is a leak: the model is evaluated
+on images it was trained on.
+"""
+
+import json
+import os
+from multiprocessing import Pool
+
+import numpy as np
+from PIL import Image
+
+from src.manifest import content_hash
+
+HASH_BITS = 64
+
+
+def difference_hash(image):
+    """64-bit dHash: whether each pixel of a 9x8 grayscale thumbnail is brighter than its right neighbour."""
+    pixels = np.asarray(image.convert('L').resize((9, 8), Image.BILINEAR), dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int(''.join('1' if bit else '0' for bit in bits), 2)
+
+
+def inspect_image(path):
+    """Decode check and hashes of one file: {size, mtime_ns, sha256, dhash, width, height, error}."""
+    stat = os.stat(path)
+    result = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': None, 'dhash': None,
+              'width': None, 'height': None, 'error': None}
+    try:
+        result['sha256'] = content_hash(path)
+        with Image.open(path) as image:
+            image.verify()
+        # verify() invalidates the image; decode every pixel from a fresh handle
+        with Image.open(path) as image:
+            image.load()
+            result['width'], result['height'] = image.size
+            result['dhash'] = f'{difference_hash(image):016x}'
+    except Exception as e:
+        result['error'] = f'{type(e).__name__}: {e}'
+    return result
+
+
+def _inspect(path):
+    return path, inspect_image(path)
+
+
+def _read_cache(cache_path):
+    try:
+        with open(cache_path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_cache(cache, cache_path):
+    with open(cache_path + '.tmp', 'w') as f:
+        json.dump(cache, f)
+    os.replace(cache_path + '.tmp', cache_path)
+
+
+def inspect_all(paths, cache_path=None, workers=None):
+    """
+    inspect_image() results for every path, reusing cached results of files
+    whose size and mtime are unchanged. Returns (results by path, inspected count).
+    """
+    cache = _read_cache(cache_path) if cache_path else {}
+    results = {}
+    todo = []
+    for path in dict.fromkeys(os.path.abspath(p) for p in paths):
+        cached = cache.get(path)
+        try:
+            stat = os.stat(path)
+        except OSError as e:
+            results[path] = {'error': f'{type(e).__name__}: {e}', 'sha256': None, 'dhash': None}
+            continue
+        if cached and cached['size'] == stat.st_size and cached['mtime_ns'] == stat.st_mtime_ns:
+            results[path] = cached
+        else:
+            todo.append(path)
+
+    if todo:
+        if workers == 1 or len(todo) == 1:
+            results.update(map(_inspect, todo))
+        else:
+            with Pool(workers) as pool:
+                results.update(pool.imap_unordered(_inspect, todo, chunksize=32))
+    if cache_path:
+        # Keep entries of files outside this run (another split or dataset may share the cache)
+        cache.update({path: result for path, result in results.items() if 'size' in result})
+        _write_cache(cache, cache_path)
+    return results, len(todo)
+
+
+def _bands(max_distance):
+    count = max_distance + 1
+    edges = [HASH_BITS * i // count for i in range(count + 1)]
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def near_duplicate_pairs(hashes, max_distance=4):
+    """Index pairs (i, j), i < j, of the int hashes within max_distance differing bits."""
+    pairs = set()
+    for start, end in _bands(max_distance):
+        mask = (1 << (end - start)) - 1
+        buckets = {}
+        for i, value in enumerate(hashes):
+            buckets.setdefault((value >> start) & mask, []).append(i)
+        for members in buckets.values():
+            for a in range(len(members)):
+                for b in range(a + 1, len(members)):
+                    i, j = members[a], members[b]
+                    if (i, j) not in pairs and bin(hashes[i] ^ hashes[j]).count('1') <= max_distance:
+                        pairs.add((i, j))
+    return pairs
+
+
+def _groups(count, pairs):
+    parent = list(range(count))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        parent[find(i)] = find(j)
+    groups = {}
+    for i in range(count):
+        groups.setdefault(find(i), []).append(i)
+    return [members for members in groups.values() if len(members) > 1]
+
+
+def validate(entries, cache_path=None, workers=None, max_distance=4):
+    """
+    Validates (path, split, label) entries. Returns a report with the
+    corrupt files, the groups of exact and near duplicates, and the groups
+    that span more than one split (leaks).
+    """
+    entries = [(os.path.abspath(path), split, label) for path, split, label in entries]
+    results, inspected = inspect_all([path for path, _, _ in entries], cache_path, workers)
+
+    corrupt = [{'path': path, 'split': split, 'label': label, 'error': results[path]['error']}
+               for path, split, label in entries if results[path]['error']]
+    valid = [entry for entry in entries if not results[entry[0]]['error']]
+
+    # Exact copies have equal dHashes, so they pair up here too
+    hashes = [int(results[path]['dhash'], 16) for path, _, _ in valid]
+    pairs = near_duplicate_pairs(hashes, max_distance)
+
+    duplicates = []
+    for members in _groups(len(valid), pairs):
+        images = [{'path': valid[i][0], 'split': valid[i][1], 'label': valid[i][2]} for i in members]
+        duplicates.append({
+            'images': images,
+            'exact': len({results[valid[i][0]]['sha256'] for i in members}) == 1,
+            'splits': sorted({image['split'] for image in images}),
+            'labels': sorted({image['label'] for image in images}),
+        })
+    return {
+        'images': len(entries),
+        'inspected': inspected,
+        'corrupt': corrupt,
+        'duplicate_groups': duplicates,
+        'leaks': [group for group in duplicates if len(group['splits']) > 1],
+        'max_distance': max_distance,
+    }
@@ -0,0 +1,79 @@
+import os
+import threading
+import time
+
+DEADLINE_HEADER = 'X-Deadline-Ms'
+DEADLINE_FIELD = 'deadline_ms'
+
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's latency budget ran out before work could start. Maps to HTTP 504."""
+
+
+class Deadline:
+    """An absolute point in (monotonic) time by which a request must answer."""
+
+    def __init__(self, budget_seconds, start=None):
+        self.budget = float(budget_seconds)
+        self.start = time.monotonic() if start is None else start
+        self.expires_at = self.start + self.budget
+
+    @classmethod
+    def from_request(cls, headers, form=None, start=None):
+        """
+        Reads the latency budget in milliseconds from the X-Deadline-Ms header
+        or the deadline_ms form field. Returns None when the caller set no deadline.
+        """
+        value = headers.get(DEADLINE_HEADER)
+        if value is None and form is not None:
+            value = form.get(DEADLINE_FIELD)
+        if value in (None, ''):
+            return None
+        budget_ms = float(value)
+        if budget_ms < 0:
+            raise ValueError(f"{DEADLINE_HEADER} must be non-negative")
+        return cls(budget_ms / 1000.0, start=start)
+
+    def remaining(self):
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def can_fit(self, seconds):
+        return self.remaining() >= seconds
+
+
+class FrameCostEstimator:
+    """
+    Exponentially weighted estimate of the wall time needed to decode,
+    infer and encode one video frame, used to plan frame budgets.
+    """
+
+    def __init__(self, initial_seconds=None, alpha=0.2):
+        if initial_seconds is None:
+            initial_seconds = float(os.getenv('FRAME_COST_INITIAL_MS', 250)) / 1000.0
+        self._estimate = float(initial_seconds)
+        self._alpha = alpha
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._estimate = (1 - self._alpha) * self._estimate + self._alpha * seconds
+
+    def estimate(self):
+        with self._lock:
+            return self._estimate
+
+    def plan(self, deadline, max_frames, reserve_seconds=0.0, extra_per_frame=0.0):
+        """
+        How many frames fit in the remaining budget (capped at max_frames).
+        extra_per_frame is other work each planned frame brings along.
+        """
+        if deadline is None:
+            return max_frames
+        per_frame = self.estimate() + extra_per_frame
+        available = deadline.remaining() - reserve_seconds
+        if per_frame <= 0:
+            return max_frames
+        return max(0, min(max_frames, int(available // per_frame)))
@@ -0,0 +1,148 @@
+"""
+Multi-process data-parallel training on CPUs (DistributedDataParallel over gloo).
+
+Processes find each other through the same environment variables torchrun
+sets: RANK, WORLD_SIZE, LOCAL_RANK, LOCAL_WORLD_SIZE, MASTER_ADDR and
+MASTER_PORT. launch() starts the processes of one host with those set, so
+train_custom_model.py --nproc N runs N local processes, and the same
+command with --nnodes/--node_rank/--master_addr on every host spans hosts.
+The helpers below are no-ops in a single process.
+"""
+
+import builtins
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import torch
+import torch.distributed as dist
+
+from src import serving
+
+
+def is_distributed():
+    return dist.is_available() and dist.is_initialized()
+
+
+def rank():
+    return dist.get_rank() if is_distributed() else 0
+
+
+def world_size():
+    return dist.get_world_size() if is_distributed() else 1
+
+
+def is_main():
+    return rank() == 0
+
+
+def is_local_main():
+    """First process on this host (for host-local work such as building caches)."""
+    return int(os.environ.get('LOCAL_RANK', 0)) == 0
+
+
+def init_from_env(backend='gloo'):
+    """Joins the process group described by the environment; returns True if distributed."""
+    if int(os.environ.get('WORLD_SIZE', 1)) <= 1:
+        return False
+    dist.init_process_group(backend=backend, init_method='env://')
+    return True
+
+
+def cleanup():
+    if is_distributed():
+        dist.destroy_process_group()
+
+
+def barrier():
+    if is_distributed():
+        dist.barrier()
+
+
+def reduce_sums(*values):
+    """Sums each value over all processes."""
+    if not is_distributed():
+        return list(values)
+    tensor = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor.tolist()
+
+
+def broadcast(value):
+    """Rank 0's value (any picklable object) on every process."""
+    if not is_distributed():
+        return value
+    values = [value]
+    dist.broadcast_object_list(values, src=0)
+    return values[0]
+
+
+def threads_per_process():
+    """This host's CPUs split evenly between its training processes."""
+    local_processes = int(os.environ.get('LOCAL_WORLD_SIZE', 1))
+    return max(1, len(serving.available_cpus()) // local_processes)
+
+
+def silence_non_main():
+    """Only rank 0 prints (print(..., force=True) prints everywhere)."""
+    if is_main():
+        return
+    original = builtins.print
+
+    def print(*args, force=False, **kwargs):
+        if force:
+            original(*args, **kwargs)
+
+    builtins.print = print
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def launch(command, nproc, nnodes=1, node_rank=0, master_addr='127.0.0.1', master_port=29500):
+    """
+    Runs command (argv list) as nproc processes of a world of nnodes * nproc,
+    with ranks node_rank * nproc ... and the distributed environment set.
+    If one process fails the others are stopped. Returns the exit code.
+    """
+    processes = []
+    for local_rank in range(nproc):
+        env = dict(os.environ,
+                   RANK=str(node_rank * nproc + local_rank),
+                   WORLD_SIZE=str(nnodes * nproc),
+                   LOCAL_RANK=str(local_rank),
+                   LOCAL_WORLD_SIZE=str(nproc),
+                   MASTER_ADDR=master_addr,
+                   MASTER_PORT=str(master_port))
+        processes.append(subprocess.Popen(command, env=env))
+
+    exit_code = 0
+    try:
+        while processes:
+            for process in list(processes):
+                code = process.poll()
+                if code is None:
+                    continue
+                processes.remove(process)
+                if code != 0:
+                    exit_code = code
+                    for other in processes:
+                        other.terminate()
+            time.sleep(0.1)
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+        exit_code = 130
+    for process in processes:
+        process.wait()
+    return exit_code
+
+
+def relaunch(nproc, nnodes=1, node_rank=0, master_addr='127.0.0.1', master_port=29500):
+    """Runs the current script as a distributed job and exits with its status."""
+    sys.exit(launch([sys.executable] + sys.argv, nproc, nnodes, node_rank, master_addr, master_port))
@@ -0,0 +1,183 @@
+"""
+Saliency maps that show which parts of a frame drove a fake verdict.
+
+Only frames whose fake score reaches EXPLAIN_THRESHOLD are explained, and
+all of a request's flagged frames are handled in one batch: Grad-CAM (one
+forward and one backward pass) for the CNN handlers, attention rollout (one
+forward pass) for the Hugging Face ViT. Maps are returned as small
+grayscale PNG data URLs and cached by frame content, so viewing the same
+frame again costs nothing.
+"""
+
+import base64
+import hashlib
+import io
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import torch
+import torch.nn.functional as F
+from PIL import Image
+
+from src import metrics
+from src.metrics import stage
+
+# Input size of every model served here
+MODEL_INPUT_SIZE = 224
+
+
+def model_input(image):
+    """The image at the models' input size; the only copy an explanation needs to keep."""
+    return image.resize((MODEL_INPUT_SIZE, MODEL_INPUT_SIZE), Image.BILINEAR)
+
+
+def frame_id(image, model_label=''):
+    """Content hash identifying a frame (and the model that explains it)."""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model_label.encode())
+    digest.update(f'{image.width}x{image.height}'.encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+def encode_heatmap(heatmap):
+    """2-D array in [0, 1] -> 'data:image/png;base64,...' (8-bit grayscale)."""
+    buffer = io.BytesIO()
+    Image.fromarray(np.uint8(np.clip(heatmap, 0, 1) * 255), mode='L').save(buffer, format='PNG', optimize=True)
+    return 'data:image/png;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+
+def _normalize(maps):
+    """Scales each map of a (N, H, W) tensor to [0, 1]."""
+    flat = maps.flatten(1)
+    low = flat.min(dim=1, keepdim=True).values
+    high = flat.max(dim=1, keepdim=True).values
+    return ((flat - low) / (high - low).clamp_min(1e-8)).view_as(maps)
+
+
+class Explainer:
+    """
+    Computes and caches saliency maps for one model handler.
+
+    CustomModelHandler models (CustomCNN, resnet50 and the stub) get
+    Grad-CAM on their last convolutional stage; ModelHandler (HF ViT) gets
+    attention rollout. explain() must run where the model may run, i.e. on
+    an inference thread.
+    """
+
+    def __init__(self, handler, heatmap_size=None, cache_size=None):
+        self.handler = handler
+        self.heatmap_size = int(heatmap_size if heatmap_size is not None
+                                else os.getenv('EXPLAIN_HEATMAP_SIZE', 14))
+        self.cache_size = int(cache_size if cache_size is not None else os.getenv('EXPLAIN_CACHE_SIZE', 256))
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        # Hooks fire for every forward pass, so they only record on the thread that asked for it
+        self._local = threading.local()
+        self._target_layer = self._find_target_layer()
+        if self._target_layer is not None:
+            self._target_layer.register_forward_hook(self._capture)
+            self.method = 'gradcam'
+        else:
+            self.method = 'attention_rollout'
+
+    def _find_target_layer(self):
+        model = self.handler.model
+        if hasattr(self.handler, 'processor'):
+            return None
+        if hasattr(model, 'layer4'):
+            return model.layer4
+        return model.features
+
+    def _capture(self, module, inputs, output):
+        if getattr(self._local, 'capture', False):
+            self._local.activations = output
+
+    def cached(self, key):
+        with self._cache_lock:
+            heatmap = self._cache.get(key)
+            if heatmap is not None:
+                self._cache.move_to_end(key)
+            return heatmap
+
+    def _store(self, key, heatmap):
+        with self._cache_lock:
+            self._cache[key] = heatmap
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def explain(self, items):
+        """
+        items: list of (frame id, PIL image). Returns {frame id: heatmap data URL}.
+        Cached maps are reused; the rest are computed in one batch.
+        """
+        results = {}
+        missing = {}
+        for key, image in items:
+            heatmap = self.cached(key)
+            if heatmap is not None:
+                metrics.count_cache_hit('saliency')
+                results[key] = heatmap
+            else:
+                missing.setdefault(key, image)
+
+        if missing:
+            with stage('explain'):
+                maps = self._compute(list(missing.values()))
+            for key, heatmap in zip(missing, maps):
+                encoded = encode_heatmap(heatmap)
+                self._store(key, encoded)
+                results[key] = encoded
+        return results
+
+    def _compute(self, images):
+        maps = self._gradcam(images) if self.method == 'gradcam' else self._rollout(images)
+        maps = F.interpolate(maps.unsqueeze(1), size=(self.heatmap_size, self.heatmap_size),
+                             mode='bilinear', align_corners=False).squeeze(1)
+        return _normalize(maps).cpu().numpy()
+
+    def _gradcam(self, images):
+        handler = self.handler
+        batch = torch.stack([handler.transform(image) for image in images]).to(handler.device)
+        # Keeps the graph alive up to the target layer even if the weights are frozen
+        batch.requires_grad_(True)
+        self._local.capture = True
+        try:
+            with torch.enable_grad():
+                logits = handler.model(batch)
+                activations = self._local.activations
+                # Samples are independent in eval mode, so one backward pass of
+                # the summed fake logits gives every sample its own gradient
+                score = logits[:, handler.fake_index].sum()
+                gradients, = torch.autograd.grad(score, activations)
+        finally:
+            self._local.capture = False
+            self._local.activations = None
+        weights = gradients.mean(dim=(2, 3), keepdim=True)
+        return F.relu((weights * activations).sum(dim=1)).detach()
+
+    def _rollout(self, images):
+        handler = self.handler
+        inputs = handler.processor(images=list(images), return_tensors='pt')
+        inputs = {k: v.to(handler.device) for k, v in inputs.items()}
+        # The served model is shared with the inference threads, so it is never switched here
+        if getattr(handler.model.config, '_attn_implementation', 'eager') != 'eager':
+            raise RuntimeError('Attention rollout needs eager attention (set EXPLAIN_ROLLOUT=1)')
+        with torch.no_grad():
+            attentions = handler.model(**inputs, output_attentions=True).attentions
+        if not attentions:
+            raise RuntimeError('Model does not return attention weights')
+
+        tokens = attentions[0].shape[-1]
+        rollout = torch.eye(tokens, device=attentions[0].device).expand(len(images), tokens, tokens)
+        for attention in attentions:
+            # Average heads, add the residual connection and renormalise rows
+            layer = attention.mean(dim=1) + torch.eye(tokens, device=attention.device)
+            rollout = (layer / layer.sum(dim=-1, keepdim=True)) @ rollout
+        # Attention from the class token to each patch
+        patches = rollout[:, 0, 1:]
+        side = int(round(patches.shape[-1] ** 0.5))
+        return patches[:, -side * side:].reshape(len(images), side, side)
@@ -0,0 +1,181 @@
+"""
+Face localization ahead of classification.
+
+The classifiers resize whatever they are given to 224x224. On a wide shot
+the face is a few dozen pixels of that, so the model spends most of its
+FLOPs on background. FaceTracker finds faces with a lightweight CPU
+detector on every few frames it is given and follows the boxes in between
+with template matching. crop_faces() cuts the faces out so the service can
+classify all faces of a frame in one batch.
+
+The service only hands the tracker its sampled frames, which are usually
+seconds apart, so the interval counts those frames rather than video
+frames. Tracking across such a gap only holds while the face stays within
+SEARCH_MARGIN of its box (a talking head); otherwise the match falls below
+MIN_TRACK_SCORE and the frame is detected again.
+
+Detectors: OpenCV's YuNet (cv2.FaceDetectorYN) when FACE_DETECTOR_MODEL
+points to its ONNX file, otherwise the Haar frontal face cascade that
+ships with opencv-python. Without either, face cropping is disabled.
+"""
+
+import os
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Faces are detected on frames downscaled to this width
+DETECT_WIDTH = 640
+# Template matching below this correlation counts as a lost track
+MIN_TRACK_SCORE = 0.5
+# How far (fraction of box size) a face may move between tracked frames
+SEARCH_MARGIN = 0.5
+# Context kept around each face when cropping (fraction of box size)
+CROP_MARGIN = 0.3
+
+
+class YuNetDetector:
+    name = 'yunet'
+
+    def __init__(self, model_path, score_threshold=0.7):
+        if not model_path or not os.path.exists(model_path) or not hasattr(cv2, 'FaceDetectorYN'):
+            raise RuntimeError('YuNet model not available')
+        self._detector = cv2.FaceDetectorYN.create(model_path, '', (320, 320), score_threshold)
+
+    def detect(self, frame):
+        height, width = frame.shape[:2]
+        self._detector.setInputSize((width, height))
+        if frame.ndim == 2:
+            frame = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        _, faces = self._detector.detect(frame)
+        if faces is None:
+            return []
+        return [tuple(int(v) for v in face[:4]) for face in faces]
+
+
+class CascadeDetector:
+    name = 'haar'
+
+    def __init__(self):
+        directory = getattr(getattr(cv2, 'data', None), 'haarcascades', '')
+        self._cascade = cv2.CascadeClassifier(os.path.join(directory, 'haarcascade_frontalface_default.xml'))
+        if self._cascade.empty():
+            raise RuntimeError('Haar cascades are not available in this OpenCV build')
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        faces = self._cascade.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=5, minSize=(24, 24))
+        return [tuple(int(v) for v in face) for face in faces]
+
+
+def create_detector():
+    """The best available face detector, or None if there is none."""
+    factories = (lambda: YuNetDetector(os.getenv('FACE_DETECTOR_MODEL', '')), CascadeDetector)
+    for factory in factories:
+        try:
+            return factory()
+        except Exception:
+            continue
+    return None
+
+
+class FaceTracker:
+    """
+    Face boxes for the frames of one video.
+
+    locate() runs the detector on every `detect_interval`-th frame it is
+    given (and whenever a track is lost) and otherwise moves each box to the
+    best template match near its previous position.
+    """
+
+    def __init__(self, detector, detect_interval=None, max_faces=None):
+        self.detector = detector
+        self.detect_interval = int(detect_interval if detect_interval is not None
+                                   else os.getenv('FACE_DETECT_INTERVAL', 3))
+        self.max_faces = int(max_faces if max_faces is not None else os.getenv('FACE_MAX_FACES', 4))
+        self.detections = 0
+        self.tracked = 0
+        # Frames located since the last detection (None before the first)
+        self._since_detection = None
+        # (box in small-frame coordinates, grayscale template)
+        self._tracks = []
+
+    def locate(self, frame):
+        """Face boxes (x, y, w, h) in the coordinates of frame (BGR), for the next frame in order."""
+        small, scale = self._downscale(frame)
+        due = self._since_detection is None or self._since_detection + 1 >= self.detect_interval
+        boxes = None if due else self._track(small)
+        if boxes is None:
+            boxes = self._detect(small)
+            self._since_detection = 0
+        else:
+            self._since_detection += 1
+        return [tuple(int(round(v / scale)) for v in box) for box in boxes]
+
+    def _downscale(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        height, width = gray.shape
+        if width <= DETECT_WIDTH:
+            return gray, 1.0
+        scale = DETECT_WIDTH / width
+        return cv2.resize(gray, (DETECT_WIDTH, int(height * scale)), interpolation=cv2.INTER_AREA), scale
+
+    def _detect(self, small):
+        self.detections += 1
+        boxes = sorted(self.detector.detect(small), key=lambda b: b[2] * b[3], reverse=True)[:self.max_faces]
+        boxes = [_clip(box, small.shape) for box in boxes]
+        boxes = [box for box in boxes if box[2] > 0 and box[3] > 0]
+        self._tracks = [(box, small[box[1]:box[1] + box[3], box[0]:box[0] + box[2]].copy()) for box in boxes]
+        return boxes
+
+    def _track(self, small):
+        """Moves every tracked box; returns None if any track is lost (so the caller re-detects)."""
+        if not self._tracks:
+            return None
+        height, width = small.shape
+        tracks = []
+        for (x, y, w, h), template in self._tracks:
+            mx, my = int(w * SEARCH_MARGIN), int(h * SEARCH_MARGIN)
+            left, top = max(0, x - mx), max(0, y - my)
+            region = small[top:min(height, y + h + my), left:min(width, x + w + mx)]
+            if region.shape[0] < h or region.shape[1] < w:
+                return None
+            scores = cv2.matchTemplate(region, template, cv2.TM_CCOEFF_NORMED)
+            _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+            if best < MIN_TRACK_SCORE:
+                return None
+            box = (left + bx, top + by, w, h)
+            tracks.append((box, small[box[1]:box[1] + h, box[0]:box[0] + w].copy()))
+        self._tracks = tracks
+        self.tracked += 1
+        return [box for box, _ in tracks]
+
+    def stats(self):
+        return {
+            'detector': getattr(self.detector, 'name', None),
+            'detections': self.detections,
+            'trackedFrames': self.tracked,
+        }
+
+
+def _clip(box, shape):
+    x, y, w, h = box
+    height, width = shape[:2]
+    x, y = max(0, x), max(0, y)
+    return x, y, max(0, min(w, width - x)), max(0, min(h, height - y))
+
+
+def crop_faces(image, boxes, margin=CROP_MARGIN):
+    """Square PIL crops around each box (with margin) from an RGB array or PIL image."""
+    pixels = np.asarray(image)
+    height, width = pixels.shape[:2]
+    crops = []
+    for x, y, w, h in boxes:
+        side = int(max(w, h) * (1 + 2 * margin))
+        cx, cy = x + w // 2, y + h // 2
+        left, top = max(0, cx - side // 2), max(0, cy - side // 2)
+        right, bottom = min(width, left + side), min(height, top + side)
+        if right > left and bottom > top:
+            crops.append(Image.fromarray(np.ascontiguousarray(pixels[top:bottom, left:right])))
+    return crops
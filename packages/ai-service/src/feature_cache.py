@@ -0,0 +1,183 @@
+"""
+Frozen-backbone features for head-only training.
+
+When only the classification head of a pretrained model is trained, the
+backbone's output for an image never changes, so it is computed once and
+stored. build_feature_cache() runs the backbone over the images that are
+not cached yet and writes the pooled embeddings as float16 rows of a
+memory-mapped `features.f16`. `index.json` maps a key per image (hash of
+path, size and mtime) to its row. Re-running over a grown or re-split
+dataset only computes the new images.
+
+Backbones: torchvision resnet50 (2048-d pooled features, head `fc`) and
+Hugging Face ViT image classifiers (class token embedding, head
+`classifier`). save() writes the full model with the trained head in the
+format the serving handlers load: a CustomModelHandler checkpoint for
+resnet50, a save_pretrained() directory for ViT (use it as MODEL_PATH).
+"""
+
+import hashlib
+import json
+import os
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+from torch.utils.data import DataLoader, Dataset
+from torchvision import transforms
+
+FEATURES_FILE = 'features.f16'
+INDEX_FILE = 'index.json'
+
+
+def feature_key(path):
+    """Cache key of an image file: changes when the file is replaced or edited."""
+    stat = os.stat(path)
+    return hashlib.sha1(f'{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()
+
+
+class _ImageFiles(Dataset):
+    def __init__(self, paths, transform):
+        self.paths = paths
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, index):
+        with Image.open(self.paths[index]) as image:
+            return self.transform(image.convert('RGB'))
+
+
+class ResNet50Backbone:
+    name = 'resnet50'
+
+    def __init__(self, num_classes=2, pretrained=True):
+        from torchvision.models import resnet50
+
+        self.model = resnet50(pretrained=pretrained)
+        self.dim = self.model.fc.in_features
+        self.model.fc = nn.Linear(self.dim, num_classes)
+        self.model.eval()
+        self.transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406],
+                                 std=[0.229, 0.224, 0.225])
+        ])
+
+    @property
+    def head(self):
+        return self.model.fc
+
+    def features(self, batch):
+        model = self.model
+        x = model.maxpool(model.relu(model.bn1(model.conv1(batch))))
+        x = model.layer4(model.layer3(model.layer2(model.layer1(x))))
+        return torch.flatten(model.avgpool(x), 1)
+
+    def save(self, save_dir, classes, extra=None):
+        path = os.path.join(save_dir, 'head_only_resnet50.pth')
+        torch.save(dict(extra or {}, model_state_dict=self.model.state_dict(), classes=classes,
+                        model_type='resnet50'), path)
+        return path
+
+
+class ViTBackbone:
+    name = 'vit'
+
+    def __init__(self, model_name, num_classes=2):
+        from transformers import AutoImageProcessor, AutoModelForImageClassification
+
+        self.processor = AutoImageProcessor.from_pretrained(model_name)
+        self.model = AutoModelForImageClassification.from_pretrained(model_name)
+        self.dim = self.model.config.hidden_size
+        if self.model.classifier.out_features != num_classes:
+            self.model.classifier = nn.Linear(self.dim, num_classes)
+        self.model.eval()
+        # Cache entries of different ViTs must not mix
+        self.name = f'vit:{model_name}'
+
+    @property
+    def head(self):
+        return self.model.classifier
+
+    def transform(self, image):
+        return self.processor(images=image, return_tensors='pt')['pixel_values'][0]
+
+    def features(self, batch):
+        # The class token embedding is what the classifier sees
+        return self.model.base_model(pixel_values=batch).last_hidden_state[:, 0]
+
+    def save(self, save_dir, classes, extra=None):
+        path = os.path.join(save_dir, 'head_only_vit')
+        self.model.config.id2label = dict(enumerate(classes))
+        self.model.config.label2id = {label: i for i, label in enumerate(classes)}
+        self.model.save_pretrained(path)
+        self.processor.save_pretrained(path)
+        return path
+
+
+def _read_index(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, INDEX_FILE)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def build_feature_cache(backbone, paths, cache_dir, batch_size=64, num_workers=0, device=None):
+    """
+    Makes sure cache_dir holds features for every path (computing only the
+    missing ones). Returns the features as a (len(paths), dim) float32 tensor.
+    """
+    device = device or torch.device('cpu')
+    if not paths:
+        return torch.zeros(0, backbone.dim)
+    keys = [feature_key(path) for path in paths]
+    index = _read_index(cache_dir)
+    if index is None or index['backbone'] != backbone.name or index['dim'] != backbone.dim:
+        index = {'backbone': backbone.name, 'dim': backbone.dim, 'keys': []}
+    old_rows = {key: row for row, key in enumerate(index['keys'])}
+    old_features = None
+    if index['keys']:
+        old_features = np.memmap(os.path.join(cache_dir, FEATURES_FILE), dtype=np.float16, mode='r',
+                                 shape=(len(index['keys']), backbone.dim))
+
+    # Keep every cached row (other splits use them too) and append the new keys
+    all_keys = list(index['keys']) + list(dict.fromkeys(k for k in keys if k not in old_rows))
+    missing = [(i, path) for i, (key, path) in enumerate(zip(keys, paths)) if key not in old_rows]
+    if len(all_keys) == len(index['keys']):
+        return torch.from_numpy(np.asarray(old_features[[old_rows[k] for k in keys]], dtype=np.float32))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = os.path.join(cache_dir, FEATURES_FILE + '.tmp')
+    features = np.memmap(tmp_path, dtype=np.float16, mode='w+', shape=(len(all_keys), backbone.dim))
+    if old_features is not None:
+        features[:len(old_rows)] = old_features
+    rows = {key: row for row, key in enumerate(all_keys)}
+
+    print(f'Computing {backbone.name} features for {len(missing)} images '
+          f'({len(paths) - len(missing)} cached)...')
+    backbone.model.to(device)
+    loader = DataLoader(_ImageFiles([path for _, path in missing], backbone.transform),
+                        batch_size=batch_size, num_workers=num_workers)
+    done = 0
+    with torch.no_grad():
+        for batch in loader:
+            embeddings = backbone.features(batch.to(device)).float().cpu().numpy()
+            for embedding, (i, _) in zip(embeddings, missing[done:done + len(embeddings)]):
+                features[rows[keys[i]]] = embedding
+            done += len(embeddings)
+    features.flush()
+    result = torch.from_numpy(np.asarray(features[[rows[k] for k in keys]], dtype=np.float32))
+    del features, old_features
+
+    # Features first, index last: an interrupted run leaves the old cache intact
+    os.replace(tmp_path, os.path.join(cache_dir, FEATURES_FILE))
+    index['keys'] = all_keys
+    with open(os.path.join(cache_dir, INDEX_FILE + '.tmp'), 'w') as f:
+        json.dump(index, f)
+    os.replace(os.path.join(cache_dir, INDEX_FILE + '.tmp'), os.path.join(cache_dir, INDEX_FILE))
+    return result
@@ -0,0 +1,239 @@
+"""
+Training frames extracted from labeled videos.
+
+Videos are read from video_dir/<label>/, including subfolders. Every video
+is sampled with sample_frame_indices(), the function analyze_video uses, so
+the model trains on the same kind of frames it is served. With face
+cropping, each frame yields the same crops that serving classifies: every
+face found by the FaceTracker, or the whole frame when there is none.
+
+Splits are assigned per video, so frames of one video never end up in
+both train and val. Frames are written straight into
+dataset/<split>/<label>/ as JPEGs, and dataset/manifest.csv lists them
+(see src/manifest.py). Videos are processed in a process pool.
+
+Each finished video is appended to extraction_state.jsonl. A restarted run
+skips the videos recorded there with the same settings. If a video's split
+changed (new ratios or seed), its frames are moved rather than extracted
+again. Frames are written atomically, so a video interrupted mid-way is
+simply extracted again. A video that cannot be read to its last sampled
+frame (e.g. truncated) keeps none of its frames, stays out of the
+manifest and is retried on the next run.
+"""
+
+import hashlib
+import io
+import json
+import os
+from multiprocessing import Pool
+
+import cv2
+from PIL import Image
+
+from src import faces
+from src.manifest import MANIFEST_FILE, assign_splits, write_manifest
+from src.utils import probe_video, sample_frame_indices
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm', '.m4v')
+STATE_FILE = 'extraction_state.jsonl'
+# Frames analyze_video samples per video (InferenceService.video_num_samples)
+DEFAULT_FRAMES_PER_VIDEO = 5
+JPEG_QUALITY = 95
+
+# Set in each extraction worker by _init_worker
+_worker_detector = None
+
+
+def list_videos(video_dir):
+    """{label: [video paths]} with one label per subdirectory of video_dir."""
+    videos = {}
+    for label in sorted(os.listdir(video_dir)):
+        label_dir = os.path.join(video_dir, label)
+        if not os.path.isdir(label_dir):
+            continue
+        paths = []
+        for root, _, files in os.walk(label_dir):
+            paths += [os.path.join(root, name) for name in files if name.lower().endswith(VIDEO_EXTENSIONS)]
+        videos[label] = sorted(paths)
+    return videos
+
+
+def frame_prefix(video_path, video_dir):
+    """File name prefix of a video's frames: its stem plus a hash of its path (stems may repeat)."""
+    relative = os.path.relpath(video_path, video_dir)
+    digest = hashlib.sha1(relative.encode()).hexdigest()[:10]
+    return f'{os.path.splitext(os.path.basename(video_path))[0]}_{digest}'
+
+
+def _init_worker(face_crop):
+    global _worker_detector
+    # Parallelism comes from the pool
+    cv2.setNumThreads(1)
+    _worker_detector = faces.create_detector() if face_crop else None
+
+
+def _write_jpeg(image, path):
+    buffer = io.BytesIO()
+    image.save(buffer, format='JPEG', quality=JPEG_QUALITY)
+    data = buffer.getvalue()
+    with open(path + '.tmp', 'wb') as f:
+        f.write(data)
+    os.replace(path + '.tmp', path)
+    return hashlib.sha256(data).hexdigest()
+
+
+def extract_frames(task):
+    """
+    Writes the sampled frames (or face crops) of one video into out_dir.
+    Returns the task's record with the written frames or an error.
+    """
+    record = dict(task, frames=[], error=None)
+    info = probe_video(task['video'])
+    if info is None or info['total_frames'] <= 0:
+        record['error'] = 'Could not open video file' if info is None else 'Empty video file'
+        return record
+
+    num_samples = min(task['settings']['frames_per_video'], info['total_frames'])
+    tracker = None
+    if task['settings']['face_crop'] and _worker_detector is not None:
+        tracker = faces.FaceTracker(_worker_detector)
+    os.makedirs(task['out_dir'], exist_ok=True)
+
+    cap = cv2.VideoCapture(task['video'])
+    try:
+        for index in sample_frame_indices(info['total_frames'], num_samples):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = cap.read()
+            if not ret:
+                # Recorded as failed, so a restart extracts the video again
+                record['error'] = f'Could not read frame {index}'
+                break
+            rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            boxes = tracker.locate(frame) if tracker is not None else []
+            crops = faces.crop_faces(rgb, boxes) if boxes else []
+            for face, image in enumerate(crops or [Image.fromarray(rgb)]):
+                name = f'{task["prefix"]}_f{index:06d}' + (f'_face{face}' if crops else '') + '.jpg'
+                sha256 = _write_jpeg(image, os.path.join(task['out_dir'], name))
+                record['frames'].append({'file': name, 'frame': index, 'sha256': sha256})
+    except Exception as e:
+        record['error'] = f'{type(e).__name__}: {e}'
+    finally:
+        cap.release()
+    if record['error']:
+        # A partly extracted video is not training data; the next run extracts it again
+        _remove_frames(record)
+        record['frames'] = []
+    return record
+
+
+def read_state(state_path):
+    """{video path: latest record} of an earlier run (a line cut off by a crash is ignored)."""
+    records = {}
+    try:
+        with open(state_path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                records[record['video']] = record
+    except OSError:
+        pass
+    return records
+
+
+def _remove_frames(record):
+    for frame in record['frames']:
+        try:
+            os.remove(os.path.join(record['out_dir'], frame['file']))
+        except FileNotFoundError:
+            pass
+
+
+def _move_frames(record, out_dir):
+    os.makedirs(out_dir, exist_ok=True)
+    for frame in record['frames']:
+        os.replace(os.path.join(record['out_dir'], frame['file']), os.path.join(out_dir, frame['file']))
+
+
+def extract_dataset(video_dir, dataset_dir, frames_per_video=DEFAULT_FRAMES_PER_VIDEO, face_crop=False,
+                    train_ratio=0.7, val_ratio=0.2, seed=0, workers=None, progress=None):
+    """
+    Extracts the frames of every video under video_dir into dataset_dir and
+    writes dataset_dir/manifest.csv. progress(record, done, total) is called
+    after each video. Returns counts of videos and frames.
+    """
+    if face_crop and faces.create_detector() is None:
+        raise RuntimeError('Face cropping needs a face detector (FACE_DETECTOR_MODEL or OpenCV Haar cascades)')
+
+    dataset_dir = os.path.abspath(dataset_dir)
+    rows = [{'path': os.path.abspath(path), 'label': label}
+            for label, paths in list_videos(video_dir).items() for path in paths]
+    # Split whole videos, so no video has frames in two splits
+    assign_splits(rows, train_ratio, val_ratio, seed)
+    settings = {'frames_per_video': frames_per_video, 'face_crop': bool(face_crop)}
+
+    os.makedirs(dataset_dir, exist_ok=True)
+    state_path = os.path.join(dataset_dir, STATE_FILE)
+    previous = read_state(state_path)
+    done = {}
+    tasks = []
+    for row in rows:
+        task = {'video': row['path'], 'label': row['label'], 'split': row['split'], 'settings': settings,
+                'out_dir': os.path.join(dataset_dir, row['split'], row['label']),
+                'prefix': frame_prefix(row['path'], video_dir)}
+        record = previous.get(row['path'])
+        if record and not record['error'] and all(record[key] == task[key] for key in task):
+            done[row['path']] = record
+            continue
+        if record and not record['error'] and record['settings'] == settings and record['label'] == row['label']:
+            # Only the split changed (new ratios or seed): move the frames instead of decoding again
+            try:
+                _move_frames(record, task['out_dir'])
+                done[row['path']] = dict(record, split=row['split'], out_dir=task['out_dir'])
+                continue
+            except OSError:
+                pass
+        if record:
+            # Extracted with other settings
+            _remove_frames(record)
+        tasks.append(task)
+    resumed = len(done)
+
+    # Rewrite the state with the records still valid: drops a line cut off by a crash and stale records
+    with open(state_path + '.tmp', 'w') as state:
+        state.writelines(json.dumps(record) + '\n' for record in done.values())
+    os.replace(state_path + '.tmp', state_path)
+
+    with open(state_path, 'a') as state:
+        def record_all(records):
+            for record in records:
+                # Recorded as soon as it is done: a restart resumes after it
+                state.write(json.dumps(record) + '\n')
+                state.flush()
+                done[record['video']] = record
+                if progress is not None:
+                    progress(record, len(done), len(rows))
+
+        if workers == 1 or len(tasks) <= 1:
+            _init_worker(face_crop)
+            record_all(map(extract_frames, tasks))
+        else:
+            with Pool(workers, initializer=_init_worker, initargs=(face_crop,)) as pool:
+                record_all(pool.imap_unordered(extract_frames, tasks))
+
+    manifest = []
+    for row in rows:
+        record = done[row['path']]
+        if record['error']:
+            continue
+        manifest += [{'path': os.path.join(record['out_dir'], frame['file']), 'label': row['label'],
+                      'split': row['split'], 'sha256': frame['sha256']} for frame in record['frames']]
+    write_manifest(manifest, os.path.join(dataset_dir, MANIFEST_FILE))
+    return {
+        'videos': len(rows),
+        'resumed': resumed,
+        'failed': [{'video': record['video'], 'error': record['error']}
+                   for record in done.values() if record['error']],
+        'frames': len(manifest),
+    }
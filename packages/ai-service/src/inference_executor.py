@@ -0,0 +1,119 @@
+import contextvars
+import os
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import torch
+
+
+class InferenceExecutor:
+    """
+    Runs model inference on a fixed set of threads fed by a queue.
+
+    Request threads only enqueue work and wait on the returned future, so
+    the number of concurrent PyTorch calls (and their intra-op threads) is
+    bounded no matter how many requests are in flight.
+    """
+
+    def __init__(self, handler, num_threads=None, intra_op_threads=None,
+                 inter_op_threads=None, max_queue=None):
+        self.handler = handler
+        self.num_threads = int(num_threads if num_threads is not None
+                               else os.getenv('INFERENCE_THREADS', 1))
+        # 0 means: split the process' torch threads between inference threads
+        self.intra_op_threads = int(intra_op_threads if intra_op_threads is not None
+                                    else os.getenv('INFERENCE_INTRA_OP_THREADS', 0))
+        self.inter_op_threads = int(inter_op_threads if inter_op_threads is not None
+                                    else os.getenv('INFERENCE_INTEROP_THREADS', 0))
+        self._queue = queue.Queue(maxsize=int(max_queue if max_queue is not None
+                                              else os.getenv('INFERENCE_QUEUE_SIZE', 0)))
+        self._threads = []
+        self._pid = None
+        self._lock = threading.Lock()
+
+    @property
+    def model(self):
+        return self.handler.model
+
+    @property
+    def device(self):
+        return self.handler.device
+
+    def submit(self, fn, *args, **kwargs):
+        """Queue fn(*args, **kwargs) for an inference thread; returns a Future."""
+        self._ensure_started()
+        future = Future()
+        # Run in the caller's context so request-scoped state (metric labels) follows the work
+        context = contextvars.copy_context()
+        self._queue.put((future, context, fn, args, kwargs))
+        return future
+
+    def predict(self, image, timeout=None):
+        """Runs handler.predict on an inference thread and waits for the result."""
+        future = self.submit(self.handler.predict, image)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            # Drop the work if it has not started yet
+            future.cancel()
+            raise
+
+    def predict_batch(self, images, timeout=None):
+        """Runs handler.predict_batch on an inference thread and waits for the results."""
+        future = self.submit(self.handler.predict_batch, images)
+        try:
+            return future.result(timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def shutdown(self):
+        with self._lock:
+            for _ in self._threads:
+                self._queue.put(None)
+            for thread in self._threads:
+                thread.join()
+            self._threads = []
+            self._pid = None
+
+    def _ensure_started(self):
+        # Threads do not survive fork(), so (re)start them in each worker process
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            if self.inter_op_threads > 0:
+                try:
+                    torch.set_num_interop_threads(self.inter_op_threads)
+                except RuntimeError:
+                    # Can only be set once, before any inter-op work has started
+                    pass
+            intra = self.intra_op_threads or max(1, torch.get_num_threads() // self.num_threads)
+            self._threads = [
+                threading.Thread(target=self._run, args=(intra,),
+                                 name=f'inference-{i}', daemon=True)
+                for i in range(self.num_threads)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+            print(f"Inference executor: {self.num_threads} threads x {intra} intra-op threads")
+
+    def _run(self, intra_op_threads):
+        torch.set_num_threads(intra_op_threads)
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            future, context, fn, args, kwargs = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(context.run(fn, *args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
@@ -0,0 +1,161 @@
+"""
+Input-pipeline instrumentation and DataLoader tuning for training.
+
+StepTimer splits every training step into the time the loop waited for
+the next batch (data wait) and the time spent on it (compute). When the
+wait is a large part of the step, the input pipeline is the bottleneck.
+
+TimedDataset plus timed_collate measure how long a worker took to build
+each batch. The time travels with the batch (TimedBatch.load_seconds), so
+StepTimer can also report worker utilization: the share of the workers'
+wall time spent loading. Low utilization with a high data wait means too
+few prefetched batches. High utilization means too few workers.
+
+autotune() times a few real training steps for combinations of
+num_workers, prefetch_factor and batch size and picks the fastest.
+"""
+
+import time
+
+from torch.utils.data import Dataset
+from torch.utils.data._utils.collate import default_collate
+
+# Seconds spent in TimedDataset.__getitem__ since the last collate, per process
+# (each DataLoader worker builds its batches one at a time)
+_pending_load_seconds = 0.0
+
+
+class TimedBatch(tuple):
+    """A collated batch that remembers how long it took to load."""
+
+    load_seconds = None
+
+
+class TimedDataset(Dataset):
+    """Wraps a dataset and times item loading; other attributes pass through."""
+
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def __len__(self):
+        return len(self.dataset)
+
+    def __getattr__(self, name):
+        if name == 'dataset':
+            raise AttributeError(name)
+        return getattr(self.dataset, name)
+
+    def __getitem__(self, index):
+        global _pending_load_seconds
+        start = time.perf_counter()
+        item = self.dataset[index]
+        _pending_load_seconds += time.perf_counter() - start
+        return item
+
+
+def timed_collate(samples):
+    global _pending_load_seconds
+    start = time.perf_counter()
+    batch = TimedBatch(default_collate(samples))
+    batch.load_seconds = _pending_load_seconds + time.perf_counter() - start
+    _pending_load_seconds = 0.0
+    return batch
+
+
+class StepTimer:
+    """
+    Per-epoch step timing. Call start() before iterating, batch_ready(batch)
+    as soon as the loop has a batch and step_done(batch_size) after the step.
+    """
+
+    def __init__(self, num_workers=0):
+        self.num_workers = num_workers
+        self.data_wait = 0.0
+        self.compute = 0.0
+        self.load = 0.0
+        self.samples = 0
+        self.steps = 0
+        self._start = None
+        self._mark = None
+
+    def start(self):
+        self._start = self._mark = time.perf_counter()
+
+    def batch_ready(self, batch):
+        now = time.perf_counter()
+        self.data_wait += now - self._mark
+        self._mark = now
+        load_seconds = getattr(batch, 'load_seconds', None)
+        if load_seconds is not None:
+            self.load += load_seconds
+
+    def step_done(self, batch_size):
+        now = time.perf_counter()
+        self.compute += now - self._mark
+        self._mark = now
+        self.samples += batch_size
+        self.steps += 1
+
+    def summary(self):
+        elapsed = (self._mark - self._start) if self._start is not None else 0.0
+        # Without workers the main process loads, and that time is already in data_wait
+        workers = self.num_workers or 1
+        return {
+            'steps': self.steps,
+            'samples': self.samples,
+            'seconds': elapsed,
+            'samples_per_sec': self.samples / elapsed if elapsed > 0 else 0.0,
+            'data_wait_seconds': self.data_wait,
+            'compute_seconds': self.compute,
+            'data_wait_fraction': self.data_wait / elapsed if elapsed > 0 else 0.0,
+            'mean_step_ms': 1000.0 * elapsed / self.steps if self.steps else 0.0,
+            'worker_utilization': min(1.0, self.load / (workers * elapsed)) if elapsed > 0 else 0.0,
+        }
+
+
+def candidate_settings(cpus, batch_sizes, num_workers=None, prefetch_factors=(2, 4)):
+    """(num_workers, prefetch_factor, batch_size) combinations worth trying on this host."""
+    if num_workers is None:
+        num_workers = sorted({0, 2, 4, cpus} & set(range(cpus + 1)) | {0})
+    settings = []
+    for batch_size in batch_sizes:
+        for workers in num_workers:
+            # prefetch_factor only applies with worker processes
+            for prefetch in (prefetch_factors if workers > 0 else (None,)):
+                settings.append((workers, prefetch, batch_size))
+    return settings
+
+
+def autotune(build_loader, run_step, settings, steps=5, warmup=1):
+    """
+    Times warmup + steps training steps per setting. build_loader(num_workers,
+    prefetch_factor, batch_size) returns a DataLoader; run_step(batch) trains
+    on one batch. Returns (best setting, results sorted fastest first).
+    """
+    results = []
+    for workers, prefetch, batch_size in settings:
+        loader = build_loader(workers, prefetch, batch_size)
+        timer = StepTimer(workers)
+        iterator = iter(loader)
+        try:
+            for _ in range(warmup):
+                run_step(next(iterator))
+            timer.start()
+            for _ in range(steps):
+                batch = next(iterator)
+                timer.batch_ready(batch)
+                run_step(batch)
+                timer.step_done(len(batch[-1]))
+        except StopIteration:
+            pass
+        finally:
+            # Shuts the trial's workers down before the next one starts
+            del iterator, loader
+        if timer.steps:
+            results.append(dict(timer.summary(), num_workers=workers, prefetch_factor=prefetch,
+                                batch_size=batch_size))
+    results.sort(key=lambda r: r['samples_per_sec'], reverse=True)
+    if not results:
+        return None, results
+    best = results[0]
+    return (best['num_workers'], best['prefetch_factor'], best['batch_size']), results
@@ -0,0 +1,194 @@
+"""
+Dataset splits recorded in a manifest instead of copied files.
+
+A manifest is a CSV with one row per image: path, label, split and the
+SHA-256 of the file's content. Paths are relative to the manifest's
+directory, so a dataset and its manifest can be moved together.
+assign_splits() shuffles each label with a seed and cuts it by the ratios.
+Re-splitting therefore only rewrites the CSV. Nothing is hashed or copied
+again.
+
+train_custom_model.py --manifest reads the images straight from the
+manifest (ManifestDataset). When a tool needs the usual
+dataset/{train,val,test}/{real,fake} layout, materialize() builds it with
+hard links (or symlinks) from a thread pool. Links take no extra disk
+space, and links left over from an earlier split are removed.
+"""
+
+import csv
+import hashlib
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import Pool
+
+import numpy as np
+from torch.utils.data import Dataset
+from torchvision.datasets.folder import default_loader
+
+MANIFEST_FILE = 'manifest.csv'
+FIELDS = ('path', 'label', 'split', 'sha256')
+SPLITS = ('train', 'val', 'test')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def list_images(directory):
+    """Image files directly in directory, sorted."""
+    return sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                  if name.lower().endswith(IMAGE_EXTENSIONS))
+
+
+def content_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_files(paths, workers=None):
+    """content_hash of every path, computed in a process pool."""
+    if not paths:
+        return []
+    with Pool(workers) as pool:
+        return pool.map(content_hash, paths, chunksize=64)
+
+
+def assign_splits(rows, train_ratio=0.7, val_ratio=0.2, seed=0):
+    """
+    Sets row['split'] for every row: per label, a seeded shuffle of the
+    paths, the first train_ratio to train, the next val_ratio to val and
+    the rest to test. The same rows, ratios and seed give the same splits.
+    """
+    rng = np.random.default_rng(seed)
+    for label in sorted({row['label'] for row in rows}):
+        group = sorted((row for row in rows if row['label'] == label), key=lambda row: row['path'])
+        train_count = int(len(group) * train_ratio)
+        val_count = int(len(group) * val_ratio)
+        for position, index in enumerate(rng.permutation(len(group))):
+            if position < train_count:
+                split = 'train'
+            elif position < train_count + val_count:
+                split = 'val'
+            else:
+                split = 'test'
+            group[index]['split'] = split
+    return rows
+
+
+def build_manifest(images_by_label, train_ratio=0.7, val_ratio=0.2, seed=0, workers=None):
+    """Manifest rows for {label: [image paths]}: hashed in parallel and split."""
+    rows = [{'path': os.path.abspath(path), 'label': label}
+            for label, paths in sorted(images_by_label.items()) for path in paths]
+    for row, sha256 in zip(rows, hash_files([row['path'] for row in rows], workers)):
+        row['sha256'] = sha256
+    return assign_splits(rows, train_ratio, val_ratio, seed)
+
+
+def write_manifest(rows, path):
+    base = os.path.dirname(os.path.abspath(path))
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=FIELDS)
+        writer.writeheader()
+        for row in rows:
+            writer.writerow(dict(row, path=os.path.relpath(row['path'], base)))
+    os.replace(tmp_path, path)
+    return path
+
+
+def read_manifest(path):
+    """Manifest rows with absolute paths."""
+    base = os.path.dirname(os.path.abspath(path))
+    with open(path, newline='') as f:
+        return [dict(row, path=os.path.normpath(os.path.join(base, row['path']))) for row in csv.DictReader(f)]
+
+
+def split_counts(rows):
+    """{split: {label: images}}"""
+    counts = Counter((row['split'], row['label']) for row in rows)
+    labels = sorted({row['label'] for row in rows})
+    return {split: {label: counts[split, label] for label in labels} for split in SPLITS}
+
+
+def _target_names(rows):
+    # Same file name from different source directories: prefix the content hash
+    names = Counter((row['split'], row['label'], os.path.basename(row['path'])) for row in rows)
+    targets = []
+    for row in rows:
+        name = os.path.basename(row['path'])
+        if names[row['split'], row['label'], name] > 1:
+            name = f'{row["sha256"][:12]}_{name}'
+        targets.append(os.path.join(row['split'], row['label'], name))
+    return targets
+
+
+def _link(task):
+    source, target, link = task
+    try:
+        if os.path.samefile(source, target):
+            return
+    except OSError:
+        pass
+    tmp_path = target + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    if link == 'hardlink':
+        try:
+            os.link(source, tmp_path)
+        except OSError:
+            # Different file system: fall back to a symlink
+            os.symlink(source, tmp_path)
+    else:
+        os.symlink(source, tmp_path)
+    os.replace(tmp_path, target)
+
+
+def materialize(rows, out_dir, link='hardlink', workers=16):
+    """
+    Makes out_dir/<split>/<label>/ hold exactly the manifest's images as
+    links. Returns the number of linked files.
+    """
+    targets = [os.path.join(out_dir, target) for target in _target_names(rows)]
+    expected = set(targets)
+    for split in SPLITS:
+        for label in sorted({row['label'] for row in rows}):
+            directory = os.path.join(out_dir, split, label)
+            os.makedirs(directory, exist_ok=True)
+            # Links of an earlier split that are not in this one (regular files are left alone)
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if path not in expected and (os.path.islink(path) or os.stat(path).st_nlink > 1):
+                    os.remove(path)
+
+    tasks = [(row['path'], target, link) for row, target in zip(rows, targets)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(_link, tasks))
+    return len(tasks)
+
+
+def manifest_samples(path, split):
+    """(class names, [(path, class index)]) of one split; classes span all splits, sorted like ImageFolder."""
+    rows = read_manifest(path)
+    classes = sorted({row['label'] for row in rows})
+    class_to_idx = {label: i for i, label in enumerate(classes)}
+    return classes, [(row['path'], class_to_idx[row['label']]) for row in rows if row['split'] == split]
+
+
+class ManifestDataset(Dataset):
+    """One split of a manifest, loaded like ImageFolder (same classes, targets and samples)."""
+
+    def __init__(self, manifest_path, split, transform=None):
+        self.classes, self.samples = manifest_samples(manifest_path, split)
+        self.targets = [label for _, label in self.samples]
+        self.transform = transform
+
+    def __len__(self):
+        return len(self.samples)
+
+    def __getitem__(self, index):
+        path, target = self.samples[index]
+        image = default_loader(path)
+        if self.transform is not None:
+            image = self.transform(image)
+        return image, target
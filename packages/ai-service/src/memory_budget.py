@@ -0,0 +1,201 @@
+import math
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from src.admission import AdmissionRejected
+from src.metrics import peak_resident_memory_bytes, resident_memory_bytes
+
+MB = 1024 * 1024
+
+# Bytes per pixel held while one frame is processed: the decoded BGR frame,
+# its RGB conversion and the PIL copy (PIL stores RGB with 4 bytes per pixel)
+DECODE_BYTES_PER_PIXEL = 3
+WORKING_BYTES_PER_PIXEL = 3 + 3 + 4
+# Bytes per pixel kept until the response is sent: a JPEG (~0.25 B/px at
+# PIL's default quality) as a base64 string (4/3 expansion)
+RETAINED_BYTES_PER_PIXEL = 0.25 * 4 / 3
+# Frames are never downscaled below the model's input size
+MIN_FRAME_EDGE = 224
+
+
+class MemoryBudgetExceeded(Exception):
+    """Raised when a single request needs more memory than the per-request budget. Maps to HTTP 413."""
+
+    def __init__(self, required_bytes, budget_bytes):
+        super().__init__(
+            f'Request needs ~{required_bytes / MB:.0f} MB, over the per-request budget of {budget_bytes / MB:.0f} MB')
+        self.required_bytes = required_bytes
+        self.budget_bytes = budget_bytes
+
+
+class VideoMemoryPlan:
+    def __init__(self, estimate_bytes, max_edge=None):
+        self.estimate_bytes = estimate_bytes
+        # Longest edge sampled frames are resized to before conversion and
+        # encoding (None keeps the source resolution)
+        self.max_edge = max_edge
+
+
+class MemoryBudget:
+    """
+    Up-front memory accounting for inference requests.
+
+    Each request's footprint is estimated from the image header or container
+    metadata before any pixels are decoded. Video requests that do not fit
+    the per-request budget have their sampled frames downscaled; requests
+    that still do not fit are rejected. Admitted requests reserve their
+    estimate against a process-wide budget and are turned away with a 429
+    while it is exhausted.
+    """
+
+    def __init__(self, per_request_bytes=None, global_bytes=None, max_frame_edge=None):
+        self.per_request_bytes = int(per_request_bytes if per_request_bytes is not None
+                                     else float(os.getenv('MEMORY_BUDGET_PER_REQUEST_MB', 512)) * MB)
+        self.global_bytes = int(global_bytes if global_bytes is not None
+                                else float(os.getenv('MEMORY_BUDGET_GLOBAL_MB', 2048)) * MB)
+        # Optional hard cap on the resolution of frames returned to the backend (0 = none)
+        self.max_frame_edge = int(max_frame_edge if max_frame_edge is not None
+                                  else os.getenv('MEMORY_MAX_FRAME_EDGE', 0))
+
+        self._lock = threading.Lock()
+        self._reserved = 0
+        self._rejected = 0
+        self._downscaled = 0
+
+    def frame_estimate(self, width, height, encoded_bytes=0):
+        """Bytes needed to decode one uploaded image (PIL RGB plus its conversion)."""
+        return int(width * height * (4 + 4) + encoded_bytes)
+
+    def check_frame(self, width, height, encoded_bytes=0):
+        estimate = self.frame_estimate(width, height, encoded_bytes)
+        if estimate > self.per_request_bytes:
+            self._count_rejected()
+            raise MemoryBudgetExceeded(estimate, self.per_request_bytes)
+        return estimate
+
+    def video_estimate(self, width, height, frames, scale=1.0):
+        """Bytes needed to sample `frames` frames of a width x height video at `scale`."""
+        pixels = width * height
+        scaled = pixels * scale * scale
+        return int(pixels * DECODE_BYTES_PER_PIXEL
+                   + scaled * WORKING_BYTES_PER_PIXEL
+                   + scaled * frames * RETAINED_BYTES_PER_PIXEL)
+
+    def plan_video(self, width, height, frames):
+        """
+        Returns a VideoMemoryPlan that fits the per-request budget, downscaling
+        the sampled frames if needed. Raises MemoryBudgetExceeded if even
+        MIN_FRAME_EDGE frames do not fit.
+        """
+        longest = max(width, height, 1)
+        scale = 1.0
+        if self.max_frame_edge and longest > self.max_frame_edge:
+            scale = self.max_frame_edge / longest
+
+        estimate = self.video_estimate(width, height, frames, scale)
+        if estimate > self.per_request_bytes:
+            # Solve video_estimate(scale) == budget for scale
+            pixels = width * height
+            per_scaled_pixel = WORKING_BYTES_PER_PIXEL + frames * RETAINED_BYTES_PER_PIXEL
+            room = self.per_request_bytes - pixels * DECODE_BYTES_PER_PIXEL
+            scale = math.sqrt(room / (pixels * per_scaled_pixel)) if room > 0 else 0.0
+            if longest * scale < min(MIN_FRAME_EDGE, longest):
+                self._count_rejected()
+                raise MemoryBudgetExceeded(self.video_estimate(width, height, frames), self.per_request_bytes)
+            with self._lock:
+                self._downscaled += 1
+            estimate = self.video_estimate(width, height, frames, scale)
+
+        max_edge = int(longest * scale) if scale < 1.0 else None
+        return VideoMemoryPlan(estimate, max_edge)
+
+    @contextmanager
+    def reserved(self, estimate_bytes, retry_after=1):
+        """Holds estimate_bytes of the global budget for the duration of the block."""
+        with self._lock:
+            # An idle process always admits one request so oversized budgets cannot deadlock
+            if self._reserved and self._reserved + estimate_bytes > self.global_bytes:
+                self._rejected += 1
+                raise AdmissionRejected('memory_budget', retry_after)
+            self._reserved += estimate_bytes
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._reserved -= estimate_bytes
+
+    def reserved_bytes(self):
+        return self._reserved
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'reserved_bytes': self._reserved,
+                'per_request_budget_bytes': self.per_request_bytes,
+                'global_budget_bytes': self.global_bytes,
+                'rejected_total': self._rejected,
+                'downscaled_total': self._downscaled,
+            }
+
+    def _count_rejected(self):
+        with self._lock:
+            self._rejected += 1
+
+
+class PeakMemoryTracker:
+    """
+    Measures how much memory one request added at its peak.
+
+    The RSS figure is the growth of the process high-water mark if the
+    request raised it, otherwise the RSS still held at the end. It is
+    process-wide, so overlapping requests are attributed to whichever
+    finishes last.
+
+    With MEMORY_TRACEMALLOC=1 the tracemalloc peak (Python and NumPy/OpenCV
+    arrays, not torch tensors) is measured as well. That peak is also
+    process-wide and resetting it would corrupt other requests' figures, so
+    it is only measured for a request that ran alone; traced_bytes stays
+    None for requests that overlapped another tracked one.
+    """
+
+    _lock = threading.Lock()
+    # Trackers currently inside their block, and how many ever entered
+    _active = 0
+    _entered = 0
+
+    def __init__(self):
+        self.rss_bytes = 0
+        self.traced_bytes = None
+
+    def __enter__(self):
+        self._start_rss = resident_memory_bytes()
+        self._start_peak = peak_resident_memory_bytes()
+        with PeakMemoryTracker._lock:
+            PeakMemoryTracker._active += 1
+            PeakMemoryTracker._entered += 1
+            self._entered_at = PeakMemoryTracker._entered
+            self._tracing = (tracemalloc.is_tracing() and hasattr(tracemalloc, 'reset_peak')
+                             and PeakMemoryTracker._active == 1)
+            if self._tracing:
+                self._start_traced = tracemalloc.get_traced_memory()[0]
+                tracemalloc.reset_peak()
+        return self
+
+    def __exit__(self, *exc):
+        end_rss = resident_memory_bytes()
+        end_peak = peak_resident_memory_bytes()
+        high_water = end_peak if end_peak > self._start_peak else end_rss
+        self.rss_bytes = max(high_water - self._start_rss, 0)
+        with PeakMemoryTracker._lock:
+            PeakMemoryTracker._active -= 1
+            # Nobody else entered meanwhile, so the peak is this request's own
+            if self._tracing and PeakMemoryTracker._entered == self._entered_at:
+                self.traced_bytes = max(tracemalloc.get_traced_memory()[1] - self._start_traced, 0)
+        return False
+
+
+def start_tracing_if_enabled():
+    if os.getenv('MEMORY_TRACEMALLOC', '0') == '1' and not tracemalloc.is_tracing():
+        tracemalloc.start()
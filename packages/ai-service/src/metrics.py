@@ -0,0 +1,318 @@
+"""
+Minimal Prometheus-style metrics for the inference service.
+
+Metrics are kept per process; under gunicorn every worker exposes its own
+values and /metrics reports the worker that served the scrape.
+"""
+
+import contextvars
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+from src import profiling
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return '{' + ','.join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class _Metric:
+    type_name = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, **labels):
+        key = tuple(str(labels.get(name, '')) for name in self.labelnames)
+        with self._lock:
+            child = self._children.get(key)
+            if child is None:
+                child = self._children[key] = self._new_child()
+            return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        with self._lock:
+            children = list(self._children.items())
+        for key, child in children:
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self._value += amount
+
+    def get(self):
+        return self._value
+
+    def render(self, name, labelnames, key):
+        return [f'{name}{_format_labels(labelnames, key)} {_format_value(self._value)}']
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+
+    def _new_child(self):
+        return _CounterChild()
+
+
+class _GaugeChild(_CounterChild):
+    def set(self, value):
+        with self._lock:
+            self._value = float(value)
+
+
+class Gauge(_Metric):
+    """A gauge whose value is either set directly or read from a callback at scrape time."""
+
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=(), function=None):
+        super().__init__(name, documentation, labelnames)
+        self._function = function
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set_function(self, function):
+        self._function = function
+
+    def render(self):
+        if self._function is not None:
+            try:
+                self.labels().set(self._function())
+            except Exception:
+                pass
+        return super().render()
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._buckets = buckets
+        self._counts = [0] * len(buckets)
+        self._sum = 0.0
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        with self._lock:
+            self._sum += value
+            self._count += 1
+            for i, bound in enumerate(self._buckets):
+                if value <= bound:
+                    self._counts[i] += 1
+                    break
+
+    def render(self, name, labelnames, key):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self._buckets, counts):
+            cumulative += bucket_count
+            labels = _format_labels(labelnames, key, [('le', _format_value(bound))])
+            lines.append(f'{name}_bucket{labels} {cumulative}')
+        lines.append(f'{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}')
+        lines.append(f'{name}_count{_format_labels(labelnames, key)} {count}')
+        return lines
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self._buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def _new_child(self):
+        return _HistogramChild(self._buckets)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+def resident_memory_bytes():
+    """Current RSS of this process (falls back to peak RSS where /proc is unavailable)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return peak_resident_memory_bytes()
+
+
+def peak_resident_memory_bytes():
+    """High-water mark of this process' RSS."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes elsewhere
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+REGISTRY = Registry()
+
+STAGE_LATENCY = REGISTRY.register(Histogram(
+    'ai_stage_latency_seconds',
+    'Latency of each processing stage (upload_receive, decode, inference, preprocess, '
+    'model_forward, encode, total). inference includes the wait for an inference thread.',
+    ('endpoint', 'model', 'stage')
+))
+REQUESTS = REGISTRY.register(Counter(
+    'ai_requests_total', 'Requests handled, by HTTP status.', ('endpoint', 'model', 'status')
+))
+FRAMES_ANALYZED = REGISTRY.register(Counter(
+    'ai_frames_analyzed_total', 'Frames passed through the model.', ('endpoint', 'model')
+))
+CACHE_HITS = REGISTRY.register(Counter(
+    'ai_cache_hits_total', 'Lookups served from an in-process cache.', ('endpoint', 'model', 'cache')
+))
+ERRORS = REGISTRY.register(Counter(
+    'ai_errors_total', 'Errors by type.', ('endpoint', 'model', 'type')
+))
+ADMISSION_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'ai_admission_queue_depth', 'Requests waiting in the admission queue.'
+))
+INFERENCE_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'ai_inference_queue_depth', 'Work items waiting for an inference thread.'
+))
+MODELS_LOADED = REGISTRY.register(Gauge(
+    'ai_models_loaded', 'Models currently loaded in this process.'
+))
+RESIDENT_MEMORY = REGISTRY.register(Gauge(
+    'ai_process_resident_memory_bytes', 'Resident set size of this process.',
+    function=resident_memory_bytes
+))
+PEAK_RESIDENT_MEMORY = REGISTRY.register(Gauge(
+    'ai_process_peak_resident_memory_bytes', 'Highest resident set size this process has reached.',
+    function=peak_resident_memory_bytes
+))
+MEMORY_RESERVED = REGISTRY.register(Gauge(
+    'ai_memory_reserved_bytes', 'Estimated memory reserved by requests in flight (see MEMORY_BUDGET_GLOBAL_MB).'
+))
+REQUEST_MEMORY = REGISTRY.register(Histogram(
+    'ai_request_peak_memory_bytes',
+    'Memory added by a request at its peak, measured from RSS or tracemalloc (source label). '
+    'Process-wide, so concurrent requests overlap.',
+    ('endpoint', 'model', 'source'),
+    buckets=tuple(mb * 1024 * 1024 for mb in (1, 4, 16, 32, 64, 128, 256, 512, 1024, 2048))
+))
+
+# Labels of the request being processed. Propagated to inference threads by
+# the InferenceExecutor (and to blocking threads in async mode) via contextvars.
+_request_labels = contextvars.ContextVar('request_labels', default=None)
+# Optional list that receives raw (stage, seconds) samples, e.g. for benchmarks
+_stage_collector = contextvars.ContextVar('stage_collector', default=None)
+
+
+def current_labels():
+    return _request_labels.get() or {'endpoint': 'none', 'model': 'none'}
+
+
+@contextmanager
+def request_scope(endpoint, model):
+    """Labels everything recorded inside the block and records its total latency."""
+    token = _request_labels.set({'endpoint': endpoint, 'model': model})
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_LATENCY.labels(endpoint=endpoint, model=model, stage='total').observe(
+            time.perf_counter() - start)
+        _request_labels.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Times one processing stage of the current request (and records a span if it is being profiled)."""
+    session = profiling.active_session()
+    start = time.perf_counter()
+    try:
+        if session is None:
+            yield
+        else:
+            with session.span(name):
+                yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.labels(stage=name, **current_labels()).observe(elapsed)
+        collector = _stage_collector.get()
+        if collector is not None:
+            collector.append((name, elapsed))
+
+
+@contextmanager
+def collect_stages():
+    """Yields a list that collects every (stage, seconds) sample recorded inside the block."""
+    samples = []
+    token = _stage_collector.set(samples)
+    try:
+        yield samples
+    finally:
+        _stage_collector.reset(token)
+
+
+def count_frames(amount=1):
+    FRAMES_ANALYZED.labels(**current_labels()).inc(amount)
+
+
+def count_cache_hit(cache):
+    CACHE_HITS.labels(cache=cache, **current_labels()).inc()
+
+
+def count_error(error_type):
+    ERRORS.labels(type=error_type, **current_labels()).inc()
+
+
+def observe_request_memory(rss_bytes, traced_bytes=None):
+    REQUEST_MEMORY.labels(source='rss', **current_labels()).observe(rss_bytes)
+    if traced_bytes is not None:
+        REQUEST_MEMORY.labels(source='tracemalloc', **current_labels()).observe(traced_bytes)
+
+
+def count_request(status):
+    REQUESTS.labels(status=status, **current_labels()).inc()
+
+
+def render():
+    return REGISTRY.render()
@@ -2,10 +2,16 @@ import torch
 import torch.nn as nn
 from transformers import AutoImageProcessor, AutoModelForImageClassification
 import os
+from src.metrics import stage
 
 class ModelHandler:
-    def __init__(self, model_path: str = None):
+    # Output index of the fake class (label 0 = Fake for the default model)
+    fake_index = 0
+
+    def __init__(self, model_path: str = None, attn_implementation: str = None):
         self.model = None
+        # 'eager' returns attention weights (for attention rollout); None keeps the faster default
+        self.attn_implementation = attn_implementation
         self.processor = None
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         # Default to a known good model if no path provided
@@ -19,7 +25,8 @@ class ModelHandler:
         try:
             print(f"Loading model: {self.model_name}")
             self.processor = AutoImageProcessor.from_pretrained(self.model_name)
-            self.model = AutoModelForImageClassification.from_pretrained(self.model_name)
+            kwargs = {'attn_implementation': self.attn_implementation} if self.attn_implementation else {}
+            self.model = AutoModelForImageClassification.from_pretrained(self.model_name, **kwargs)
             
             self.model = self.model.to(self.device)
             self.model.eval()
@@ -34,48 +41,50 @@ class ModelHandler:
         Runs inference on a PIL Image.
         Returns a dictionary with confidence scores.
         """
+        return self.predict_batch([image])[0]
+
+    def predict_batch(self, images):
+        """
+        Runs inference on a list of PIL Images in one forward pass.
+        Returns one dictionary with confidence scores per image.
+        """
         if self.model is None:
             raise RuntimeError("Model not initialized")
 
         try:
             # Preprocess directly using the model's processor
-            inputs = self.processor(images=image, return_tensors="pt")
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            with stage('preprocess'):
+                inputs = self.processor(images=list(images), return_tensors="pt")
+                inputs = {k: v.to(self.device) for k, v in inputs.items()}
             
-            with torch.no_grad():
+            with torch.no_grad(), stage('model_forward'):
                 outputs = self.model(**inputs)
                 logits = outputs.logits
-                probabilities = torch.nn.functional.softmax(logits, dim=1)
-                
-                # The model maps: 0 -> Fake, 1 -> Real (or vice versa, checking config usually required)
-                # For "prithivMLmods/Deep-Fake-Detector-v2-Model":
-                # Label 0: Fake
-                # Label 1: Real
-                # We verify this mapping from model config commonly.
-                
-                fake_score = probabilities[0][0].item()
-                real_score = probabilities[0][1].item()
+                probabilities = torch.nn.functional.softmax(logits, dim=1).tolist()
                 
-                # Check id2label to be sure if available, defaulting to standard 0=Fake, 1=Real for this model family
-                id2label = self.model.config.id2label
-                if id2label:
-                    # If specific labels exist, map accordingly. 
-                    # Usually {0: 'Fake', 1: 'Real'} or similar.
-                    # We will assume index 0 is Fake for now based on common dataset formatting.
-                    pass
+            # The model maps: 0 -> Fake, 1 -> Real (or vice versa, checking config usually required)
+            # For "prithivMLmods/Deep-Fake-Detector-v2-Model":
+            # Label 0: Fake
+            # Label 1: Real
+            # We verify this mapping from model config commonly.
+            results = []
+            for row in probabilities:
+                fake_score = row[0]
+                real_score = row[1]
 
-                return {
+                results.append({
                     "is_fake": fake_score > real_score,
                     "confidence": max(real_score, fake_score),
                     "distribution": {
                         "real": real_score,
                         "fake": fake_score
                     }
-                }
+                })
+            return results
                 
         except Exception as e:
             print(f"Inference error: {e}")
-            return {
+            return [{
                 "is_fake": False,
                 "confidence": 0.0,
                 "distribution": {
@@ -83,4 +92,4 @@ class ModelHandler:
                     "fake": 0.0
                 },
                 "error": str(e)
-            }
+            } for _ in images]
@@ -0,0 +1,141 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it sends `X-Profile: 1`, or when it is picked by
+1-in-N sampling (PROFILE_SAMPLE_RATE=N). The request runs under
+torch.profiler while metrics.stage() records Python-level spans for each
+stage. Both are written as a single Chrome trace (chrome://tracing or
+Perfetto) to PROFILE_DIR/<profile id>.json, and the id is returned to the caller.
+"""
+
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+PROFILE_HEADER = 'X-Profile'
+
+# torch.profiler is process-wide, so only one request is profiled at a time
+_busy = threading.Lock()
+_sample_counter = itertools.count(1)
+_active_session = contextvars.ContextVar('profile_session', default=None)
+
+
+class ProfileSession:
+    def __init__(self, profile_id, directory):
+        self.id = profile_id
+        self.directory = directory
+        self.path = os.path.join(directory, f'{profile_id}.json')
+        # When the profiler cannot follow work onto other threads, profiled
+        # requests run their inference inline on the request thread instead
+        self.inline_inference = False
+        self._spans = []
+        self._lock = threading.Lock()
+        self._profiler = None
+
+    def start(self):
+        import torch
+        from torch.profiler import ProfilerActivity, profile
+
+        activities = [ProfilerActivity.CPU]
+        if torch.cuda.is_available():
+            activities.append(ProfilerActivity.CUDA)
+        try:
+            config = torch._C._profiler._ExperimentalConfig(profile_all_threads=True)
+            self._profiler = profile(activities=activities, experimental_config=config)
+        except (AttributeError, TypeError):
+            self._profiler = profile(activities=activities)
+            self.inline_inference = True
+        self._profiler.start()
+
+    @contextmanager
+    def span(self, name):
+        start = time.time_ns()
+        try:
+            yield
+        finally:
+            thread = threading.current_thread()
+            with self._lock:
+                self._spans.append((name, start, time.time_ns() - start, thread.ident, thread.name))
+
+    def finish(self):
+        """Stops the profiler and writes the merged trace; returns its path."""
+        self._profiler.stop()
+        os.makedirs(self.directory, exist_ok=True)
+
+        torch_trace_path = f'{self.path}.torch.tmp'
+        self._profiler.export_chrome_trace(torch_trace_path)
+        try:
+            with open(torch_trace_path) as f:
+                trace = json.load(f)
+        finally:
+            os.remove(torch_trace_path)
+
+        # Kineto timestamps are microseconds relative to baseTimeNanoseconds
+        base_ns = int(trace.get('baseTimeNanoseconds', 0))
+        pid = f'request {self.id}'
+        events = trace.setdefault('traceEvents', [])
+        events.append({'ph': 'M', 'name': 'process_name', 'pid': pid, 'tid': 0,
+                       'args': {'name': f'Request spans ({self.id})'}})
+        with self._lock:
+            spans = list(self._spans)
+        for name, start_ns, duration_ns, tid, thread_name in spans:
+            events.append({
+                'ph': 'X', 'cat': 'request_span', 'name': name, 'pid': pid, 'tid': tid,
+                'ts': (start_ns - base_ns) / 1000.0, 'dur': duration_ns / 1000.0,
+                'args': {'thread': thread_name}
+            })
+        trace['profileId'] = self.id
+
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as f:
+            json.dump(trace, f)
+        os.replace(temp_path, self.path)
+        return self.path
+
+
+def should_profile(headers):
+    if str(headers.get(PROFILE_HEADER, '')).lower() in ('1', 'true', 'yes'):
+        return True
+    rate = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    return rate > 0 and next(_sample_counter) % rate == 0
+
+
+def active_session():
+    return _active_session.get()
+
+
+@contextmanager
+def profile_request(headers):
+    """
+    Profiles the enclosed request if it asked for it (or was sampled).
+    Yields the ProfileSession, or None when the request is not profiled
+    or another profile is already being captured.
+    """
+    if not should_profile(headers) or not _busy.acquire(blocking=False):
+        yield None
+        return
+
+    session = ProfileSession(uuid.uuid4().hex[:16], os.getenv('PROFILE_DIR', 'profiles'))
+    try:
+        session.start()
+    except Exception as e:
+        print(f"Could not start profiler: {e}")
+        _busy.release()
+        yield None
+        return
+
+    token = _active_session.set(session)
+    try:
+        yield session
+    finally:
+        _active_session.reset(token)
+        try:
+            session.finish()
+        except Exception as e:
+            print(f"Could not write profile {session.id}: {e}")
+        _busy.release()
@@ -0,0 +1,709 @@
+import base64
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from io import BytesIO
+
+import numpy as np
+from PIL import Image
+
+from src.model_handler import ModelHandler
+from src.custom_model_handler import CustomModelHandler
+from src.stub_model_handler import StubModelHandler
+from src.utils import load_image_from_bytes, probe_image_size, probe_video, sample_frame_indices
+from src.admission import AdmissionController, AdmissionRejected
+from src.deadline import Deadline, DeadlineExceeded, FrameCostEstimator
+from src.inference_executor import InferenceExecutor
+from src.memory_budget import MemoryBudget, MemoryBudgetExceeded, PeakMemoryTracker, start_tracing_if_enabled
+from src import blink
+from src import explain
+from src import faces
+from src import forensics
+from src import metrics
+from src import profiling
+from src import spectral
+from src.metrics import stage
+
+MODEL_VERSION = '1.0.0'
+
+
+class RequestError(Exception):
+    """A client or processing error that maps directly to an HTTP status."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _FrameReader:
+    """
+    Reads sampled frames for analyze_video. Inside the blink tracker's
+    window it decodes sequentially and hands the tracker the frames it asks
+    for along the way; elsewhere it seeks. Indices must be read in order.
+    blink_seconds is the time spent on frames only the tracker needed.
+
+    Under a deadline, model frames come first: blink-only decoding stops
+    once the remaining budget no longer fits reserve() seconds (the
+    planned model frames still to read), and reads seek instead.
+    """
+
+    def __init__(self, cap, tracker=None, deadline=None, reserve=None):
+        import cv2
+
+        self.cap = cap
+        self.tracker = tracker
+        self.deadline = deadline
+        self.reserve = reserve
+        self.position = 0
+        self.blink_seconds = 0.0
+        if tracker is not None:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+
+    def read(self, index):
+        import cv2
+
+        tracker = self.tracker
+        if tracker is None or index >= tracker.window_frames:
+            # Finish the blink window before seeking past it
+            self.finish()
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            ret, frame = self.cap.read()
+            self.position = index + 1
+            return frame if ret else None
+
+        frame = None
+        while self.position <= index:
+            if self.position < index and not self._blink_fits():
+                # Skip the blink-only frames rather than let them delay a model frame
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+                self.position = index
+            start = time.monotonic()
+            if not self.cap.grab():
+                return None
+            if self.position == index or tracker.wants(self.position):
+                ret, frame = self.cap.retrieve()
+                if ret and tracker.wants(self.position):
+                    tracker.update(self.position, frame)
+            if self.position < index:
+                self.blink_seconds += time.monotonic() - start
+            self.position += 1
+        return frame
+
+    def _blink_fits(self):
+        if self.deadline is None:
+            return True
+        reserve = self.reserve() if self.reserve is not None else 0.0
+        return not self.deadline.expired() and self.deadline.can_fit(reserve)
+
+    def finish(self):
+        """Decodes the rest of the blink window (while the budget allows, see _blink_fits)."""
+        tracker = self.tracker
+        start = time.monotonic()
+        while tracker is not None and self.position < tracker.window_frames:
+            if not self._blink_fits():
+                break
+            if not self.cap.grab():
+                break
+            if tracker.wants(self.position):
+                ret, frame = self.cap.retrieve()
+                if ret:
+                    tracker.update(self.position, frame)
+            self.position += 1
+        self.blink_seconds += time.monotonic() - start
+
+
+class InferenceService:
+    """
+    Framework-independent implementation of the inference endpoints.
+
+    The Flask app (app.py) and the asyncio app (serve_async.py) only deal
+    with HTTP I/O; both call into this class for admission control,
+    deadlines, decoding and inference, so their JSON contract is identical.
+    The analyze_* methods block and must run off the event loop in async mode.
+    """
+
+    # Number of keyframes sampled per video
+    video_num_samples = 5
+
+    def __init__(self):
+        self.model_handler = None
+        # Inference threads that run model_handler.predict on behalf of request threads
+        self.executor = None
+        # Admission control shared by the inference endpoints
+        self.admission = AdmissionController()
+        # Measured per-frame cost, used to plan frame budgets under a deadline
+        self.frame_cost = FrameCostEstimator()
+        # Per-request and process-wide memory budgets, estimated before decoding
+        self.memory = MemoryBudget()
+        # Frequency-domain artifact score, optionally used to pick frames for the model
+        self.spectral = spectral.SpectralFilter()
+        # Measured cost of decoding and scoring one pre-filter candidate frame
+        self.candidate_cost = FrameCostEstimator(
+            float(os.getenv('SPECTRAL_CANDIDATE_COST_INITIAL_MS', 25)) / 1000.0)
+        # Temporal blink analysis in the video decode pass (decodes the whole window, so opt-in)
+        self.blink_enabled = os.getenv('BLINK_ANALYSIS', '0') == '1'
+        # Classify face crops instead of whole frames
+        self.face_crop = os.getenv('FACE_CROP', '0') == '1'
+        # Saliency maps for frames whose fake score reaches this threshold (explain=True)
+        self.explain_threshold = float(os.getenv('EXPLAIN_THRESHOLD', 0.5))
+        # Load the Hugging Face ViT with eager attention so attention rollout can explain it
+        self.explain_rollout = os.getenv('EXPLAIN_ROLLOUT', '0') == '1'
+        self.explainer = None
+        self._explainer_lock = threading.Lock()
+        # Landmarkers and face detectors are not thread-safe, so each thread gets its own
+        self._local = threading.local()
+        start_tracing_if_enabled()
+        self.temp_dir = os.path.join(os.getcwd(), 'temp')
+
+        metrics.ADMISSION_QUEUE_DEPTH.set_function(lambda: self.admission.snapshot()['queue_depth'])
+        metrics.INFERENCE_QUEUE_DEPTH.set_function(
+            lambda: self.executor.queue_depth() if self.executor is not None else 0)
+        metrics.MODELS_LOADED.set_function(lambda: 1 if self.model_handler is not None else 0)
+        metrics.MEMORY_RESERVED.set_function(self.memory.reserved_bytes)
+
+    def get_model(self):
+        if self.model_handler is None:
+            model_path = os.getenv('MODEL_PATH', 'models/deepfake_detector.pth')
+            model_type = os.getenv('MODEL_TYPE', 'huggingface')  # 'huggingface', 'custom' or 'stub'
+
+            if model_type == 'stub':
+                # Tiny untrained model for benchmarks and load tests
+                self.model_handler = StubModelHandler()
+                print("Loaded stub model (benchmarking only)")
+            elif model_type == 'custom' and os.path.exists(model_path):
+                # Use custom trained model
+                custom_model_type = os.getenv('CUSTOM_MODEL_TYPE', 'custom_cnn')
+                self.model_handler = CustomModelHandler(model_path=model_path, model_type=custom_model_type)
+                print(f"Loaded custom model: {model_path}")
+            else:
+                # Use Hugging Face model (default)
+                self.model_handler = ModelHandler(
+                    model_path=model_path, attn_implementation='eager' if self.explain_rollout else None)
+                print(f"Loaded Hugging Face model: {model_path}")
+
+        return self.model_handler
+
+    def model_label(self):
+        """Short model name used to label metrics."""
+        handler = self.model_handler
+        if handler is None:
+            return 'none'
+        return getattr(handler, 'model_name', None) or getattr(handler, 'model_type', None) or type(handler).__name__
+
+    def request_scope(self, endpoint):
+        """Labels metrics recorded while handling one request and times it end to end."""
+        return metrics.request_scope(endpoint, self.model_label())
+
+    def metrics_text(self):
+        return metrics.render()
+
+    def profile_request(self, headers):
+        """Profiles the request if it sent X-Profile: 1 or was sampled (see src/profiling.py)."""
+        return profiling.profile_request(headers)
+
+    def _predict(self, executor, image):
+        session = profiling.active_session()
+        with stage('inference'):
+            if session is not None and session.inline_inference:
+                # The profiler cannot see the executor threads on this torch version
+                result = executor.handler.predict(image)
+            else:
+                result = executor.predict(image)
+        metrics.count_frames()
+        if 'error' in result:
+            metrics.count_error('inference_error')
+        return result
+
+    @contextmanager
+    def _track_memory(self):
+        tracker = PeakMemoryTracker()
+        try:
+            with tracker:
+                yield
+        finally:
+            metrics.observe_request_memory(tracker.rss_bytes, tracker.traced_bytes)
+
+    def _classify(self, executor, image, boxes):
+        """
+        Classifies the faces of a frame in one batch; the most suspicious face
+        decides the frame. Falls back to the whole frame when there are no faces.
+        """
+        crops = faces.crop_faces(image, boxes) if boxes else []
+        if not crops:
+            return self._predict(executor, image)
+
+        session = profiling.active_session()
+        with stage('inference'):
+            if session is not None and session.inline_inference:
+                results = executor.handler.predict_batch(crops)
+            else:
+                results = executor.predict_batch(crops)
+        metrics.count_frames()
+        if any('error' in r for r in results):
+            metrics.count_error('inference_error')
+        face_index = max(range(len(results)), key=lambda k: results[k]['distribution']['fake'])
+        return dict(results[face_index], faces=len(crops), faceIndex=face_index)
+
+    def get_explainer(self):
+        with self._explainer_lock:
+            if self.explainer is None:
+                self.explainer = explain.Explainer(self.get_model())
+            return self.explainer
+
+    def _explain_input(self, image, boxes, result):
+        """
+        (frame id, model-sized image) of what decided a flagged frame: the
+        most suspicious face crop, or the whole frame. None below the threshold.
+        """
+        if result['distribution']['fake'] < self.explain_threshold or 'error' in result:
+            return None
+        if 'faceIndex' in result:
+            image = faces.crop_faces(image, boxes)[result['faceIndex']]
+        image = explain.model_input(image)
+        return explain.frame_id(image, self.model_label()), image
+
+    def _explain(self, executor, items, deadline=None):
+        """Heatmaps for (frame id, image) items in one batch on an inference thread: {frame id: data URL}."""
+        if not items or (deadline is not None and deadline.expired()):
+            return {}
+        explainer = self.get_explainer()
+        try:
+            session = profiling.active_session()
+            if session is not None and session.inline_inference:
+                return explainer.explain(items)
+            return executor.submit(explainer.explain, items).result()
+        except Exception as e:
+            # Explanations are optional; the verdict stands without them
+            print(f"Explanation error: {e}")
+            metrics.count_error('explain_error')
+            return {}
+
+    def _explanation(self, heatmaps, item, result):
+        if item is None or item[0] not in heatmaps:
+            return None
+        explanation = {'method': self.explainer.method, 'heatmap': heatmaps[item[0]]}
+        if 'faceIndex' in result:
+            # Index into the frame's faceBoxes; the heatmap covers that face's crop
+            explanation['faceIndex'] = result['faceIndex']
+        return explanation
+
+    def get_executor(self):
+        if self.executor is None:
+            self.executor = InferenceExecutor(self.get_model())
+        return self.executor
+
+    def health(self):
+        handler = self.get_model()
+        return {
+            'status': 'healthy',
+            'service': 'ai-inference',
+            'model_loaded': handler.model is not None,
+            'device': str(handler.device),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'version': '1.0.0',
+            'admission': self.admission.snapshot(),
+            'memory': self.memory.snapshot(),
+            'inference_queue_depth': self.get_executor().queue_depth()
+        }
+
+    def check_admission(self, client_id):
+        """Reject before the upload is read if we are already saturated."""
+        self.admission.check(client_id)
+
+    def parse_deadline(self, headers, form, arrival):
+        """Per-request latency budget from the X-Deadline-Ms header or deadline_ms form field."""
+        try:
+            return Deadline.from_request(headers, form, start=arrival)
+        except ValueError:
+            raise RequestError('Invalid deadline', 400)
+
+    def new_temp_video_path(self):
+        # Unique name so concurrent uploads do not collide
+        os.makedirs(self.temp_dir, exist_ok=True)
+        return os.path.join(self.temp_dir, f"temp_{int(time.time())}_{uuid.uuid4().hex}.mp4")
+
+    def remove_temp_file(self, path):
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def analyze_frame(self, client_id, image_bytes, frame_number=0, deadline=None, forensic=False,
+                      explain=False):
+        """
+        AI verdict for one image; with forensic=True the in-process forensic
+        scores are added, with explain=True a saliency map if it looks fake.
+        """
+        try:
+            width, height = probe_image_size(image_bytes)
+        except Exception:
+            width, height = 0, 0
+        cost = self.admission.request_cost('frame', width, height)
+        memory_estimate = self.memory.check_frame(width, height, len(image_bytes))
+
+        with self.admission.admitted(client_id, cost, deadline), \
+                self.memory.reserved(memory_estimate), self._track_memory():
+            # Process
+            start_time = time.time()
+
+            with stage('decode'):
+                image = load_image_from_bytes(image_bytes)
+
+            face_tracker = self._face_tracker()
+            boxes = []
+            if face_tracker is not None:
+                import cv2
+
+                with stage('face_detect'):
+                    boxes = face_tracker.locate(cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2GRAY))
+
+            # Model handler uses its own processor now; inference runs on the executor threads
+            executor = self.get_executor()
+            result = self._classify(executor, image, boxes)
+
+            explanation = None
+            if explain:
+                item = self._explain_input(image, boxes, result)
+                heatmaps = self._explain(executor, [item] if item else [], deadline)
+                explanation = self._explanation(heatmaps, item, result)
+
+            forensic_result = None
+            if forensic:
+                import cv2
+
+                # BGR like the video path's decoded frames, so the same pixels get the same ELA score
+                with stage('forensic'):
+                    forensic_result = forensics.analyze_frame(
+                        cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR), forensics.image_metadata(image_bytes))
+
+            processing_time = (time.time() - start_time) * 1000  # ms
+
+        response = {
+            'frameNumber': frame_number,
+            'confidence': result['confidence'],
+            'distribution': result['distribution'],
+            'is_fake': result['is_fake'],
+            'processingTime': processing_time,
+            'modelVersion': MODEL_VERSION
+        }
+        if face_tracker is not None:
+            response['faceBoxes'] = [list(box) for box in boxes]
+        if forensic_result is not None:
+            response['forensic'] = forensic_result
+        if explain:
+            # None when the frame is below EXPLAIN_THRESHOLD
+            response['explanation'] = explanation
+        return response
+
+    def analyze_video(self, client_id, video_path, deadline=None, forensic=False, include_frames=None,
+                      explain=False):
+        """
+        AI verdict for a video from evenly spaced sampled frames. With
+        forensic=True each sampled frame also gets the in-process forensic
+        scores, and the base64 frames are left out unless include_frames is set.
+        With explain=True the frames that look fake get saliency maps.
+        """
+        if include_frames is None:
+            include_frames = not forensic
+
+        info = probe_video(video_path)
+        if info is None:
+            raise RequestError('Could not open video file', 400)
+
+        if info['total_frames'] <= 0:
+            raise RequestError('Empty video file', 400)
+
+        samples = min(self.video_num_samples, info['total_frames'])
+        cost = self.admission.request_cost('video', info['width'], info['height'], samples)
+        # Downscales the sampled frames (or rejects) when they would not fit the per-request budget
+        memory_plan = self.memory.plan_video(info['width'], info['height'], samples if include_frames else 0)
+
+        with self.admission.admitted(client_id, cost, deadline), \
+                self.memory.reserved(memory_plan.estimate_bytes), self._track_memory():
+            return self._analyze_video_file(video_path, info, deadline, memory_plan.max_edge,
+                                            forensic, include_frames, explain)
+
+    def _analyze_video_file(self, video_path, info, deadline=None, max_edge=None,
+                            forensic=False, include_frames=True, explain=False):
+        import cv2
+
+        cap = cv2.VideoCapture(video_path)
+        if not cap.isOpened():
+            raise RequestError('Could not open video file', 400)
+
+        total_frames = info['total_frames']
+        fps = info['fps']
+        width = info['width']
+        height = info['height']
+        duration = info['duration']
+
+        # Extract keyframes (e.g., 5 frames evenly spaced), fewer if the
+        # remaining latency budget cannot fit them all
+        requested_samples = min(self.video_num_samples, total_frames)
+        # Each model frame brings candidate_factor candidate decodes with the pre-filter
+        candidates_per_sample = self.spectral.candidate_factor if self.spectral.prefilter else 0
+        num_samples = self.frame_cost.plan(deadline, requested_samples,
+                                           extra_per_frame=candidates_per_sample * self.candidate_cost.estimate())
+        if num_samples == 0:
+            cap.release()
+            raise DeadlineExceeded('Remaining budget cannot fit a single frame')
+        partial = num_samples < requested_samples
+        sample_indices = sample_frame_indices(total_frames, num_samples)
+
+        # Spectral scores: (frame indices, scores) of the scored frames
+        spectral_indices, spectral_scores = [], []
+        reduced_frames = []
+        prefiltered = False
+        # Planned model frames the pre-filter found clean enough to skip
+        prefilter_skipped = 0
+        if self.spectral.prefilter:
+            # Score more candidates than the model budget and send only the
+            # most suspicious to the model (they are decoded again below)
+            candidates = min(total_frames, num_samples * self.spectral.candidate_factor)
+            candidate_indices = sample_frame_indices(total_frames, candidates)
+            for i in candidate_indices:
+                if deadline is not None and deadline.expired():
+                    break
+                candidate_start = time.monotonic()
+                with stage('decode'):
+                    frame = self._read_frame(cap, i)
+                if frame is None:
+                    break
+                spectral_indices.append(i)
+                reduced_frames.append(spectral.reduce_frame(frame))
+                self.candidate_cost.observe(time.monotonic() - candidate_start)
+            if reduced_frames:
+                with stage('spectral'):
+                    spectral_scores = spectral.anomaly_scores(spectral.azimuthal_spectra(np.stack(reduced_frames)))
+                sample_indices = [spectral_indices[k] for k in self.spectral.select(spectral_scores, num_samples)]
+                prefiltered = True
+                prefilter_skipped = num_samples - len(sample_indices)
+
+        frames_results = []
+        frames_base64 = []
+        frame_indices = []
+        forensic_results = []
+        executor = self.get_executor()
+        blink_tracker = self._blink_tracker(fps)
+        # Budget the model frames still to read need; blink-only decoding must leave it free
+        reader = _FrameReader(cap, blink_tracker, deadline,
+                              lambda: self.frame_cost.estimate() * (len(sample_indices) - len(frames_results)))
+        face_tracker = self._face_tracker()
+        face_boxes = []
+        # (position in frameIndices, (frame id, image), result) of the frames to explain
+        explain_items = []
+
+        for i in sample_indices:
+            # Stop sampling once another inference no longer fits the budget
+            if deadline is not None and not deadline.can_fit(self.frame_cost.estimate()):
+                partial = True
+                break
+
+            frame_start = time.monotonic()
+            blink_seconds = reader.blink_seconds
+            with stage('decode'):
+                frame = reader.read(i)
+                if frame is None:
+                    break
+
+                if self.spectral.enabled and not prefiltered:
+                    # Cropped at source resolution, before any downscaling blurs the pixel grid
+                    spectral_indices.append(i)
+                    reduced_frames.append(spectral.reduce_frame(frame))
+
+                if max_edge is not None:
+                    scale = max_edge / max(frame.shape[:2])
+                    frame = cv2.resize(frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+
+                # Convert BGR (OpenCV) to RGB (PIL/Torch)
+                frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                pil_image = Image.fromarray(frame_rgb)
+
+            boxes = []
+            if face_tracker is not None:
+                with stage('face_detect'):
+                    boxes = face_tracker.locate(frame)
+                face_boxes.append([list(box) for box in boxes])
+
+            # Predict
+            result = self._classify(executor, pil_image, boxes)
+            frames_results.append(result)
+
+            if explain:
+                # Kept at model input size, so flagged frames cost little memory until the batch runs
+                item = self._explain_input(pil_image, boxes, result)
+                if item is not None:
+                    explain_items.append((len(frame_indices), item, result))
+
+            if forensic:
+                # On the decoded BGR frame, which is what cv2's JPEG encoder expects
+                with stage('forensic'):
+                    forensic_results.append(forensics.analyze_frame(
+                        frame, forensics.frame_metadata(pil_image.width, pil_image.height)))
+
+            if include_frames:
+                # Convert to base64 for backend
+                with stage('encode'):
+                    buffered = BytesIO()
+                    pil_image.save(buffered, format="JPEG")
+                    img_str = base64.b64encode(buffered.getvalue()).decode("utf-8")
+                    frames_base64.append(f"data:image/jpeg;base64,{img_str}")
+            frame_indices.append(i)
+            # Blink-only decoding is not part of a frame's cost: it stops at the window
+            self.frame_cost.observe(time.monotonic() - frame_start - (reader.blink_seconds - blink_seconds))
+
+            if len(frames_results) >= num_samples:
+                break
+
+        if blink_tracker is not None:
+            with stage('blink'):
+                reader.finish()
+        cap.release()
+
+        # Aggregate results
+        if not frames_results and partial:
+            raise DeadlineExceeded('Deadline expired before any frame was analyzed')
+        if not frames_results:
+            raise RequestError('Could not extract frames', 500)
+
+        explanations = []
+        if explain:
+            # One batch (and backward pass) for all flagged frames
+            heatmaps = self._explain(executor, [item for _, item, _ in explain_items], deadline)
+            for position, item, result in explain_items:
+                explanation = self._explanation(heatmaps, item, result)
+                if explanation is not None:
+                    explanations.append(dict(frameIndex=position, sourceFrame=frame_indices[position],
+                                             **explanation))
+
+        if reduced_frames and not prefiltered:
+            with stage('spectral'):
+                spectral_scores = spectral.anomaly_scores(spectral.azimuthal_spectra(np.stack(reduced_frames)))
+
+        avg_confidence = np.mean([r['confidence'] for r in frames_results])
+        avg_real = np.mean([r['distribution']['real'] for r in frames_results])
+        avg_fake = np.mean([r['distribution']['fake'] for r in frames_results])
+
+        spectral_score = float(np.mean(spectral_scores)) if len(spectral_scores) else None
+        if spectral_score is not None and self.spectral.weight > 0:
+            # Blend the spectral score into the model's distribution
+            weight = self.spectral.weight
+            avg_fake = (1 - weight) * avg_fake + weight * spectral_score
+            avg_real = (1 - weight) * avg_real + weight * (1 - spectral_score)
+
+        is_fake = avg_fake > avg_real
+
+        response = {
+            'type': 'video',
+            'framesAnalyzed': len(frames_results),
+            'framesPlanned': num_samples,
+            'frameIndices': frame_indices,
+            # True when the deadline cut sampling short (best-effort result)
+            'partial': partial,
+            'confidence': float(avg_confidence),
+            'distribution': {
+                'real': float(avg_real),
+                'fake': float(avg_fake)
+            },
+            'is_fake': bool(is_fake),
+            'modelVersion': MODEL_VERSION,
+            # New Metadata
+            'duration': float(duration),
+            'fps': float(fps),
+            'resolution': {'width': width, 'height': height},
+            # Size of the returned frames; smaller than resolution when downscaled to fit the memory budget
+            'frameResolution': {'width': pil_image.width, 'height': pil_image.height},
+            'frames': frames_base64 # Return frames for forensic analysis
+        }
+        if spectral_score is not None:
+            response['spectralScore'] = spectral_score
+            response['spectral'] = {
+                'frameIndices': spectral_indices,
+                'frameScores': [float(score) for score in spectral_scores],
+                # True when the scores chose which frames went to the model
+                'prefiltered': prefiltered,
+                # Why framesAnalyzed can be below framesPlanned without the result being partial
+                'skippedFrames': prefilter_skipped,
+            }
+        if face_tracker is not None:
+            # Boxes per analyzed frame (same order as frameIndices), in frameResolution coordinates
+            response['faceBoxes'] = face_boxes
+            response['faceDetection'] = face_tracker.stats()
+        blink_summary = blink_tracker.summary() if blink_tracker is not None else None
+        if blink_summary is not None:
+            response['blink'] = blink_summary
+            response['blinkScore'] = blink_summary['score']
+            if forensic and blink_summary['score'] is not None:
+                forensic_results = [forensics.with_blink_score(r, blink_summary['score'])
+                                    for r in forensic_results]
+        if forensic:
+            # Same shape the backend builds from the forensic engine's per-frame responses
+            response['forensic'] = forensics.summarize(forensic_results)
+            response['forensicScore'] = response['forensic']['overallScore']
+            response['frameAnalysis'] = [
+                {'frameIndex': i, 'sourceFrame': index, 'forensic': forensic_result}
+                for i, (index, forensic_result) in enumerate(zip(frame_indices, forensic_results))
+            ]
+        if explain:
+            # Only frames at or above EXPLAIN_THRESHOLD
+            response['explanations'] = explanations
+        return response
+
+    def _blink_tracker(self, fps):
+        """A BlinkTracker for one video, or None when disabled or no landmarker is available."""
+        if not self.blink_enabled:
+            return None
+        if not hasattr(self._local, 'landmarker'):
+            self._local.landmarker = blink.create_landmarker()
+        landmarker = self._local.landmarker
+        return blink.BlinkTracker(landmarker, fps) if landmarker is not None else None
+
+    def _face_tracker(self):
+        """A FaceTracker for one request, or None when face cropping is off or no detector is available."""
+        if not self.face_crop:
+            return None
+        if not hasattr(self._local, 'face_detector'):
+            self._local.face_detector = faces.create_detector()
+        detector = self._local.face_detector
+        return faces.FaceTracker(detector) if detector is not None else None
+
+    def _read_frame(self, cap, index):
+        """Seeks to a frame and decodes it; returns the BGR array or None."""
+        import cv2
+
+        cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+        ret, frame = cap.read()
+        return frame if ret else None
+
+    def error_response(self, error, context):
+        """Maps an exception to (payload, status, headers) for either web framework."""
+        metrics.count_error(self._error_type(error))
+        if isinstance(error, AdmissionRejected):
+            return {
+                'error': 'Service overloaded',
+                'reason': error.reason,
+                'retryAfter': error.retry_after,
+                'queueDepth': error.queue_depth
+            }, 429, {'Retry-After': str(error.retry_after)}
+        if isinstance(error, DeadlineExceeded):
+            return {'error': 'Deadline exceeded', 'reason': str(error)}, 504, {}
+        if isinstance(error, MemoryBudgetExceeded):
+            return {'error': 'Request too large', 'reason': str(error)}, 413, {}
+        if isinstance(error, RequestError):
+            return {'error': str(error)}, error.status, {}
+        print(f"Error processing {context}: {error}")
+        return {'error': str(error)}, 500, {}
+
+    def _error_type(self, error):
+        if isinstance(error, AdmissionRejected):
+            return 'overloaded'
+        if isinstance(error, DeadlineExceeded):
+            return 'deadline_exceeded'
+        if isinstance(error, MemoryBudgetExceeded):
+            return 'memory_budget'
+        if isinstance(error, RequestError):
+            return 'bad_request' if error.status < 500 else 'processing_error'
+        return type(error).__name__
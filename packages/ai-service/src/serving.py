@@ -0,0 +1,43 @@
+import os
+
+
+def available_cpus():
+    """CPU ids this process may run on (respects container/cgroup affinity)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(num_workers, slot, cpus=None):
+    """
+    Splits the available CPUs into num_workers contiguous groups and
+    returns the group for the given worker slot. When there are fewer
+    CPUs than workers, groups wrap around and share cores.
+    """
+    cpus = list(cpus) if cpus is not None else available_cpus()
+    num_workers = max(1, int(num_workers))
+    per_worker = max(1, len(cpus) // num_workers)
+    start = (slot * per_worker) % len(cpus)
+    return [cpus[(start + i) % len(cpus)] for i in range(per_worker)]
+
+
+def configure_worker(slot, num_workers):
+    """
+    Pins PyTorch intra-op threads (and optionally CPU affinity) for one
+    worker process so that workers do not oversubscribe the cores.
+    Must run in the worker after fork, before any inference.
+    """
+    import torch
+
+    cores = partition_cores(num_workers, slot)
+    num_threads = int(os.getenv('TORCH_THREADS_PER_WORKER', 0)) or len(cores)
+    torch.set_num_threads(num_threads)
+
+    pinned = False
+    if os.getenv('SERVING_CPU_AFFINITY', '0') == '1' and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+        pinned = True
+
+    print(f"Worker slot {slot} (pid {os.getpid()}): {num_threads} torch threads"
+          f"{' pinned to CPUs ' + str(cores) if pinned else ''}")
+    return cores
@@ -0,0 +1,146 @@
+"""
+Frequency-domain artifact scoring.
+
+The upsampling layers of GAN and diffusion generators repeat a fixed
+pattern every few pixels, which shows up as narrow peaks in the image's
+power spectrum. Natural image spectra are smooth. Each frame's azimuthally
+averaged spectrum is compared against a smooth fit of its high-frequency
+half, and the score is the height of the strongest peak above that fit
+(in standard deviations for the number of spectrum samples in that ring).
+
+It is a heuristic signal, not a classifier. Block-based compression leaves
+peaks of its own at 8-pixel periods, so heavily compressed footage scores
+higher too. It costs a small fraction of a model forward pass, which makes
+it useful for deciding which frames are worth sending to the model.
+"""
+
+import os
+from functools import lru_cache
+
+import cv2
+import numpy as np
+
+# Frames are converted to grayscale and center-cropped to this square size
+# before the FFT. Cropping instead of resizing keeps the pixel grid intact,
+# which is where upsampling artifacts live.
+SPECTRUM_SIZE = 256
+# Part of the spectrum (fraction of the largest radius) searched for peaks
+PEAK_BAND = (0.25, 1.0)
+# Degree of the smooth fit (polynomial in log radius) peaks are measured against
+BASELINE_DEGREE = 3
+# Peak heights (in standard deviations) mapped to scores 0 and 1
+PEAK_Z_BASELINE = 8.0
+PEAK_Z_FULL_SCALE = 40.0
+
+
+def reduce_frame(frame, size=SPECTRUM_SIZE):
+    """Grayscale float32 size x size center crop of a uint8 BGR/RGB (or grayscale) frame."""
+    height, width = frame.shape[:2]
+    if min(height, width) < size:
+        # Too small to crop: upscale the shorter side to size (interpolation adds no periodic artifacts)
+        scale = size / min(height, width)
+        frame = cv2.resize(frame, (max(size, round(width * scale)), max(size, round(height * scale))),
+                           interpolation=cv2.INTER_CUBIC)
+        height, width = frame.shape[:2]
+    top, left = (height - size) // 2, (width - size) // 2
+    crop = frame[top:top + size, left:left + size]
+    if crop.ndim == 3:
+        crop = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
+    return crop.astype(np.float32)
+
+
+@lru_cache(maxsize=4)
+def _radial_layout(size):
+    """Sort order of the shifted spectrum by integer radius, and where each radius starts."""
+    y, x = np.indices((size, size))
+    center = size // 2
+    radius = np.hypot(x - center, y - center).astype(np.int64).ravel()
+    order = np.argsort(radius, kind='stable')
+    sorted_radius = radius[order]
+    starts = np.flatnonzero(np.r_[True, np.diff(sorted_radius) > 0])
+    counts = np.diff(np.r_[starts, sorted_radius.size])
+    window = np.outer(np.hanning(size), np.hanning(size)).astype(np.float32)
+    return order, starts, counts, window
+
+
+def azimuthal_spectra(reduced):
+    """
+    Azimuthally averaged log power spectra for a batch of reduced frames.
+    reduced: array (N, size, size). Returns (N, R) with index = integer radius,
+    up to the spectrum's corners so diagonal (checkerboard) frequencies are included.
+    """
+    batch = np.asarray(reduced, dtype=np.float32)
+    size = batch.shape[-1]
+    order, starts, counts, window = _radial_layout(size)
+
+    # Remove each frame's mean and window it so the image border does not add a cross to the spectrum
+    batch = (batch - batch.mean(axis=(1, 2), keepdims=True)) * window
+    power = np.abs(np.fft.fftshift(np.fft.fft2(batch), axes=(-2, -1))) ** 2
+    radial = np.add.reduceat(power.reshape(len(batch), -1)[:, order], starts, axis=1) / counts
+    return np.log(radial + 1e-8)
+
+
+def anomaly_scores(spectra, size=SPECTRUM_SIZE):
+    """Spectral anomaly score in [0, 1] for each row of azimuthal_spectra()."""
+    spectra = np.asarray(spectra, dtype=np.float64)
+    counts = _radial_layout(size)[2]
+    low = int(spectra.shape[1] * PEAK_BAND[0])
+    high = int(np.ceil(spectra.shape[1] * PEAK_BAND[1]))
+    log_radius = np.log(np.arange(low, high, dtype=np.float64))
+    band = spectra[:, low:high]
+
+    # Smooth baseline for every frame at once (polyfit fits each column of y)
+    coefficients = np.polyfit(log_radius, band.T, BASELINE_DEGREE)
+    baseline = np.vander(log_radius, BASELINE_DEGREE + 1) @ coefficients
+    # The log of a mean of n exponential power samples has a standard deviation of about 1/sqrt(n)
+    z = (band - baseline.T) * np.sqrt(counts[low:high])
+
+    peak = z.max(axis=1)
+    return np.clip((peak - PEAK_Z_BASELINE) / (PEAK_Z_FULL_SCALE - PEAK_Z_BASELINE), 0.0, 1.0)
+
+
+def score_frames(frames):
+    """Spectral anomaly scores for a list of uint8 frames (any sizes)."""
+    if not len(frames):
+        return np.zeros(0)
+    return anomaly_scores(azimuthal_spectra(np.stack([reduce_frame(f) for f in frames])))
+
+
+class SpectralFilter:
+    """
+    Decides which sampled frames get the full model.
+
+    Candidates are scored in one batch; frames at or above `threshold` are
+    kept, most suspicious first, up to `max_frames`. At least `min_frames`
+    of the highest scoring candidates are always kept so every video still
+    gets a model verdict.
+    """
+
+    def __init__(self, enabled=None, candidate_factor=None, threshold=None, min_frames=None, weight=None):
+        # Score the sampled frames and report them (cheap, on by default)
+        self.enabled = (enabled if enabled is not None
+                        else os.getenv('SPECTRAL_ANALYSIS', '1') == '1')
+        # Score candidate_factor x more frames than the model budget and only
+        # run the model on the suspicious ones (0 disables the pre-filter)
+        self.candidate_factor = int(candidate_factor if candidate_factor is not None
+                                    else os.getenv('SPECTRAL_PREFILTER_FACTOR', 0))
+        self.threshold = float(threshold if threshold is not None
+                               else os.getenv('SPECTRAL_PREFILTER_THRESHOLD', 0.25))
+        self.min_frames = int(min_frames if min_frames is not None
+                              else os.getenv('SPECTRAL_PREFILTER_MIN_FRAMES', 1))
+        # Weight of the spectral score in the video's fake probability (0 = report only)
+        self.weight = float(weight if weight is not None
+                            else os.getenv('SPECTRAL_WEIGHT', 0.0))
+
+    @property
+    def prefilter(self):
+        return self.enabled and self.candidate_factor > 1
+
+    def select(self, scores, max_frames):
+        """Indices into scores of the frames that should go to the model, in frame order."""
+        ranked = np.argsort(-np.asarray(scores), kind='stable')
+        keep = [i for i in ranked if scores[i] >= self.threshold][:max_frames]
+        for i in ranked[:min(self.min_frames, max_frames)]:
+            if i not in keep:
+                keep.append(i)
+        return sorted(int(i) for i in keep)
@@ -0,0 +1,46 @@
+import torch
+import torch.nn as nn
+
+from src.custom_model_handler import CustomModelHandler
+
+
+class StubCNN(nn.Module):
+    """
+    A tiny randomly initialised CNN. It produces meaningless scores but
+    exercises the same preprocessing and tensor path as the real models.
+    """
+    def __init__(self, num_classes=2):
+        super(StubCNN, self).__init__()
+        self.features = nn.Sequential(
+            nn.Conv2d(3, 8, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(inplace=True),
+            nn.Conv2d(8, 16, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(inplace=True),
+        )
+        self.classifier = nn.Sequential(
+            nn.AdaptiveAvgPool2d((1, 1)),
+            nn.Flatten(),
+            nn.Linear(16, num_classes)
+        )
+
+    def forward(self, x):
+        return self.classifier(self.features(x))
+
+
+class StubModelHandler(CustomModelHandler):
+    """
+    Handler with the same interface as ModelHandler/CustomModelHandler backed
+    by StubCNN. Used by benchmarks, load tests and tests (MODEL_TYPE=stub) so
+    they run without downloading or training a model. Not for real detection.
+    """
+    def __init__(self, seed: int = 0):
+        self.seed = seed
+        super().__init__(model_path='', model_type='stub')
+
+    def load_model(self):
+        # Deterministic weights without disturbing the global RNG
+        with torch.random.fork_rng():
+            torch.manual_seed(self.seed)
+            self.model = StubCNN(num_classes=2)
+        self.model = self.model.to(self.device)
+        self.model.eval()
@@ -0,0 +1,99 @@
+"""
+Execution options for the training loop in train_custom_model.py.
+
+TrainingMode.cpu_optimized() turns on what helps on CPU-only machines:
+bfloat16 autocast (uses AVX512-BF16/AMX where the CPU has them), the
+channels_last memory format that oneDNN convolutions prefer, torch.compile,
+and an explicit intra-op thread count. The default TrainingMode() is plain
+fp32 eager PyTorch.
+
+The compiled module is only used to run the model. Checkpoints are saved
+from the original module, so their keys stay loadable by
+CustomModelHandler.
+"""
+
+import copy
+import time
+from contextlib import nullcontext
+
+import torch
+
+from src import serving
+
+
+class TrainingMode:
+    def __init__(self, bf16=False, channels_last=False, compile=False, threads=0):
+        self.bf16 = bf16
+        self.channels_last = channels_last
+        self.compile = compile
+        # 0 leaves PyTorch's default thread count alone
+        self.threads = threads
+
+    @classmethod
+    def cpu_optimized(cls, threads=0, compile=True):
+        # One intra-op thread per CPU this process may run on
+        return cls(bf16=True, channels_last=True, compile=compile, threads=threads or len(serving.available_cpus()))
+
+    @property
+    def optimized(self):
+        return self.bf16 or self.channels_last or self.compile
+
+    def describe(self):
+        return {'bf16': self.bf16, 'channels_last': self.channels_last, 'compile': self.compile,
+                'threads': self.threads or torch.get_num_threads()}
+
+    def configure_threads(self):
+        if self.threads:
+            torch.set_num_threads(self.threads)
+
+    def prepare(self, model, wrap=None):
+        """
+        Converts model in place to channels_last and returns the module to
+        call for forward passes: wrap(model) if given (e.g. DDP), compiled if
+        enabled. Save model, not the returned module.
+        """
+        if self.channels_last:
+            model.to(memory_format=torch.channels_last)
+        if wrap is not None:
+            model = wrap(model)
+        if not self.compile:
+            return model
+        # Fall back to eager for graphs the compiler cannot handle (e.g. no C++ toolchain)
+        from torch import _dynamo
+        _dynamo.config.suppress_errors = True
+        return torch.compile(model)
+
+    def inputs(self, data):
+        return data.contiguous(memory_format=torch.channels_last) if self.channels_last else data
+
+    def autocast(self, device):
+        if not self.bf16:
+            return nullcontext()
+        return torch.autocast(device_type=device.type, dtype=torch.bfloat16)
+
+
+def measure_samples_per_sec(model, data, target, criterion, mode, device, lr=0.001, steps=5, warmup=2):
+    """
+    Training throughput of mode on one batch, measured on a copy of model
+    (with its own Adam optimizer) so the real run is not affected.
+    Warmup steps absorb compilation and allocator start-up.
+    """
+    model = copy.deepcopy(model).to(device)
+    model.train()
+    runner = mode.prepare(model)
+    optimizer = torch.optim.Adam(model.parameters(), lr=lr)
+    data, target = mode.inputs(data.to(device)), target.to(device)
+
+    def step():
+        optimizer.zero_grad()
+        with mode.autocast(device):
+            loss = criterion(runner(data), target)
+        loss.backward()
+        optimizer.step()
+
+    for _ in range(warmup):
+        step()
+    start = time.perf_counter()
+    for _ in range(steps):
+        step()
+    return steps * len(data) / (time.perf_counter() - start)
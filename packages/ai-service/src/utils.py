@@ -20,3 +20,41 @@ def preprocess_image(image: Image.Image):
     
     # Add batch dimension
     return transform(image).unsqueeze(0)
+
+def probe_image_size(image_bytes: bytes):
+    """Returns (width, height) from the image header without decoding pixels."""
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        return image.size
+
+def probe_video(video_path: str):
+    """
+    Reads container metadata (frame count, fps, resolution) without decoding frames.
+    Returns None if the file cannot be opened.
+    """
+    import cv2
+
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return None
+    try:
+        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        return {
+            'total_frames': total_frames,
+            'fps': fps,
+            'width': int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'duration': total_frames / fps if fps > 0 else 0,
+        }
+    finally:
+        cap.release()
+
+def sample_frame_indices(total_frames: int, num_samples: int):
+    """
+    Evenly spaced frame indices, as analyze_video samples them: every
+    total_frames // num_samples frames from the first, at most num_samples.
+    """
+    if total_frames <= 0 or num_samples <= 0:
+        return []
+    step = max(1, total_frames // num_samples)
+    return list(range(0, total_frames, step))[:num_samples]
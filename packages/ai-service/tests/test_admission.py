@@ -0,0 +1,70 @@
+import threading
+import time
+
+import pytest
+
+from src.admission import AdmissionController, AdmissionRejected
+
+
+def make_controller(**kwargs):
+    options = dict(max_inflight_cost=2, max_queue_cost=2, max_per_client=10,
+                   queue_timeout=5, frame_weight=1.0, video_weight=2.0)
+    options.update(kwargs)
+    return AdmissionController(**options)
+
+
+def test_video_costs_more_than_frame():
+    controller = make_controller(max_inflight_cost=100)
+    frame = controller.request_cost('frame', 640, 480)
+    video = controller.request_cost('video', 640, 480, frames=5)
+    assert video > frame
+    assert controller.request_cost('frame', 3840, 2160) > frame
+
+
+def test_rejects_when_queue_is_full():
+    controller = make_controller()
+    first = controller.acquire('a', 2)
+
+    waiter_admitted = threading.Event()
+
+    def waiter():
+        with controller.admitted('b', 2):
+            waiter_admitted.set()
+
+    thread = threading.Thread(target=waiter)
+    thread.start()
+    while controller.snapshot()['queue_depth'] == 0:
+        time.sleep(0.01)
+
+    with pytest.raises(AdmissionRejected) as excinfo:
+        controller.acquire('c', 1)
+    assert excinfo.value.retry_after >= 1
+    with pytest.raises(AdmissionRejected):
+        controller.check('d')
+
+    controller.release(first)
+    thread.join(timeout=5)
+    assert waiter_admitted.is_set()
+    assert controller.snapshot()['inflight_requests'] == 0
+
+
+def test_per_client_limit():
+    controller = make_controller(max_inflight_cost=10, max_per_client=1)
+    ticket = controller.acquire('a', 1)
+    with pytest.raises(AdmissionRejected):
+        controller.acquire('a', 1)
+    # Other clients are unaffected
+    controller.release(controller.acquire('b', 1))
+    controller.release(ticket)
+    controller.release(controller.acquire('a', 1))
+
+
+def test_queue_timeout_releases_slot():
+    controller = make_controller(queue_timeout=0.05)
+    ticket = controller.acquire('a', 2)
+    with pytest.raises(AdmissionRejected):
+        controller.acquire('b', 1)
+    snapshot = controller.snapshot()
+    assert snapshot['queue_depth'] == 0
+    assert snapshot['queued_cost'] == 0
+    controller.release(ticket)
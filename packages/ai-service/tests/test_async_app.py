@@ -0,0 +1,88 @@
+import asyncio
+import io
+
+import aiohttp
+import torch
+from aiohttp.test_utils import TestClient, TestServer
+from PIL import Image
+
+import app as flask_module
+from serve_async import create_app
+from src.service import InferenceService
+
+
+class StubHandler:
+    model = object()
+    device = torch.device('cpu')
+
+    def predict(self, image):
+        return {'is_fake': False, 'confidence': 0.7, 'distribution': {'real': 0.7, 'fake': 0.3}}
+
+
+def make_service():
+    service = InferenceService()
+    service.model_handler = StubHandler()
+    return service
+
+
+def jpeg_bytes():
+    buffer = io.BytesIO()
+    Image.new('RGB', (100, 100), color='red').save(buffer, format='JPEG')
+    return buffer.getvalue()
+
+
+async def post_frame_async(client):
+    form = aiohttp.FormData()
+    form.add_field('image', jpeg_bytes(), filename='test.jpg', content_type='image/jpeg')
+    form.add_field('frameNumber', '1')
+    response = await client.post('/inference/analyze-frame', data=form)
+    return response.status, await response.json()
+
+
+def run_async_requests(service):
+    async def scenario():
+        async with TestClient(TestServer(create_app(service))) as client:
+            health = await (await client.get('/health')).json()
+            frame = await post_frame_async(client)
+            missing = await client.post('/inference/analyze-frame', data={})
+            return health, frame, (missing.status, await missing.json())
+    return asyncio.run(scenario())
+
+
+def test_async_app_matches_flask_contract(monkeypatch):
+    health, (status, frame), (missing_status, missing) = run_async_requests(make_service())
+    assert health['status'] == 'healthy'
+    assert status == 200
+    assert missing_status == 400 and 'error' in missing
+
+    monkeypatch.setattr(flask_module, 'service', make_service())
+    client = flask_module.app.test_client()
+    flask_frame = client.post('/inference/analyze-frame', data={
+        'image': (io.BytesIO(jpeg_bytes()), 'test.jpg'),
+        'frameNumber': '1'
+    }, content_type='multipart/form-data').get_json()
+
+    assert set(frame) == set(flask_frame)
+    assert frame['frameNumber'] == flask_frame['frameNumber'] == '1'
+    assert frame['distribution'] == flask_frame['distribution']
+
+
+def test_video_upload_spooled_off_the_event_loop():
+    service = make_service()
+    payload = bytes(range(256)) * 4096
+    received = {}
+
+    def analyze_video(client_id, path, *args):
+        with open(path, 'rb') as f:
+            received['data'] = f.read()
+        return {'type': 'video'}
+    service.analyze_video = analyze_video
+
+    async def scenario():
+        async with TestClient(TestServer(create_app(service))) as client:
+            form = aiohttp.FormData()
+            form.add_field('video', payload, filename='clip.mp4', content_type='video/mp4')
+            response = await client.post('/inference/analyze-video', data=form)
+            return response.status
+    assert asyncio.run(scenario()) == 200
+    assert received['data'] == payload
@@ -0,0 +1,63 @@
+import math
+
+import torch
+from torchvision.transforms import functional as TF
+
+from src.augment import BatchAugment, hue_matrices, normalize
+
+
+def random_batch(count=8, size=32, seed=0):
+    generator = torch.Generator().manual_seed(seed)
+    return torch.randint(0, 256, (count, 3, size, size), dtype=torch.uint8, generator=generator)
+
+
+def only(**kwargs):
+    params = dict(flip_p=0, degrees=0, brightness=0, contrast=0, saturation=0, hue=0,
+                  mean=(0, 0, 0), std=(1, 1, 1), generator=torch.Generator().manual_seed(1))
+    params.update(kwargs)
+    return BatchAugment(**params)
+
+
+def test_flip_is_drawn_per_sample():
+    batch = random_batch(64)
+    out = only(flip_p=0.5)(batch)
+    flipped = [torch.equal(out[i], batch[i].flip(-1).float() / 255) for i in range(64)]
+    kept = [torch.equal(out[i], batch[i].float() / 255) for i in range(64)]
+    assert all(f or k for f, k in zip(flipped, kept))
+    assert 10 < sum(flipped) < 54
+
+
+def test_colour_jitter_matches_torchvision():
+    batch = random_batch(4).float() / 255
+    factors = 0.7 + 0.6 * torch.rand(4, generator=torch.Generator().manual_seed(1))
+    for name, adjust in (('brightness', TF.adjust_brightness), ('contrast', TF.adjust_contrast),
+                         ('saturation', TF.adjust_saturation)):
+        out = only(**{name: 0.3})(batch)
+        expected = torch.stack([adjust(image, float(f)) for image, f in zip(batch, factors)])
+        assert torch.allclose(out, expected, atol=1e-5), name
+
+
+def test_hue_rotation_keeps_grays_and_full_turn_is_identity():
+    gray = torch.full((4, 3, 4, 4), 0.4)
+    assert torch.allclose(only(hue=0.5)(gray), gray, atol=1e-5)
+    batch = random_batch(2).float() / 255
+    assert not torch.allclose(only(hue=0.5)(batch), batch, atol=1e-2)
+    assert torch.allclose(hue_matrices(torch.tensor([2 * math.pi, 0.0])), torch.eye(3).expand(2, 3, 3), atol=1e-5)
+
+
+def test_rotation_fills_corners_and_keeps_center():
+    batch = torch.ones(4, 3, 33, 33)
+    out = only(degrees=45)(batch)
+    assert torch.allclose(out[:, :, 16, 16], torch.ones(4, 3))
+    # Every sample was rotated by a different, non-zero angle, so the corners are uncovered
+    assert (out[:, :, 0, 0] < 1).all()
+
+
+def test_output_is_normalized_float():
+    batch = random_batch(2)
+    out = BatchAugment(flip_p=0, degrees=0, brightness=0, contrast=0, saturation=0, hue=0)(batch)
+    expected = normalize(batch.float() / 255)
+    assert out.dtype == torch.float32 and torch.allclose(out, expected)
+    expected_tv = torch.stack([TF.normalize(image.float() / 255, [0.485, 0.456, 0.406], [0.229, 0.224, 0.225])
+                               for image in batch])
+    assert torch.allclose(out, expected_tv, atol=1e-6)
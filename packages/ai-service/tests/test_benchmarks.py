@@ -0,0 +1,57 @@
+from benchmarks.load_test import find_knee, summarize
+from benchmarks.run_benchmarks import compare, percentiles
+from src import metrics
+
+
+def result(fps, p95, rss):
+    return {'benchmarks': {'analyze_frame[360p]': {
+        'frames_per_sec': fps, 'latency_ms': {'p95': p95}, 'peak_rss_mb': rss
+    }}}
+
+
+def test_compare_flags_only_regressions_beyond_threshold():
+    baseline = result(100.0, 10.0, 500.0)
+
+    assert compare(baseline, result(95.0, 10.5, 520.0), threshold=0.10) == []
+    # Getting faster or leaner is never a regression
+    assert compare(baseline, result(200.0, 5.0, 300.0), threshold=0.10) == []
+
+    regressions = compare(baseline, result(80.0, 12.0, 500.0), threshold=0.10)
+    assert {r['metric'] for r in regressions} == {'frames_per_sec', 'latency_ms.p95'}
+    assert next(r for r in regressions if r['metric'] == 'frames_per_sec')['change_pct'] == -20.0
+
+
+def test_compare_ignores_benchmarks_missing_from_baseline():
+    assert compare({'benchmarks': {}}, result(1.0, 1000.0, 1000.0)) == []
+
+
+def test_percentiles_and_stage_collection():
+    assert percentiles([]) == {}
+    assert percentiles([1.0, 2.0, 3.0])['p50'] == 2.0
+
+    with metrics.collect_stages() as samples:
+        with metrics.stage('decode'):
+            pass
+    assert [name for name, _ in samples] == ['decode']
+
+
+def level(concurrency, rps, rejected=0.0, errors=0.0):
+    return {'concurrency': concurrency, 'throughput_rps': rps,
+            'rejected_429_rate': rejected, 'error_rate': errors}
+
+
+def test_find_knee_at_throughput_plateau_or_rejections():
+    assert find_knee([level(1, 10), level(2, 19), level(4, 30), level(8, 30.5)]) == 4
+    assert find_knee([level(1, 10), level(2, 19), level(4, 36, rejected=0.2)]) == 2
+    assert find_knee([level(1, 10), level(2, 19)]) is None
+
+
+def test_summarize_counts_status_classes():
+    records = [('frame', 200, 0.01, 1, 0), ('video', 200, 0.1, 5, 0),
+               ('frame', 429, 0.001, 1, 0), ('frame', 'error', 0.5, 0, 0)]
+    summary = summarize(4, records, window=2.0)
+
+    assert summary['throughput_rps'] == 1.0
+    assert summary['frames_per_sec'] == 3.0
+    assert summary['rejected_429_rate'] == 0.25
+    assert summary['error_rate'] == 0.25
@@ -0,0 +1,121 @@
+import time
+
+import cv2
+import numpy as np
+
+from src.blink import BlinkTracker, eye_aspect_ratio
+from src.deadline import Deadline, FrameCostEstimator
+from src.service import InferenceService
+from src.stub_model_handler import StubModelHandler
+
+
+class BrightnessLandmarker:
+    """Reports an EAR proportional to frame brightness: dark frames are 'closed eyes'."""
+
+    name = 'test'
+
+    def ear(self, gray):
+        return float(gray.mean()) / 255 * 0.3
+
+
+def feed(tracker, blink_seconds, seconds=30.0, fps=10.0):
+    for k in range(int(seconds * fps)):
+        t = k / fps
+        closed = any(abs(t - b) < 0.05 for b in blink_seconds)
+        tracker.observe(t, 0.08 if closed else 0.3)
+
+
+def test_eye_aspect_ratio():
+    open_eye = [(0, 0), (1, -1), (2, -1), (3, 0), (2, 1), (1, 1)]
+    assert abs(eye_aspect_ratio(open_eye) - 2 / 3) < 1e-9
+
+
+def test_natural_blinking_scores_low_and_missing_or_metronomic_blinking_high():
+    natural = BlinkTracker(None, fps=10, analysis_fps=10, window_seconds=30)
+    feed(natural, [1.3, 4.0, 5.1, 9.8, 12.0, 16.9, 18.2, 23.5, 27.7])
+    summary = natural.summary()
+    assert summary['blinks'] == 9
+    assert summary['blinkRate'] == 18.0
+    assert summary['score'] < 0.3
+
+    none = BlinkTracker(None, fps=10, analysis_fps=10, window_seconds=30)
+    feed(none, [])
+    assert none.summary()['score'] == 1.0
+
+    metronome = BlinkTracker(None, fps=10, analysis_fps=10, window_seconds=30)
+    feed(metronome, [3.0 * k for k in range(1, 10)])
+    assert metronome.summary()['irregularity'] < 0.05
+    assert metronome.summary()['score'] > 0.8
+
+
+class SlowLandmarker(BrightnessLandmarker):
+    delay = 0.005
+
+    def ear(self, gray):
+        time.sleep(self.delay)
+        return super().ear(gray)
+
+
+def blink_clip(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    blink_frames = {30, 31, 90, 91, 150, 151}
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 20, (160, 120))
+    for i in range(200):
+        out.write(np.full((120, 160, 3), 40 if i in blink_frames else 200, dtype=np.uint8))
+    out.release()
+    return path
+
+
+def blink_service(landmarker):
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    service.blink_enabled = True
+    service._local.landmarker = landmarker
+    return service
+
+
+def test_blink_tracking_runs_in_the_video_decode_pass(tmp_path):
+    path = blink_clip(tmp_path)
+    service = blink_service(BrightnessLandmarker())
+    result = service.analyze_video('test', path)
+
+    assert result['frameIndices'] == [0, 40, 80, 120, 160]
+    blink = result['blink']
+    assert blink['analysisFps'] == 10
+    assert blink['samples'] == 100
+    assert blink['blinks'] == 3
+    assert result['blinkScore'] == blink['score']
+
+    # With a deadline that has time left, the window is still decoded to its end
+    result = service.analyze_video('test', path, deadline=Deadline(60))
+    assert result['blink']['samples'] == 100 and result['blink']['blinks'] == 3
+    service.executor.shutdown()
+
+
+def test_model_frames_take_priority_over_blink_decoding(tmp_path, monkeypatch):
+    # Samples 0, 40 and 80 fall in the 5 s window, 120 and 160 after it
+    monkeypatch.setenv('BLINK_WINDOW_SECONDS', '5')
+    landmarker = SlowLandmarker()
+    landmarker.delay = 0.02
+    service = blink_service(landmarker)
+    service.frame_cost = FrameCostEstimator(initial_seconds=0.2, alpha=0.0)
+    deadline = Deadline(1.1)
+    result = service.analyze_video('test', blink_clip(tmp_path), deadline=deadline)
+
+    # All 50 window samples would take 1 s of landmarking on top of 5 x 0.2 s of model frames
+    assert result['framesAnalyzed'] == 5 and not result['partial']
+    assert result['blink']['samples'] < 50
+    assert time.monotonic() - deadline.expires_at < 0.1
+    service.executor.shutdown()
+
+
+def test_blink_decoding_is_left_out_of_the_frame_cost(tmp_path):
+    service = blink_service(SlowLandmarker())
+    service.frame_cost = FrameCostEstimator(initial_seconds=0.0, alpha=1.0)
+    result = service.analyze_video('test', blink_clip(tmp_path))
+
+    # 20 tracked frames (0.1 s of landmarking) lie between two sampled frames
+    assert result['blink']['samples'] == 100
+    assert service.frame_cost.estimate() < 0.05
+    assert InferenceService().blink_enabled is False
+    service.executor.shutdown()
@@ -0,0 +1,72 @@
+import json
+import os
+import sys
+
+import torch
+
+import train_custom_model
+from src.checkpoint import AsyncCheckpointer, ResumableSampler, latest_checkpoint, snapshot
+from src.stub_model_handler import StubCNN
+from tests.test_feature_cache import make_images
+
+
+def test_snapshot_is_independent_of_later_updates():
+    weights = torch.zeros(3)
+    state = snapshot({'model': {'w': weights}, 'steps': [1, 2]})
+    weights += 1
+    assert state['model']['w'].tolist() == [0, 0, 0] and state['steps'] == [1, 2]
+
+
+def test_retention_keeps_last_and_best(tmp_path):
+    checkpointer = AsyncCheckpointer(str(tmp_path), 'net', keep_last=2, keep_best=2)
+    for step, metric in [(1, 50.0), (2, 90.0), (3, 60.0), (4, 70.0), (5, None)]:
+        checkpointer.save({'step': torch.tensor(step)}, step, metric=metric)
+    checkpointer.close()
+
+    assert sorted(os.listdir(tmp_path)) == [
+        'best_model_net_step00000002.pth', 'best_model_net_step00000004.pth',
+        'checkpoint_net_step00000004.pth', 'checkpoint_net_step00000005.pth', 'checkpoints.json']
+    assert latest_checkpoint(str(tmp_path)).endswith('checkpoint_net_step00000005.pth')
+    assert torch.load(tmp_path / 'best_model_net_step00000002.pth')['step'] == 2
+
+    # A new checkpointer continues the retention of the directory
+    checkpointer = AsyncCheckpointer(str(tmp_path), 'net', keep_last=2, keep_best=2)
+    assert checkpointer.is_best(80.0) and not checkpointer.is_best(65.0)
+
+
+def test_resumable_sampler_skips_within_one_epoch():
+    sampler = ResumableSampler(range(10), seed=1)
+    sampler.set_epoch(3)
+    order = list(sampler)
+    assert sorted(order) == list(range(10))
+    sampler.skip(4)
+    assert list(sampler) == order[4:] and len(sampler) == 6
+    sampler.set_epoch(3)
+    assert list(sampler) == order
+
+
+def test_resume_continues_mid_epoch(tmp_path, monkeypatch):
+    for split in ('train', 'val'):
+        make_images(str(tmp_path / 'data' / split / 'fake'), ['red', 'orange', 'maroon'])
+        make_images(str(tmp_path / 'data' / split / 'real'), ['blue', 'navy', 'teal'])
+    save_dir = tmp_path / 'models'
+    monkeypatch.setattr(train_custom_model, 'CustomCNN', StubCNN)
+
+    def train(*extra):
+        monkeypatch.setattr(sys, 'argv', [
+            'train_custom_model.py', '--data_dir', str(tmp_path / 'data'), '--batch_size', '2',
+            '--num_workers', '0', '--save_dir', str(save_dir), '--keep_last', '10', *extra])
+        train_custom_model.main()
+
+    # 3 steps per epoch
+    train('--epochs', '2', '--checkpoint_steps', '2')
+    assert json.loads((save_dir / 'checkpoints.json').read_text())['last'][-1]['step'] == 6
+    checkpoint = torch.load(save_dir / 'checkpoint_custom_cnn_step00000004.pth')
+    assert (checkpoint['epoch'], checkpoint['epoch_samples']) == (1, 2)
+
+    train('--epochs', '3', '--resume', str(save_dir / 'checkpoint_custom_cnn_step00000004.pth'))
+    history = json.loads((save_dir / 'training_history.json').read_text())
+    assert len(history['train_loss']) == 3
+    # Two steps left in epoch 2, three in epoch 3
+    assert [timing['steps'] for timing in history['step_timing']] == [3, 2, 3]
+    assert latest_checkpoint(str(save_dir)).endswith('step00000009.pth')
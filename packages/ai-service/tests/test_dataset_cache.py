@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+import torch
+from PIL import Image
+from torch.utils.data import DataLoader
+
+from src.dataset_cache import MemmapImageDataset, build_cache
+
+
+def make_image_folder(root, per_class=3, size=(40, 30)):
+    rng = np.random.default_rng(0)
+    for label in ('fake', 'real'):
+        os.makedirs(root / label)
+        for i in range(per_class):
+            pixels = rng.integers(0, 256, size=(size[1], size[0], 3), dtype=np.uint8)
+            Image.fromarray(pixels).save(root / label / f'{i}.jpg')
+
+
+def test_cache_matches_decoded_images_and_skips_corrupt_files(tmp_path):
+    make_image_folder(tmp_path / 'train')
+    (tmp_path / 'train' / 'real' / 'broken.jpg').write_bytes(b'not a jpeg')
+
+    index = build_cache(str(tmp_path / 'train'), str(tmp_path / 'cache'), image_size=32, num_workers=2)
+    assert index['classes'] == ['fake', 'real']
+    assert len(index['entries']) == 7 and len(index['rows']) == 6
+
+    dataset = MemmapImageDataset(str(tmp_path / 'cache'))
+    assert len(dataset) == 6 and sorted(dataset.targets) == [0, 0, 0, 1, 1, 1]
+    image, label = dataset[0]
+    assert image.dtype == torch.uint8 and image.shape == (3, 32, 32)
+
+    with Image.open(index['entries'][0]['path']) as source:
+        expected = np.asarray(source.convert('RGB').resize((32, 32), Image.BILINEAR)).transpose(2, 0, 1)
+    assert np.array_equal(image.numpy(), expected) and label == 0
+
+
+def test_cache_is_reused_until_sources_change(tmp_path):
+    make_image_folder(tmp_path / 'train')
+    cache = str(tmp_path / 'cache')
+    build_cache(str(tmp_path / 'train'), cache, image_size=16, num_workers=1)
+    written = os.stat(os.path.join(cache, 'images.u8')).st_mtime_ns
+
+    build_cache(str(tmp_path / 'train'), cache, image_size=16, num_workers=1)
+    assert os.stat(os.path.join(cache, 'images.u8')).st_mtime_ns == written
+
+    Image.new('RGB', (20, 20), 'red').save(tmp_path / 'train' / 'fake' / 'new.jpg')
+    assert len(build_cache(str(tmp_path / 'train'), cache, image_size=16, num_workers=1)['rows']) == 7
+
+
+def test_dataset_works_with_dataloader_workers(tmp_path):
+    make_image_folder(tmp_path / 'train')
+    build_cache(str(tmp_path / 'train'), str(tmp_path / 'cache'), image_size=16, num_workers=1)
+    dataset = MemmapImageDataset(str(tmp_path / 'cache'), transform=lambda image: image.float() / 255)
+    batches = list(DataLoader(dataset, batch_size=4, num_workers=2))
+    assert sum(len(labels) for _, labels in batches) == 6
+    assert batches[0][0].dtype == torch.float32
@@ -0,0 +1,58 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from src.dataset_validation import difference_hash, inspect_all, near_duplicate_pairs, validate
+
+
+def noise_image(path, seed, size=48, **save_kwargs):
+    pixels = np.random.default_rng(seed).integers(0, 256, (size, size, 3), dtype=np.uint8)
+    Image.fromarray(pixels).save(path, **save_kwargs)
+    return str(path)
+
+
+def test_near_duplicate_pairs_match_brute_force():
+    rng = np.random.default_rng(0)
+    hashes = [int(value) for value in rng.integers(0, 2**63, 200, dtype=np.int64)]
+    # Copies with up to 5 flipped bits
+    hashes += [value ^ sum(1 << int(bit) for bit in rng.choice(64, flips, replace=False))
+               for value, flips in zip(hashes[:50], [0, 1, 2, 3, 4, 5] * 9)]
+    expected = {(i, j) for i in range(len(hashes)) for j in range(i + 1, len(hashes))
+                if bin(hashes[i] ^ hashes[j]).count('1') <= 4}
+    assert near_duplicate_pairs(hashes, 4) == expected
+    assert len(expected) >= 40
+
+
+def test_validation_reports_corrupt_duplicates_and_leaks(tmp_path):
+    original = noise_image(tmp_path / 'a.png', 1)
+    # Same picture re-encoded and resized: different bytes, same dHash neighbourhood
+    with Image.open(original) as image:
+        image.resize((40, 40)).save(tmp_path / 'a_small.jpg', quality=90)
+    copy = tmp_path / 'a_copy.png'
+    copy.write_bytes(open(original, 'rb').read())
+    other = noise_image(tmp_path / 'b.png', 2)
+    broken = tmp_path / 'broken.jpg'
+    noise_image(tmp_path / 'c.jpg', 3, quality=95)
+    broken.write_bytes((tmp_path / 'c.jpg').read_bytes()[:400])
+
+    entries = [(original, 'train', 'real'), (str(tmp_path / 'a_small.jpg'), 'val', 'real'),
+               (str(copy), 'train', 'real'), (other, 'test', 'fake'), (str(broken), 'train', 'fake')]
+    cache = str(tmp_path / 'cache.json')
+    report = validate(entries, cache, workers=2)
+
+    assert report['inspected'] == 5
+    assert [image['path'] for image in report['corrupt']] == [str(broken)]
+    assert len(report['duplicate_groups']) == 1
+    group = report['duplicate_groups'][0]
+    assert sorted(os.path.basename(image['path']) for image in group['images']) == ['a.png', 'a_copy.png',
+                                                                                   'a_small.jpg']
+    assert not group['exact'] and report['leaks'] == [group] and group['splits'] == ['train', 'val']
+
+    # Only new or changed files are decoded again
+    noise_image(tmp_path / 'b.png', 4)
+    os.utime(tmp_path / 'b.png', ns=(1, 1))
+    results, inspected = inspect_all([path for path, _, _ in entries], cache, workers=1)
+    assert inspected == 1
+    with Image.open(tmp_path / 'b.png') as image:
+        assert results[other]['dhash'] == f'{difference_hash(image):016x}'
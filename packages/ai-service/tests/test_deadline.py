@@ -0,0 +1,39 @@
+import pytest
+
+from src.admission import AdmissionController
+from src.deadline import Deadline, DeadlineExceeded, FrameCostEstimator
+
+
+def test_deadline_from_header_and_form():
+    assert Deadline.from_request({}) is None
+    deadline = Deadline.from_request({'X-Deadline-Ms': '1500'}, start=0.0)
+    assert deadline.expires_at == pytest.approx(1.5)
+    deadline = Deadline.from_request({}, {'deadline_ms': '250'}, start=0.0)
+    assert deadline.budget == pytest.approx(0.25)
+    with pytest.raises(ValueError):
+        Deadline.from_request({'X-Deadline-Ms': 'soon'})
+
+
+def test_plan_fits_frames_into_budget():
+    estimator = FrameCostEstimator(initial_seconds=0.1)
+    assert estimator.plan(None, 5) == 5
+    assert estimator.plan(Deadline(0.35), 5) == 3
+    assert estimator.plan(Deadline(10), 5) == 5
+    assert estimator.plan(Deadline(0.05), 5) == 0
+
+    estimator.observe(1.1)
+    assert estimator.estimate() == pytest.approx(0.3)
+
+
+def test_queued_request_cancelled_when_deadline_passes():
+    controller = AdmissionController(max_inflight_cost=1, max_queue_cost=4,
+                                     max_per_client=10, queue_timeout=5)
+    ticket = controller.acquire('a', 1)
+    with pytest.raises(DeadlineExceeded):
+        controller.acquire('b', 1, Deadline(0.05))
+    assert controller.snapshot()['queue_depth'] == 0
+    assert controller.snapshot()['deadline_cancelled_total'] == 1
+    controller.release(ticket)
+
+    with pytest.raises(DeadlineExceeded):
+        controller.acquire('c', 1, Deadline(0))
@@ -0,0 +1,43 @@
+import sys
+
+from benchmarks.ddp_scaling import process_counts, run
+from src import distributed
+
+ALL_REDUCE_SCRIPT = '''
+import os, sys
+sys.path.insert(0, os.getcwd())
+from src import distributed
+assert distributed.init_from_env()
+total, = distributed.reduce_sums(distributed.rank() + 1)
+with open(os.path.join(sys.argv[1], f"rank{distributed.rank()}"), "w") as f:
+    f.write(str(int(total)))
+distributed.cleanup()
+'''
+
+
+def test_single_process_helpers_are_no_ops():
+    assert not distributed.is_distributed()
+    assert distributed.is_main() and distributed.world_size() == 1
+    assert distributed.reduce_sums(1.5, 2) == [1.5, 2]
+
+
+def test_launch_starts_a_process_group(tmp_path):
+    code = distributed.launch([sys.executable, '-c', ALL_REDUCE_SCRIPT, str(tmp_path)], nproc=3,
+                              master_port=distributed.free_port())
+    assert code == 0
+    # Every rank saw 1 + 2 + 3
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['rank0', 'rank1', 'rank2']
+    assert all(p.read_text() == '6' for p in tmp_path.iterdir())
+
+
+def test_launch_reports_failures():
+    assert distributed.launch([sys.executable, '-c', 'import sys; sys.exit(3)'], nproc=2,
+                              master_port=distributed.free_port()) == 3
+
+
+def test_ddp_training_keeps_replicas_in_sync():
+    assert process_counts(6) == [1, 2, 4, 6]
+    rows = run([1, 2], model='stub', batch_size=4, image_size=16, steps=2, warmup=1)
+    assert [row['processes'] for row in rows] == [1, 2]
+    assert rows[0]['efficiency'] == 1.0
+    assert all(row['replicas_in_sync'] and row['samples_per_sec'] > 0 for row in rows)
@@ -0,0 +1,109 @@
+import base64
+import io
+
+import numpy as np
+import pytest
+import torch
+from PIL import Image
+from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+
+from src import metrics
+from src import service as service_module
+from src.deadline import Deadline
+from src.explain import Explainer, frame_id, model_input
+from src.model_handler import ModelHandler
+from src.service import InferenceService
+from src.stub_model_handler import StubModelHandler
+
+
+def random_images(count, size=64):
+    rng = np.random.default_rng(0)
+    return [Image.fromarray(rng.integers(0, 256, size=(size, size, 3), dtype=np.uint8)) for _ in range(count)]
+
+
+def decode(data_url):
+    return np.asarray(Image.open(io.BytesIO(base64.b64decode(data_url.split(',', 1)[1]))))
+
+
+def test_batched_gradcam_matches_single_frames():
+    explainer = Explainer(StubModelHandler(), heatmap_size=8)
+    assert explainer.method == 'gradcam'
+    images = random_images(3)
+    batched = explainer._compute(images)
+    single = np.concatenate([explainer._compute([image]) for image in images])
+    assert batched.shape == (3, 8, 8)
+    assert np.allclose(batched, single, atol=1e-4)
+
+
+def test_heatmaps_are_cached_by_frame_id(monkeypatch):
+    explainer = Explainer(StubModelHandler(), heatmap_size=8)
+    images = random_images(2)
+    items = [(frame_id(image), image) for image in images]
+    first = explainer.explain(items)
+    assert decode(first[items[0][0]]).shape == (8, 8)
+
+    monkeypatch.setattr(explainer, '_compute', lambda images: (_ for _ in ()).throw(AssertionError('recomputed')))
+    hits = metrics.CACHE_HITS.labels(cache='saliency', **metrics.current_labels()).get()
+    assert explainer.explain(items) == first
+    assert metrics.CACHE_HITS.labels(cache='saliency', **metrics.current_labels()).get() == hits + 2
+
+
+def test_attention_rollout_for_vit(tmp_path):
+    vit_dir = str(tmp_path / 'tiny-vit')
+    config = ViTConfig(image_size=32, patch_size=8, hidden_size=16, num_hidden_layers=2,
+                       num_attention_heads=2, intermediate_size=32, num_labels=2)
+    ViTForImageClassification(config).save_pretrained(vit_dir)
+    ViTImageProcessor(size={'height': 32, 'width': 32}).save_pretrained(vit_dir)
+
+    # Eager attention is chosen at load time, before any inference thread uses the model
+    handler = ModelHandler(model_path=vit_dir, attn_implementation='eager')
+    explainer = Explainer(handler, heatmap_size=4)
+    assert explainer.method == 'attention_rollout'
+    maps = explainer._compute(random_images(2))
+    assert maps.shape == (2, 4, 4)
+    assert maps.min() >= 0 and maps.max() <= 1
+
+    # The default (sdpa) model is left alone: no maps, and predictions keep their attention kernels
+    handler = ModelHandler(model_path=vit_dir)
+    implementation = handler.model.config._attn_implementation
+    with pytest.raises(RuntimeError, match='EXPLAIN_ROLLOUT'):
+        Explainer(handler)._compute(random_images(1))
+    assert handler.model.config._attn_implementation == implementation
+
+
+def test_explain_rollout_loads_the_served_vit_with_eager_attention(monkeypatch):
+    loaded = {}
+    monkeypatch.setattr(service_module, 'ModelHandler', lambda **kwargs: loaded.update(kwargs) or object())
+    monkeypatch.setenv('MODEL_TYPE', 'huggingface')
+    monkeypatch.setenv('EXPLAIN_ROLLOUT', '1')
+    InferenceService().get_model()
+    assert loaded['attn_implementation'] == 'eager'
+
+    monkeypatch.setenv('EXPLAIN_ROLLOUT', '0')
+    InferenceService().get_model()
+    assert loaded['attn_implementation'] is None
+
+
+def test_analyze_frame_explains_only_flagged_frames():
+    buffer = io.BytesIO()
+    random_images(1, size=96)[0].save(buffer, format='PNG')
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+
+    service.explain_threshold = 0.0
+    result = service.analyze_frame('test', buffer.getvalue(), explain=True)
+    assert result['explanation']['method'] == 'gradcam'
+    assert decode(result['explanation']['heatmap']).shape == (14, 14)
+
+    # A deadline with time left still gets its explanation
+    result = service.analyze_frame('test', buffer.getvalue(), deadline=Deadline(60), explain=True)
+    assert result['explanation']['method'] == 'gradcam'
+
+    service.explain_threshold = 1.1
+    assert service.analyze_frame('test', buffer.getvalue(), explain=True)['explanation'] is None
+    assert 'explanation' not in service.analyze_frame('test', buffer.getvalue())
+    service.executor.shutdown()
+
+
+def test_model_input_is_model_sized():
+    assert model_input(random_images(1, size=300)[0]).size == (224, 224)
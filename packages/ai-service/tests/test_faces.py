@@ -0,0 +1,94 @@
+import cv2
+import numpy as np
+import torch
+from PIL import Image
+
+from src.faces import FaceTracker, crop_faces
+from src.service import InferenceService
+from src.stub_model_handler import StubModelHandler
+
+
+class BrightBlobDetector:
+    """Detects bright rectangles on a dark background as 'faces'."""
+
+    name = 'test'
+
+    def detect(self, frame):
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+        _, mask = cv2.threshold(gray, 100, 255, cv2.THRESH_BINARY)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+        return [cv2.boundingRect(c) for c in contours]
+
+
+def frame_with_faces(index, width=1280, height=720, speed=0.25):
+    """Two faces drifting right by `speed` pixels per frame (a talking head moves little)."""
+    rng = np.random.default_rng(0)
+    frame = np.zeros((height, width, 3), dtype=np.uint8)
+    for x0 in (200, 800):
+        x = x0 + int(index * speed)
+        # Textured "face" so template matching has something to lock on to (coarse, like a real face)
+        texture = rng.integers(120, 255, size=(10, 8, 3), dtype=np.uint8)
+        frame[300:380, x:x + 64] = texture.repeat(8, axis=0).repeat(8, axis=1)
+    return frame
+
+
+def test_detects_every_interval_of_sampled_frames_and_tracks_in_between():
+    # Five samples 60 frames apart, as analyze_video picks them from a 300-frame clip
+    tracker = FaceTracker(BrightBlobDetector(), detect_interval=3, max_faces=4)
+    for index in range(0, 300, 60):
+        boxes = tracker.locate(frame_with_faces(index))
+        assert len(boxes) == 2
+        xs = sorted(box[0] for box in boxes)
+        assert abs(xs[0] - (200 + index // 4)) <= 2 and abs(xs[1] - (800 + index // 4)) <= 2
+
+    assert tracker.stats()['detections'] == 2
+    assert tracker.stats()['trackedFrames'] == 3
+
+
+def test_lost_track_is_detected_again():
+    # Faces moving 1 px per frame leave the search window between samples
+    tracker = FaceTracker(BrightBlobDetector(), detect_interval=3, max_faces=4)
+    for index in range(0, 300, 60):
+        boxes = tracker.locate(frame_with_faces(index, speed=1))
+        assert sorted(box[0] for box in boxes)[0] == 200 + index
+
+    assert tracker.stats()['detections'] == 5 and tracker.stats()['trackedFrames'] == 0
+
+
+def test_crop_faces_returns_square_crops_with_margin():
+    image = Image.fromarray(frame_with_faces(0)[:, :, ::-1].copy())
+    crops = crop_faces(image, [(200, 300, 64, 80), (1250, 700, 64, 80)])
+    assert crops[0].size == (128, 128)
+    # Clipped at the frame border
+    assert crops[1].size[0] < 128 and crops[1].size[1] < 128
+
+
+def test_predict_batch_matches_predict():
+    handler = StubModelHandler()
+    images = [Image.new('RGB', (64, 48), color) for color in ('red', 'green', 'blue')]
+    batch = handler.predict_batch(images)
+    single = [handler.predict(image) for image in images]
+    for b, s in zip(batch, single):
+        assert torch.allclose(torch.tensor(b['distribution']['fake']), torch.tensor(s['distribution']['fake']), atol=1e-5)
+
+
+def test_video_classifies_face_crops(tmp_path, monkeypatch):
+    path = str(tmp_path / 'clip.avi')
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), 30, (1280, 720))
+    for i in range(300):
+        out.write(frame_with_faces(i))
+    out.release()
+
+    monkeypatch.delenv('FACE_DETECT_INTERVAL', raising=False)
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    service.face_crop = True
+    service._local.face_detector = BrightBlobDetector()
+    result = service.analyze_video('test', path)
+
+    assert result['frameIndices'] == [0, 60, 120, 180, 240]
+    assert len(result['faceBoxes']) == result['framesAnalyzed'] == 5
+    assert all(len(boxes) == 2 for boxes in result['faceBoxes'])
+    assert result['faceDetection']['detections'] == 2
+    assert result['faceDetection']['trackedFrames'] == 3
+    service.executor.shutdown()
@@ -0,0 +1,86 @@
+import os
+import sys
+
+import numpy as np
+import torch
+import torch.nn as nn
+from PIL import Image
+from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+
+import train_custom_model
+from src.custom_model_handler import CustomModelHandler
+from src.feature_cache import ResNet50Backbone, build_feature_cache
+from src.model_handler import ModelHandler
+
+
+class MeanColorBackbone:
+    """Backbone whose 'features' are the mean colour; counts the images it sees."""
+
+    name = 'mean-color'
+    dim = 3
+
+    def __init__(self):
+        self.model = nn.Identity()
+        self.seen = 0
+
+    def transform(self, image):
+        return torch.from_numpy(np.asarray(image, dtype=np.float32).copy()).permute(2, 0, 1) / 255
+
+    def features(self, batch):
+        self.seen += len(batch)
+        return batch.mean(dim=(2, 3))
+
+
+def make_images(directory, colors):
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i, color in enumerate(colors):
+        path = os.path.join(directory, f'{i}.png')
+        Image.new('RGB', (8, 8), color).save(path)
+        paths.append(path)
+    return paths
+
+
+def test_features_are_computed_once_and_extended_incrementally(tmp_path):
+    backbone = MeanColorBackbone()
+    paths = make_images(str(tmp_path / 'images'), ['red', 'blue'])
+    cache = str(tmp_path / 'cache')
+
+    features = build_feature_cache(backbone, paths, cache, batch_size=1)
+    assert torch.allclose(features, torch.tensor([[1.0, 0, 0], [0, 0, 1.0]]), atol=1e-3)
+    assert build_feature_cache(backbone, paths[::-1], cache).tolist() == features.flip(0).tolist()
+    assert backbone.seen == 2
+
+    paths += make_images(str(tmp_path / 'more'), ['lime'])
+    features = build_feature_cache(backbone, paths, cache)
+    assert backbone.seen == 3
+    assert torch.allclose(features[2], torch.tensor([0.0, 1.0, 0]), atol=1e-3)
+
+
+def test_resnet_head_checkpoint_loads_in_custom_model_handler(tmp_path):
+    backbone = ResNet50Backbone(num_classes=2, pretrained=False)
+    assert backbone.features(torch.rand(1, 3, 64, 64)).shape == (1, 2048)
+    path = backbone.save(str(tmp_path), ['fake', 'real'])
+    handler = CustomModelHandler(model_path=path, model_type='resnet')
+    assert torch.equal(handler.model.fc.weight, backbone.head.weight)
+
+
+def test_vit_head_only_training_produces_a_servable_model(tmp_path, monkeypatch):
+    vit_dir = str(tmp_path / 'tiny-vit')
+    config = ViTConfig(image_size=32, patch_size=8, hidden_size=16, num_hidden_layers=1,
+                       num_attention_heads=2, intermediate_size=32, num_labels=2)
+    ViTForImageClassification(config).save_pretrained(vit_dir)
+    ViTImageProcessor(size={'height': 32, 'width': 32}).save_pretrained(vit_dir)
+    for split in ('train', 'val'):
+        make_images(str(tmp_path / 'data' / split / 'fake'), ['red', 'orange'])
+        make_images(str(tmp_path / 'data' / split / 'real'), ['blue', 'navy'])
+
+    monkeypatch.setattr(sys, 'argv', [
+        'train_custom_model.py', '--data_dir', str(tmp_path / 'data'), '--model_type', 'vit', '--head_only',
+        '--vit_model', vit_dir, '--epochs', '2', '--batch_size', '2',
+        '--save_dir', str(tmp_path / 'models'), '--feature_cache_dir', str(tmp_path / 'features')])
+    train_custom_model.main()
+
+    handler = ModelHandler(model_path=str(tmp_path / 'models' / 'head_only_vit'))
+    assert handler.model.config.id2label == {0: 'fake', 1: 'real'}
+    assert 'error' not in handler.predict(Image.new('RGB', (40, 40), 'red'))
@@ -0,0 +1,97 @@
+import io
+
+import cv2
+import numpy as np
+from PIL import Image
+
+import app as flask_module
+from src import forensics
+from src.service import InferenceService
+from src.stub_model_handler import StubModelHandler
+
+
+def reference_ela(rgb):
+    """Scalar re-implementation of the forensic engine's analyzeELA (RGBA with opaque alpha)."""
+    ok, encoded = cv2.imencode('.jpg', rgb, [cv2.IMWRITE_JPEG_QUALITY, 90])
+    recompressed = cv2.imdecode(encoded, cv2.IMREAD_UNCHANGED)
+    rgba_a = np.dstack([rgb, np.full(rgb.shape[:2], 255, np.uint8)]).astype(np.int64)
+    rgba_b = np.dstack([recompressed, np.full(rgb.shape[:2], 255, np.uint8)]).astype(np.int64)
+    return min(np.abs(rgba_a - rgba_b).mean() / 20, 1.0)
+
+
+def test_ela_matches_reference_and_separates_noise():
+    rng = np.random.default_rng(0)
+    smooth = np.tile(np.linspace(0, 255, 128, dtype=np.uint8)[None, :, None], (96, 1, 3))
+    noisy = rng.integers(0, 256, size=(96, 128, 3), dtype=np.uint8)
+
+    assert abs(forensics.ela_score(noisy) - reference_ela(noisy)) < 1e-9
+    assert forensics.ela_score(smooth) < forensics.ela_score(noisy)
+
+
+def test_metadata_penalises_stripped_images():
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 24), 'blue').save(buffer, format='JPEG')
+    stripped = forensics.image_metadata(buffer.getvalue())
+    assert stripped['score'] == 0.4
+    assert stripped['details']['width'] == 32 and stripped['details']['format'] == 'jpeg'
+
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'
+    buffer = io.BytesIO()
+    Image.new('RGB', (32, 24), 'blue').save(buffer, format='JPEG', exif=exif.tobytes())
+    assert forensics.image_metadata(buffer.getvalue())['score'] == 0.1
+
+
+def test_combined_video_endpoint_returns_forensics_without_frames(tmp_path, monkeypatch):
+    path = str(tmp_path / 'clip.mp4')
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (160, 120))
+    for i in range(10):
+        out.write(np.full((120, 160, 3), i * 20, dtype=np.uint8))
+    out.release()
+
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    monkeypatch.setattr(flask_module, 'service', service)
+    client = flask_module.app.test_client()
+
+    with open(path, 'rb') as f:
+        response = client.post('/inference/analyze-video-combined',
+                               data={'video': (io.BytesIO(f.read()), 'clip.mp4')},
+                               content_type='multipart/form-data')
+    data = response.get_json()
+
+    assert response.status_code == 200
+    assert data['frames'] == []
+    assert len(data['frameAnalysis']) == data['framesAnalyzed']
+    assert data['forensicScore'] == data['forensic']['overallScore']
+    assert set(data['frameAnalysis'][0]['forensic']) == {
+        'elaScore', 'metadataScore', 'blinkScore', 'overallScore', 'details'}
+    service.executor.shutdown()
+
+
+def test_frame_and_video_paths_score_the_same_pixels_alike(tmp_path):
+    rng = np.random.default_rng(1)
+    # Noise in the red channel only, so swapped channels change the JPEG re-encode
+    y, x = np.mgrid[0:96, 0:128]
+    bgr = np.dstack([x * 2, y * 2, 255 - x + rng.normal(0, 16, (96, 128))])
+    bgr = np.clip(bgr, 0, 255).astype(np.uint8)
+    path = str(tmp_path / 'clip.avi')
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), 10, (128, 96))
+    for _ in range(5):
+        out.write(bgr)
+    out.release()
+    # The pixels exactly as the video path decodes them
+    cap = cv2.VideoCapture(path)
+    decoded = cap.read()[1]
+    cap.release()
+    buffer = io.BytesIO()
+    Image.fromarray(cv2.cvtColor(decoded, cv2.COLOR_BGR2RGB)).save(buffer, format='PNG')
+
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    frame = service.analyze_frame('test', buffer.getvalue(), forensic=True)['forensic']
+    video = service.analyze_video('test', path, forensic=True)['frameAnalysis'][0]['forensic']
+
+    assert frame['elaScore'] == video['elaScore'] == forensics.ela_score(decoded)
+    assert frame['elaScore'] != forensics.ela_score(decoded[:, :, ::-1])
+    service.executor.shutdown()
@@ -0,0 +1,138 @@
+import json
+import os
+
+import cv2
+import numpy as np
+import pytest
+from PIL import Image
+
+from src import faces, frame_extraction
+from src.frame_extraction import STATE_FILE, extract_dataset
+from src.manifest import read_manifest
+from src.utils import sample_frame_indices
+
+
+class CornerDetector:
+    name = 'corner'
+
+    def detect(self, frame):
+        return [(0, 0, 16, 16)]
+
+
+def make_videos(root, counts, frames=23):
+    for label, count in counts.items():
+        os.makedirs(os.path.join(root, label), exist_ok=True)
+        for v in range(count):
+            writer = cv2.VideoWriter(os.path.join(root, label, f'clip{v}.avi'), cv2.VideoWriter_fourcc(*'MJPG'),
+                                     10, (64, 48))
+            for i in range(frames):
+                writer.write(np.full((48, 64, 3), i * 10, np.uint8))
+            writer.release()
+
+
+def test_sample_frame_indices_match_analyze_video():
+    assert sample_frame_indices(23, 5) == [0, 4, 8, 12, 16]
+    assert sample_frame_indices(3, 5) == [0, 1, 2]
+    assert sample_frame_indices(0, 5) == []
+
+
+def test_frames_are_split_by_video_and_resumed(tmp_path):
+    videos, dataset = str(tmp_path / 'videos'), str(tmp_path / 'dataset')
+    make_videos(videos, {'real': 4, 'fake': 4})
+
+    summary = extract_dataset(videos, dataset, frames_per_video=5, workers=2)
+    assert summary['videos'] == 8 and summary['frames'] == 40 and not summary['failed']
+    rows = read_manifest(os.path.join(dataset, 'manifest.csv'))
+    assert len(rows) == 40 and all(os.path.exists(row['path']) for row in rows)
+    assert all(os.path.basename(os.path.dirname(os.path.dirname(row['path']))) == row['split'] for row in rows)
+    # Every video sits in exactly one split
+    splits = {}
+    for row in rows:
+        splits.setdefault(os.path.basename(row['path']).rsplit('_f', 1)[0], set()).add(row['split'])
+    assert len(splits) == 8 and all(len(s) == 1 for s in splits.values())
+    assert sorted(int(name[-6:]) for name in
+                  {os.path.splitext(os.path.basename(row['path']))[0].rsplit('_f', 1)[1] for row in rows}) \
+        == [0, 4, 8, 12, 16]
+
+    # A crash after 3 videos: only the other 5 are extracted again
+    with open(os.path.join(dataset, STATE_FILE)) as f:
+        lines = f.readlines()
+    with open(os.path.join(dataset, STATE_FILE), 'w') as f:
+        f.writelines(lines[:3] + ['{"video": "cut off'])
+    assert extract_dataset(videos, dataset, frames_per_video=5, workers=1)['resumed'] == 3
+
+    # New seed: frames move with their video, nothing is decoded again
+    summary = extract_dataset(videos, dataset, frames_per_video=5, seed=3, workers=1)
+    assert summary['resumed'] == 8 and summary['frames'] == 40
+    rows = read_manifest(os.path.join(dataset, 'manifest.csv'))
+    assert all(os.path.exists(row['path']) for row in rows)
+    assert sum(len(files) for _, _, files in os.walk(dataset)) == 40 + 2
+
+
+def test_face_crops_match_serving_input(tmp_path, monkeypatch):
+    monkeypatch.setattr(faces, 'create_detector', lambda: CornerDetector())
+    videos, dataset = str(tmp_path / 'videos'), str(tmp_path / 'dataset')
+    make_videos(videos, {'fake': 1, 'real': 1}, frames=6)
+
+    summary = extract_dataset(videos, dataset, frames_per_video=2, face_crop=True, train_ratio=1.0,
+                              val_ratio=0.0, workers=1)
+    assert summary['frames'] == 4
+    for row in read_manifest(os.path.join(dataset, 'manifest.csv')):
+        assert row['path'].endswith('_face0.jpg')
+        with Image.open(row['path']) as image:
+            # 16px box with CROP_MARGIN on each side, clipped at the corner
+            assert image.size == (faces.crop_faces(np.zeros((48, 64, 3), np.uint8), [(0, 0, 16, 16)])[0].size)
+
+    monkeypatch.setattr(faces, 'create_detector', lambda: None)
+    with pytest.raises(RuntimeError):
+        extract_dataset(videos, str(tmp_path / 'other'), face_crop=True, workers=1)
+
+
+def test_state_records_failed_videos(tmp_path):
+    videos = tmp_path / 'videos'
+    (videos / 'real').mkdir(parents=True)
+    (videos / 'real' / 'broken.mp4').write_bytes(b'not a video')
+    summary = extract_dataset(str(videos), str(tmp_path / 'dataset'), workers=1)
+    assert summary['frames'] == 0 and summary['failed'][0]['error'] == 'Could not open video file'
+    with open(tmp_path / 'dataset' / STATE_FILE) as f:
+        assert json.loads(f.readline())['error']
+    assert frame_extraction.read_state(str(tmp_path / 'missing.jsonl')) == {}
+
+
+def test_truncated_video_stays_out_of_the_manifest(tmp_path):
+    videos, dataset = str(tmp_path / 'videos'), str(tmp_path / 'dataset')
+    make_videos(videos, {'real': 2})
+    path = os.path.join(videos, 'real', 'clip1.avi')
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Still opens and reports 23 frames, but frames from 12 on are gone
+    with open(path, 'wb') as f:
+        f.write(data[:int(len(data) * 0.7)])
+
+    summary = extract_dataset(videos, dataset, frames_per_video=5, train_ratio=1.0, val_ratio=0.0, workers=1)
+    assert summary['failed'] == [{'video': os.path.abspath(path), 'error': 'Could not read frame 12'}]
+    assert summary['frames'] == 5
+    rows = read_manifest(os.path.join(dataset, 'manifest.csv'))
+    assert all('clip0_' in os.path.basename(row['path']) for row in rows)
+    # The partial frames were removed, not left behind for a later layout or materialize
+    assert len(os.listdir(os.path.join(dataset, 'train', 'real'))) == 5
+
+    # Retried on resume, still kept out
+    summary = extract_dataset(videos, dataset, frames_per_video=5, train_ratio=1.0, val_ratio=0.0, workers=1)
+    assert summary['resumed'] == 1 and len(summary['failed']) == 1 and summary['frames'] == 5
+
+
+def test_partially_read_video_is_extracted_again(tmp_path, monkeypatch):
+    videos, dataset = str(tmp_path / 'videos'), str(tmp_path / 'dataset')
+    make_videos(videos, {'real': 1})
+    probe_video = frame_extraction.probe_video
+    # Metadata claiming twice the frames: reads past frame 22 fail
+    monkeypatch.setattr(frame_extraction, 'probe_video', lambda path: dict(probe_video(path), total_frames=46))
+
+    summary = extract_dataset(videos, dataset, frames_per_video=5, train_ratio=1.0, val_ratio=0.0, workers=1)
+    assert summary['failed'][0]['error'] == 'Could not read frame 27'
+
+    monkeypatch.setattr(frame_extraction, 'probe_video', probe_video)
+    summary = extract_dataset(videos, dataset, frames_per_video=5, train_ratio=1.0, val_ratio=0.0, workers=1)
+    assert summary['resumed'] == 0 and not summary['failed'] and summary['frames'] == 5
+    assert len(os.listdir(os.path.join(dataset, 'train', 'real'))) == 5
@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from src.inference_executor import InferenceExecutor
+
+
+class CountingHandler:
+    model = object()
+    device = 'cpu'
+
+    def __init__(self):
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def predict(self, image):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(0.01)
+        with self.lock:
+            self.active -= 1
+        if image == 'bad':
+            raise ValueError('bad image')
+        return {'image': image, 'thread': threading.current_thread().name}
+
+
+def test_concurrency_is_bounded_by_inference_threads():
+    handler = CountingHandler()
+    executor = InferenceExecutor(handler, num_threads=2, intra_op_threads=1)
+    futures = [executor.submit(handler.predict, i) for i in range(10)]
+    results = [f.result(timeout=5) for f in futures]
+    executor.shutdown()
+
+    assert [r['image'] for r in results] == list(range(10))
+    assert all(r['thread'].startswith('inference-') for r in results)
+    assert handler.max_active <= 2
+
+
+def test_predict_propagates_errors():
+    executor = InferenceExecutor(CountingHandler(), num_threads=1, intra_op_threads=1)
+    with pytest.raises(ValueError):
+        executor.predict('bad')
+    executor.shutdown()
@@ -0,0 +1,64 @@
+import time
+
+import torch
+from torch.utils.data import DataLoader, Dataset
+
+from src.loader_stats import StepTimer, TimedDataset, autotune, candidate_settings, timed_collate
+
+
+class SlowDataset(Dataset):
+    classes = ['fake', 'real']
+
+    def __init__(self, size=8, delay=0.01):
+        self.size = size
+        self.delay = delay
+
+    def __len__(self):
+        return self.size
+
+    def __getitem__(self, index):
+        time.sleep(self.delay)
+        return torch.full((3, 4, 4), float(index)), index % 2
+
+
+def test_batches_carry_their_load_time_and_the_timer_splits_steps():
+    dataset = TimedDataset(SlowDataset(delay=0.01))
+    assert dataset.classes == ['fake', 'real'] and len(dataset) == 8
+    loader = DataLoader(dataset, batch_size=4, collate_fn=timed_collate)
+
+    timer = StepTimer(num_workers=0)
+    timer.start()
+    for batch in loader:
+        timer.batch_ready(batch)
+        data, target = batch
+        assert data.shape == (4, 3, 4, 4) and batch.load_seconds >= 0.04
+        time.sleep(0.02)
+        timer.step_done(len(target))
+
+    summary = timer.summary()
+    assert summary['steps'] == 2 and summary['samples'] == 8
+    assert summary['data_wait_seconds'] >= 0.08 and summary['compute_seconds'] >= 0.04
+    assert 0.5 < summary['data_wait_fraction'] < 1
+    assert 0.5 < summary['worker_utilization'] <= 1
+
+
+def test_candidate_settings_fit_the_host():
+    assert candidate_settings(1, [16]) == [(0, None, 16), (1, 2, 16), (1, 4, 16)]
+    assert [s[0] for s in candidate_settings(8, [16], prefetch_factors=(2,))] == [0, 2, 4, 8]
+    assert {s[2] for s in candidate_settings(2, [16, 32])} == {16, 32}
+
+
+def test_autotune_picks_the_fastest_setting():
+    # Bigger batches amortize a fixed per-batch cost
+    def build_loader(num_workers, prefetch_factor, batch_size):
+        return DataLoader(TimedDataset(SlowDataset(size=16, delay=0)), batch_size=batch_size,
+                          collate_fn=timed_collate)
+
+    def run_step(batch):
+        time.sleep(0.01)
+
+    best, results = autotune(build_loader, run_step, [(0, None, 2), (0, None, 8), (0, None, 32)], steps=1)
+    assert best == (0, None, 8)
+    # The batch size larger than the dataset could not be timed
+    assert [r['batch_size'] for r in results] == [8, 2]
+    assert results[0]['samples_per_sec'] > results[1]['samples_per_sec']
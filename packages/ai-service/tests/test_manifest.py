@@ -0,0 +1,54 @@
+import os
+
+from src.manifest import (ManifestDataset, assign_splits, build_manifest, content_hash, materialize,
+                          read_manifest, split_counts, write_manifest)
+from tests.test_feature_cache import make_images
+
+
+def make_manifest(tmp_path, **kwargs):
+    images = {'real': make_images(str(tmp_path / 'source' / 'real'), ['blue'] * 10),
+              'fake': make_images(str(tmp_path / 'source' / 'fake'), ['red'] * 10)}
+    rows = build_manifest(images, workers=2, **kwargs)
+    return rows, write_manifest(rows, str(tmp_path / 'dataset' / 'manifest.csv'))
+
+
+def test_manifest_records_hashes_and_seeded_splits(tmp_path):
+    os.makedirs(tmp_path / 'dataset')
+    rows, path = make_manifest(tmp_path)
+    assert split_counts(rows) == {'train': {'fake': 7, 'real': 7}, 'val': {'fake': 2, 'real': 2},
+                                  'test': {'fake': 1, 'real': 1}}
+    assert read_manifest(path) == rows
+    assert rows[0]['sha256'] == content_hash(rows[0]['path'])
+    # Paths are stored relative to the manifest
+    assert open(path).read().splitlines()[1].startswith('../source/')
+
+    resplit = assign_splits([dict(row) for row in rows], 0.5, 0.5, seed=1)
+    assert split_counts(resplit)['test'] == {'fake': 0, 'real': 0}
+    assert [row['split'] for row in assign_splits([dict(row) for row in rows])] == [row['split'] for row in rows]
+
+
+def test_materialize_links_and_follows_resplits(tmp_path):
+    os.makedirs(tmp_path / 'dataset')
+    rows, _ = make_manifest(tmp_path)
+    out = tmp_path / 'dataset'
+    (out / 'train' / 'real').mkdir(parents=True)
+    (out / 'train' / 'real' / 'mine.jpg').write_bytes(b'not a link')
+
+    assert materialize(rows, str(out)) == 20
+    linked = out / 'train' / 'real' / sorted(os.listdir(out / 'train' / 'real'))[0]
+    assert os.stat(linked).st_nlink == 2
+
+    materialize(assign_splits(rows, 0.5, 0.5), str(out), link='symlink')
+    assert len(os.listdir(out / 'val' / 'fake')) == 5 and not os.listdir(out / 'test' / 'fake')
+    # Files that are not links are never removed
+    assert (out / 'train' / 'real' / 'mine.jpg').exists()
+    assert len(os.listdir(out / 'train' / 'real')) == 6
+
+
+def test_manifest_dataset_matches_image_folder_classes(tmp_path):
+    os.makedirs(tmp_path / 'dataset')
+    _, path = make_manifest(tmp_path)
+    dataset = ManifestDataset(path, 'val')
+    assert dataset.classes == ['fake', 'real'] and dataset.targets == [0, 0, 1, 1]
+    image, target = dataset[0]
+    assert image.mode == 'RGB' and image.getpixel((0, 0))[0] > 200 and target == 0
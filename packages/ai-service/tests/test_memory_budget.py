@@ -0,0 +1,89 @@
+import tracemalloc
+
+import cv2
+import numpy as np
+import pytest
+
+from src.admission import AdmissionRejected
+from src.memory_budget import MB, MIN_FRAME_EDGE, MemoryBudget, MemoryBudgetExceeded, PeakMemoryTracker
+from src.service import InferenceService
+from src.stub_model_handler import StubModelHandler
+
+
+def test_video_within_budget_keeps_source_resolution():
+    budget = MemoryBudget(per_request_bytes=512 * MB, global_bytes=1024 * MB, max_frame_edge=0)
+    plan = budget.plan_video(1920, 1080, 5)
+    assert plan.max_edge is None
+    assert plan.estimate_bytes == budget.video_estimate(1920, 1080, 5)
+
+
+def test_video_over_budget_is_downscaled_to_fit():
+    budget = MemoryBudget(per_request_bytes=64 * MB, global_bytes=1024 * MB, max_frame_edge=0)
+    plan = budget.plan_video(3840, 2160, 5)
+    assert MIN_FRAME_EDGE <= plan.max_edge < 3840
+    assert plan.estimate_bytes <= 64 * MB
+    assert budget.snapshot()['downscaled_total'] == 1
+
+
+def test_request_that_cannot_fit_is_rejected():
+    budget = MemoryBudget(per_request_bytes=8 * MB, global_bytes=1024 * MB, max_frame_edge=0)
+    with pytest.raises(MemoryBudgetExceeded):
+        budget.plan_video(3840, 2160, 5)
+    with pytest.raises(MemoryBudgetExceeded):
+        budget.check_frame(3840, 2160)
+
+
+def test_global_budget_rejects_while_exhausted():
+    budget = MemoryBudget(per_request_bytes=100, global_bytes=100, max_frame_edge=0)
+    with budget.reserved(80):
+        with pytest.raises(AdmissionRejected):
+            with budget.reserved(40):
+                pass
+        assert budget.reserved_bytes() == 80
+    # An idle process admits a request even if it alone exceeds the global budget
+    with budget.reserved(150):
+        pass
+    assert budget.reserved_bytes() == 0
+
+
+def test_peak_tracker_sees_transient_allocation():
+    tracemalloc.start()
+    try:
+        with PeakMemoryTracker() as tracker:
+            block = np.ones(64 * MB, dtype=np.uint8)
+            del block
+    finally:
+        tracemalloc.stop()
+    assert tracker.traced_bytes >= 64 * MB
+
+
+def test_overlapping_trackers_do_not_report_a_shared_peak():
+    tracemalloc.start()
+    try:
+        with PeakMemoryTracker() as first:
+            with PeakMemoryTracker() as second:
+                block = np.ones(8 * MB, dtype=np.uint8)
+                del block
+        with PeakMemoryTracker() as alone:
+            pass
+    finally:
+        tracemalloc.stop()
+    assert first.traced_bytes is None and second.traced_bytes is None
+    assert alone.traced_bytes is not None and alone.traced_bytes < 8 * MB
+
+
+def test_analyze_video_downscales_returned_frames(tmp_path):
+    path = str(tmp_path / 'clip.mp4')
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'mp4v'), 10, (1280, 720))
+    for i in range(10):
+        out.write(np.full((720, 1280, 3), i * 20, dtype=np.uint8))
+    out.release()
+
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    service.memory = MemoryBudget(per_request_bytes=1024 * MB, global_bytes=1024 * MB, max_frame_edge=640)
+    result = service.analyze_video('test', path)
+
+    assert result['resolution'] == {'width': 1280, 'height': 720}
+    assert result['frameResolution'] == {'width': 640, 'height': 360}
+    service.executor.shutdown()
@@ -0,0 +1,45 @@
+from src import metrics
+from src.inference_executor import InferenceExecutor
+from src.metrics import Counter, Histogram, Registry
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = Registry()
+    histogram = registry.register(Histogram('demo_seconds', 'Demo.', ('stage',), buckets=(0.1, 1.0)))
+    histogram.labels(stage='decode').observe(0.05)
+    histogram.labels(stage='decode').observe(0.5)
+    histogram.labels(stage='decode').observe(5)
+    text = registry.render()
+
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="decode",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="decode",le="1.0"} 2' in text
+    assert 'demo_seconds_bucket{stage="decode",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="decode"} 3' in text
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    counter = registry.register(Counter('demo_total', 'Demo.', ('type',)))
+    counter.labels(type='say "hi"').inc()
+    assert 'demo_total{type="say \\"hi\\""} 1.0' in registry.render()
+
+
+class TimedHandler:
+    model = object()
+    device = 'cpu'
+
+    def predict(self, image):
+        with metrics.stage('model_forward'):
+            return {'is_fake': False, 'confidence': 1.0, 'distribution': {'real': 1.0, 'fake': 0.0}}
+
+
+def test_request_labels_follow_work_onto_inference_threads():
+    executor = InferenceExecutor(TimedHandler(), num_threads=1, intra_op_threads=1)
+    with metrics.request_scope('test_endpoint', 'test_model'):
+        executor.predict(None)
+    executor.shutdown()
+
+    text = metrics.render()
+    assert 'endpoint="test_endpoint",model="test_model",stage="model_forward"' in text
+    assert 'endpoint="test_endpoint",model="test_model",stage="total"' in text
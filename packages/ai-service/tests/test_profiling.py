@@ -0,0 +1,27 @@
+import json
+import os
+
+import torch
+
+from src import metrics, profiling
+
+
+def test_profiled_request_writes_merged_trace(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROFILE_DIR', str(tmp_path))
+    with profiling.profile_request({'X-Profile': '1'}) as session:
+        assert session is not None
+        with metrics.stage('model_forward'):
+            torch.mm(torch.randn(32, 32), torch.randn(32, 32))
+
+    assert profiling.active_session() is None
+    with open(os.path.join(tmp_path, f'{session.id}.json')) as f:
+        trace = json.load(f)
+    assert trace['profileId'] == session.id
+    spans = [e for e in trace['traceEvents'] if e.get('cat') == 'request_span']
+    assert [span['name'] for span in spans] == ['model_forward']
+
+
+def test_requests_are_not_profiled_by_default(monkeypatch):
+    monkeypatch.delenv('PROFILE_SAMPLE_RATE', raising=False)
+    with profiling.profile_request({}) as session:
+        assert session is None
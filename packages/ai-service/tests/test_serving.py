@@ -0,0 +1,13 @@
+from src.serving import partition_cores
+
+
+def test_partition_cores_splits_evenly():
+    cpus = list(range(8))
+    groups = [partition_cores(4, slot, cpus) for slot in range(4)]
+    assert groups == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_partition_cores_with_more_workers_than_cpus():
+    cpus = [0, 1]
+    assert partition_cores(4, 0, cpus) == [0]
+    assert partition_cores(4, 3, cpus) == [1]
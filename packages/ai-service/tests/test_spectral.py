@@ -0,0 +1,83 @@
+import cv2
+import numpy as np
+
+from src import spectral
+from src.deadline import Deadline, FrameCostEstimator
+from src.service import InferenceService
+from src.spectral import SpectralFilter
+from src.stub_model_handler import StubModelHandler
+
+
+def smooth_frame(seed, size=320):
+    """Low-pass filtered noise: a power-law-like spectrum without periodic artifacts."""
+    rng = np.random.default_rng(seed)
+    noise = rng.normal(128, 40, size=(size, size)).astype(np.float32)
+    return np.clip(cv2.GaussianBlur(noise, (0, 0), 3) * 4 - 384, 0, 255).astype(np.uint8)
+
+
+def checkerboard(frame, amplitude=8):
+    pattern = (np.indices(frame.shape[:2]).sum(axis=0) % 2) * 2 - 1
+    return np.clip(frame.astype(np.int32) + amplitude * pattern, 0, 255).astype(np.uint8)
+
+
+def test_batched_scores_match_single_frames_and_flag_artifacts():
+    frames = [smooth_frame(0), checkerboard(smooth_frame(1)), smooth_frame(2)]
+    batch = spectral.score_frames(frames)
+    single = [spectral.score_frames([frame])[0] for frame in frames]
+
+    assert np.allclose(batch, single)
+    assert batch[1] > 0.5 > max(batch[0], batch[2])
+
+
+def test_select_keeps_suspicious_frames_and_at_least_min_frames():
+    selector = SpectralFilter(enabled=True, candidate_factor=3, threshold=0.5, min_frames=1, weight=0)
+    assert selector.select([0.1, 0.9, 0.2, 0.7], max_frames=5) == [1, 3]
+    assert selector.select([0.1, 0.9, 0.2, 0.7], max_frames=1) == [1]
+    assert selector.select([0.1, 0.05, 0.2], max_frames=5) == [2]
+
+
+def artifact_clip(tmp_path):
+    path = str(tmp_path / 'clip.avi')
+    # Lossless codec so the artifacts survive encoding
+    out = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'FFV1'), 10, (320, 320), isColor=False)
+    for i in range(20):
+        frame = smooth_frame(i)
+        out.write(checkerboard(frame) if i in (12, 16) else frame)
+    out.release()
+    return path
+
+
+def prefilter_service():
+    service = InferenceService()
+    service.model_handler = StubModelHandler()
+    service.video_num_samples = 4
+    service.spectral = SpectralFilter(enabled=True, candidate_factor=5, threshold=0.5, min_frames=1, weight=0)
+    return service
+
+
+def test_prefilter_sends_artifact_frames_to_the_model(tmp_path):
+    path = artifact_clip(tmp_path)
+    service = prefilter_service()
+    result = service.analyze_video('test', path)
+
+    assert result['spectral']['prefiltered']
+    assert len(result['spectral']['frameScores']) == 20
+    assert result['frameIndices'] == [12, 16]
+    assert result['framesPlanned'] == 4 and result['framesAnalyzed'] == 2
+    assert result['spectral']['skippedFrames'] == 2 and not result['partial']
+
+    # A generous deadline changes nothing
+    result = service.analyze_video('test', path, deadline=Deadline(60))
+    assert result['spectral']['prefiltered'] and result['frameIndices'] == [12, 16]
+    service.executor.shutdown()
+
+
+def test_deadline_plan_counts_candidate_decodes(tmp_path):
+    service = prefilter_service()
+    service.frame_cost = FrameCostEstimator(initial_seconds=0.1)
+    service.candidate_cost = FrameCostEstimator(initial_seconds=0.02)
+    # 0.1 s per model frame plus 5 candidates x 0.02 s: 2 of 4 frames fit in 0.45 s
+    result = service.analyze_video('test', artifact_clip(tmp_path), deadline=Deadline(0.45))
+    assert result['framesPlanned'] == 2 and result['partial']
+    assert result['spectral']['prefiltered'] and len(result['spectral']['frameScores']) == 10
+    service.executor.shutdown()
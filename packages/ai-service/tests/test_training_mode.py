@@ -0,0 +1,38 @@
+import torch
+import torch.nn as nn
+
+from src.stub_model_handler import StubCNN
+from src.training_mode import TrainingMode, measure_samples_per_sec
+
+
+def test_compiled_model_keeps_checkpoint_keys():
+    model = StubCNN()
+    keys = set(model.state_dict())
+    runner = TrainingMode.cpu_optimized(threads=1).prepare(model)
+
+    assert runner is not model
+    assert set(model.state_dict()) == keys
+    # Weights converted to channels_last still load into a fresh (contiguous) model
+    assert model.features[0].weight.is_contiguous(memory_format=torch.channels_last)
+    StubCNN().load_state_dict(model.state_dict())
+
+
+def test_bf16_autocast_and_channels_last_inputs():
+    mode = TrainingMode(bf16=True, channels_last=True)
+    model = StubCNN()
+    runner = mode.prepare(model)
+    data = mode.inputs(torch.rand(2, 3, 32, 32))
+    assert data.is_contiguous(memory_format=torch.channels_last)
+    with mode.autocast(torch.device('cpu')):
+        assert runner(data).dtype == torch.bfloat16
+    assert runner(data).dtype == torch.float32
+
+
+def test_throughput_is_measured_on_a_copy():
+    model = StubCNN()
+    before = {k: v.clone() for k, v in model.state_dict().items()}
+    rate = measure_samples_per_sec(model, torch.rand(4, 3, 32, 32), torch.tensor([0, 1, 0, 1]),
+                                   nn.CrossEntropyLoss(), TrainingMode(bf16=True), torch.device('cpu'),
+                                   steps=2, warmup=1)
+    assert rate > 0
+    assert all(torch.equal(before[k], v) for k, v in model.state_dict().items())
@@ -8,6 +8,36 @@ You can modify the architecture, dataset loading, and training parameters.
 Usage:
     python train_custom_model.py --data_dir /path/to/dataset --epochs 50 --batch_size 32
 
+    # Decode and resize every image once into a memory-mapped cache (reused by later runs)
+    python train_custom_model.py --data_dir /path/to/dataset --cache_dir ./dataset_cache
+
+    # Augment whole batches after collation instead of single images in the workers
+    python train_custom_model.py --data_dir /path/to/dataset --augmentation batch
+
+    # CPU-only machines: bf16 autocast, channels_last, torch.compile and all CPUs as threads
+    python train_custom_model.py --data_dir /path/to/dataset --cpu_optimized
+
+    # Time a few steps per num_workers/prefetch_factor/batch size combination first, train with the fastest
+    python train_custom_model.py --data_dir /path/to/dataset --autotune --autotune_batch_sizes 16 32 64
+
+    # Checkpoint every 200 steps in the background; continue an interrupted run where it stopped
+    python train_custom_model.py --data_dir /path/to/dataset --checkpoint_steps 200 --keep_last 3 --keep_best 2
+    python train_custom_model.py --data_dir /path/to/dataset --resume latest
+
+    # Data-parallel training (DDP over gloo) in 4 processes; --batch_size is per process
+    python train_custom_model.py --data_dir /path/to/dataset --nproc 4
+
+    # Across 2 hosts: run on each host with its --node_rank (0 on the master host)
+    python train_custom_model.py --data_dir /path/to/dataset --nproc 8 --nnodes 2 \
+        --node_rank 0 --master_addr 10.0.0.1 --master_port 29500
+
+    # Train on the splits of a manifest written by download_dataset.py (no split folders needed)
+    python train_custom_model.py --manifest ./dataset/manifest.csv
+
+    # Train only the head of a frozen pretrained backbone from cached features
+    python train_custom_model.py --data_dir /path/to/dataset --model_type resnet50 --head_only
+    python train_custom_model.py --data_dir /path/to/dataset --model_type vit --head_only
+
 Dataset Structure Expected:
     data_dir/
     ├── train/
@@ -25,28 +55,137 @@ Dataset Structure Expected:
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, TensorDataset
+from torch.utils.data.distributed import DistributedSampler
 from torchvision import datasets, transforms
 import argparse
 import os
-from datetime import datetime
+import copy
 import json
+import time
+from src import distributed, serving
+from src.augment import BatchAugment
+from src.checkpoint import AsyncCheckpointer, ResumableSampler, latest_checkpoint
 from src.custom_model_handler import CustomCNN
+from src.dataset_cache import MemmapImageDataset, build_cache, list_samples
+from src.feature_cache import ResNet50Backbone, ViTBackbone, build_feature_cache
+from src.manifest import ManifestDataset, manifest_samples
+from src.loader_stats import StepTimer, TimedDataset, autotune, candidate_settings, timed_collate
+from src.training_mode import TrainingMode, measure_samples_per_sec
+
+def split_samples(data_dir, split, manifest=None):
+    """(class names, [(path, label)]) of a split, from the manifest if given, else from data_dir/split"""
+    if manifest:
+        return manifest_samples(manifest, split)
+    return list_samples(os.path.join(data_dir, split))
 
-def get_data_loaders(data_dir, batch_size=32, num_workers=4):
-    """Create data loaders for training and validation"""
+def get_cached_datasets(data_dir, cache_dir, augmentation='per_image', manifest=None):
+    """Training and validation datasets served from pre-decoded uint8 caches"""
     
-    # Data augmentation for training
-    train_transform = transforms.Compose([
-        transforms.Resize((224, 224)),
+    # Same augmentation as below, applied to the cached uint8 tensors (already 224x224)
+    per_image_transform = transforms.Compose([
         transforms.RandomHorizontalFlip(p=0.5),
         transforms.RandomRotation(degrees=10),
         transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1),
-        transforms.ToTensor(),
+        transforms.ConvertImageDtype(torch.float),
         transforms.Normalize(mean=[0.485, 0.456, 0.406], 
                            std=[0.229, 0.224, 0.225])
     ])
     
+    val_transform = transforms.Compose([
+        transforms.ConvertImageDtype(torch.float),
+        transforms.Normalize(mean=[0.485, 0.456, 0.406], 
+                           std=[0.229, 0.224, 0.225])
+    ])
+    
+    # Batch augmentation gets the uint8 tensors as they are
+    train_transform = per_image_transform if augmentation == 'per_image' else None
+    
+    # One process per host decodes; the others wait and map the result
+    if distributed.is_local_main():
+        for split in ('train', 'val'):
+            classes, samples = split_samples(data_dir, split, manifest)
+            build_cache(None, os.path.join(cache_dir, split), samples=samples, classes=classes)
+    distributed.barrier()
+    
+    train_dataset = MemmapImageDataset(os.path.join(cache_dir, 'train'), transform=train_transform)
+    val_dataset = MemmapImageDataset(os.path.join(cache_dir, 'val'), transform=val_transform)
+    return train_dataset, val_dataset
+
+def get_datasets(data_dir, cache_dir=None, augmentation='per_image', manifest=None):
+    """
+    Training and validation datasets. The training set is wrapped in
+    TimedDataset so each batch reports how long its worker took to load it.
+    """
+    
+    if cache_dir:
+        train_dataset, val_dataset = get_cached_datasets(data_dir, cache_dir, augmentation, manifest)
+    else:
+        train_dataset, val_dataset = get_image_folder_datasets(data_dir, augmentation, manifest)
+    return TimedDataset(train_dataset), val_dataset
+
+def make_loader(dataset, batch_size, shuffle=False, num_workers=4, prefetch_factor=None, persistent=True):
+    """
+    DataLoader for one split. In distributed training each process loads its
+    own shard. Shuffled loaders use a ResumableSampler (seeded per epoch, so
+    a resumed run can skip what it already trained on). Workers persist
+    across epochs unless persistent=False; memory is pinned only for CUDA.
+    """
+    
+    if shuffle:
+        sampler = ResumableSampler(dataset)
+    else:
+        sampler = DistributedSampler(dataset, shuffle=False) if distributed.is_distributed() else None
+    return DataLoader(
+        dataset, 
+        batch_size=batch_size, 
+        sampler=sampler,
+        num_workers=num_workers,
+        prefetch_factor=prefetch_factor if num_workers > 0 else None,
+        persistent_workers=persistent and num_workers > 0,
+        pin_memory=torch.cuda.is_available(),
+        collate_fn=timed_collate if isinstance(dataset, TimedDataset) else None
+    )
+
+def get_data_loaders(data_dir, batch_size=32, num_workers=4, cache_dir=None, augmentation='per_image',
+                     prefetch_factor=None, manifest=None):
+    """
+    Create data loaders for training and validation. With augmentation='batch'
+    the training loader yields uint8 batches for BatchAugment.
+    """
+    
+    train_dataset, val_dataset = get_datasets(data_dir, cache_dir, augmentation, manifest)
+    train_loader = make_loader(train_dataset, batch_size, shuffle=True, num_workers=num_workers,
+                               prefetch_factor=prefetch_factor)
+    val_loader = make_loader(val_dataset, batch_size, num_workers=num_workers,
+                             prefetch_factor=prefetch_factor)
+    return train_loader, val_loader, train_dataset.classes
+
+def get_image_folder_datasets(data_dir, augmentation='per_image', manifest=None):
+    """
+    Training and validation datasets decoded on every epoch, from the image
+    folders or from the splits of a manifest
+    """
+    
+    # Data augmentation for training
+    if augmentation == 'per_image':
+        train_transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.RandomHorizontalFlip(p=0.5),
+            transforms.RandomRotation(degrees=10),
+            transforms.ColorJitter(brightness=0.2, contrast=0.2, saturation=0.2, hue=0.1),
+            transforms.ToTensor(),
+            transforms.Normalize(mean=[0.485, 0.456, 0.406], 
+                               std=[0.229, 0.224, 0.225])
+        ])
+    else:
+        # Decode and resize only; BatchAugment augments and normalizes after collation
+        train_transform = transforms.Compose([
+            transforms.Resize((224, 224)),
+            transforms.PILToTensor()
+        ])
+    
     # No augmentation for validation
     val_transform = transforms.Compose([
         transforms.Resize((224, 224)),
@@ -56,6 +195,10 @@ def get_data_loaders(data_dir, batch_size=32, num_workers=4):
     ])
     
     # Create datasets
+    if manifest:
+        return (ManifestDataset(manifest, 'train', transform=train_transform),
+                ManifestDataset(manifest, 'val', transform=val_transform))
+    
     train_dataset = datasets.ImageFolder(
         root=os.path.join(data_dir, 'train'),
         transform=train_transform
@@ -66,38 +209,36 @@ def get_data_loaders(data_dir, batch_size=32, num_workers=4):
         transform=val_transform
     )
     
-    # Create data loaders
-    train_loader = DataLoader(
-        train_dataset, 
-        batch_size=batch_size, 
-        shuffle=True, 
-        num_workers=num_workers,
-        pin_memory=True
-    )
-    
-    val_loader = DataLoader(
-        val_dataset, 
-        batch_size=batch_size, 
-        shuffle=False, 
-        num_workers=num_workers,
-        pin_memory=True
-    )
-    
-    return train_loader, val_loader, train_dataset.classes
+    return train_dataset, val_dataset
 
-def train_epoch(model, train_loader, criterion, optimizer, device):
-    """Train for one epoch"""
+def train_epoch(model, train_loader, criterion, optimizer, device, augment=None, mode=None, timer=None,
+                on_step=None):
+    """
+    Train for one epoch; augment (e.g. BatchAugment) is applied to each batch
+    on the device, mode (TrainingMode) sets precision and memory format,
+    timer (StepTimer) records data-wait and compute time per step and
+    on_step(batch_size) is called after every optimizer step
+    """
+    mode = mode or TrainingMode()
+    timer = timer or StepTimer(train_loader.num_workers)
     model.train()
     running_loss = 0.0
     correct = 0
     total = 0
     
-    for batch_idx, (data, target) in enumerate(train_loader):
+    timer.start()
+    for batch_idx, batch in enumerate(train_loader):
+        timer.batch_ready(batch)
+        data, target = batch
         data, target = data.to(device), target.to(device)
+        if augment is not None:
+            data = augment(data)
+        data = mode.inputs(data)
         
         optimizer.zero_grad()
-        output = model(data)
-        loss = criterion(output, target)
+        with mode.autocast(device):
+            output = model(data)
+            loss = criterion(output, target)
         loss.backward()
         optimizer.step()
         
@@ -105,19 +246,27 @@ def train_epoch(model, train_loader, criterion, optimizer, device):
         _, predicted = torch.max(output.data, 1)
         total += target.size(0)
         correct += (predicted == target).sum().item()
+        # loss.item() above waited for the device, so this is the whole step
+        timer.step_done(target.size(0))
+        if on_step is not None:
+            on_step(target.size(0))
         
         if batch_idx % 100 == 0:
             print(f'Batch {batch_idx}/{len(train_loader)}, '
                   f'Loss: {loss.item():.4f}, '
                   f'Acc: {100.*correct/total:.2f}%')
     
-    epoch_loss = running_loss / len(train_loader)
+    # Totals over all processes in distributed training
+    running_loss, batches, correct, total = distributed.reduce_sums(
+        running_loss, len(train_loader), correct, total)
+    epoch_loss = running_loss / batches
     epoch_acc = 100. * correct / total
     
     return epoch_loss, epoch_acc
 
-def validate(model, val_loader, criterion, device):
+def validate(model, val_loader, criterion, device, mode=None):
     """Validate the model"""
+    mode = mode or TrainingMode()
     model.eval()
     val_loss = 0.0
     correct = 0
@@ -125,23 +274,133 @@ def validate(model, val_loader, criterion, device):
     
     with torch.no_grad():
         for data, target in val_loader:
-            data, target = data.to(device), target.to(device)
-            output = model(data)
-            val_loss += criterion(output, target).item()
+            data, target = mode.inputs(data.to(device)), target.to(device)
+            with mode.autocast(device):
+                output = model(data)
+                val_loss += criterion(output, target).item()
             
             _, predicted = torch.max(output.data, 1)
             total += target.size(0)
             correct += (predicted == target).sum().item()
     
-    val_loss /= len(val_loader)
+    # DistributedSampler pads the last shard, so a few samples may count twice
+    val_loss, batches, correct, total = distributed.reduce_sums(val_loss, len(val_loader), correct, total)
+    val_loss /= batches
     val_acc = 100. * correct / total
     
     return val_loss, val_acc
 
+def autotune_loader(args, model, train_dataset, criterion, device, augment=None, mode=None):
+    """
+    Times a few training steps of a copy of model for each num_workers /
+    prefetch_factor / batch size combination. Returns the fastest as
+    (num_workers, prefetch_factor, batch_size) and all measurements.
+    """
+    mode = mode or TrainingMode()
+    # Eager copy: compiling once per combination would dominate the timings
+    eager = TrainingMode(bf16=mode.bf16, channels_last=mode.channels_last, threads=mode.threads)
+    trial_model = copy.deepcopy(model)
+    runner = eager.prepare(trial_model)
+    runner.train()
+    optimizer = optim.Adam(trial_model.parameters(), lr=args.lr)
+    
+    def run_step(batch):
+        data, target = batch
+        data, target = data.to(device), target.to(device)
+        if augment is not None:
+            data = augment(data)
+        optimizer.zero_grad()
+        with eager.autocast(device):
+            loss = criterion(runner(eager.inputs(data)), target)
+        loss.backward()
+        optimizer.step()
+        loss.item()
+    
+    def build_loader(num_workers, prefetch_factor, batch_size):
+        # Workers of a trial exit as soon as it is timed
+        return make_loader(train_dataset, batch_size, shuffle=True, num_workers=num_workers,
+                           prefetch_factor=prefetch_factor, persistent=False)
+    
+    settings = candidate_settings(len(serving.available_cpus()), args.autotune_batch_sizes or [args.batch_size])
+    print(f'Autotuning data loading: {len(settings)} combinations, {args.autotune_steps} steps each...')
+    best, results = autotune(build_loader, run_step, settings, steps=args.autotune_steps)
+    for result in results:
+        print(f'  num_workers={result["num_workers"]} prefetch_factor={result["prefetch_factor"]} '
+              f'batch_size={result["batch_size"]}: {result["samples_per_sec"]:.1f} samples/sec, '
+              f'waiting for data {result["data_wait_fraction"]:.0%}')
+    if best is None:
+        print('Autotune: dataset too small to time any combination, keeping the given settings')
+        return (args.num_workers, args.prefetch_factor, args.batch_size), results
+    print(f'Autotune: num_workers={best[0]}, prefetch_factor={best[1]}, batch_size={best[2]}')
+    return best, results
+
+def train_head_only(args, device):
+    """
+    Trains only the classification head of a pretrained resnet50 or ViT on
+    backbone features computed once and cached (augmentation does not apply)
+    """
+    classes, train_samples = split_samples(args.data_dir, 'train', args.manifest)
+    _, val_samples = split_samples(args.data_dir, 'val', args.manifest)
+    print(f'Classes: {classes}')
+    
+    if args.model_type == 'resnet50':
+        backbone = ResNet50Backbone(num_classes=len(classes))
+    else:
+        backbone = ViTBackbone(args.vit_model, num_classes=len(classes))
+    
+    def feature_loader(samples, shuffle):
+        features = build_feature_cache(backbone, [path for path, _ in samples], args.feature_cache_dir,
+                                       batch_size=args.batch_size, device=device)
+        labels = torch.tensor([label for _, label in samples])
+        return DataLoader(TensorDataset(features, labels), batch_size=args.batch_size, shuffle=shuffle)
+    
+    train_loader = feature_loader(train_samples, shuffle=True)
+    val_loader = feature_loader(val_samples, shuffle=False)
+    
+    head = backbone.head.to(device)
+    criterion = nn.CrossEntropyLoss()
+    optimizer = optim.Adam(head.parameters(), lr=args.lr)
+    
+    training_history = {'train_loss': [], 'train_acc': [], 'val_loss': [], 'val_acc': [], 'samples_per_sec': []}
+    best_val_acc = -1.0
+    best_head = copy.deepcopy(head.state_dict())
+    for epoch in range(args.epochs):
+        epoch_start = time.perf_counter()
+        train_loss, train_acc = train_epoch(head, train_loader, criterion, optimizer, device)
+        samples_per_sec = len(train_samples) / (time.perf_counter() - epoch_start)
+        val_loss, val_acc = validate(head, val_loader, criterion, device)
+        
+        training_history['train_loss'].append(train_loss)
+        training_history['train_acc'].append(train_acc)
+        training_history['val_loss'].append(val_loss)
+        training_history['val_acc'].append(val_acc)
+        training_history['samples_per_sec'].append(samples_per_sec)
+        print(f'Epoch {epoch+1}/{args.epochs}: Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, '
+              f'Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')
+        
+        if val_acc > best_val_acc:
+            best_val_acc = val_acc
+            best_head = copy.deepcopy(head.state_dict())
+    
+    # Full model (frozen backbone + best head) in the format the serving handlers load
+    head.load_state_dict(best_head)
+    model_path = backbone.save(args.save_dir, classes, {'best_val_acc': best_val_acc,
+                                                        'training_args': vars(args)})
+    
+    history_path = os.path.join(args.save_dir, 'training_history.json')
+    with open(history_path, 'w') as f:
+        json.dump(training_history, f, indent=2)
+    
+    print('\nHead training completed!')
+    print(f'Best validation accuracy: {best_val_acc:.2f}%')
+    print(f'Model saved: {model_path}')
+
 def main():
     parser = argparse.ArgumentParser(description='Train Custom Deepfake Detection Model')
-    parser.add_argument('--data_dir', type=str, required=True,
+    parser.add_argument('--data_dir', type=str, default=None,
                         help='Path to dataset directory')
+    parser.add_argument('--manifest', type=str, default=None,
+                        help='Train on the splits of this manifest.csv instead of --data_dir folders')
     parser.add_argument('--epochs', type=int, default=50,
                         help='Number of epochs to train')
     parser.add_argument('--batch_size', type=int, default=32,
@@ -149,30 +408,105 @@ def main():
     parser.add_argument('--lr', type=float, default=0.001,
                         help='Learning rate')
     parser.add_argument('--model_type', type=str, default='custom_cnn',
-                        choices=['custom_cnn', 'resnet50'],
-                        help='Model architecture to use')
+                        choices=['custom_cnn', 'resnet50', 'vit'],
+                        help='Model architecture to use (vit only with --head_only)')
     parser.add_argument('--save_dir', type=str, default='./models',
                         help='Directory to save trained models')
     parser.add_argument('--resume', type=str, default=None,
-                        help='Path to checkpoint to resume training')
+                        help='Path to checkpoint to resume training, or "latest" for the newest in --save_dir')
+    parser.add_argument('--checkpoint_steps', type=int, default=500,
+                        help='Write a checkpoint every this many steps (0 = only at the end of each epoch)')
+    parser.add_argument('--keep_last', type=int, default=3,
+                        help='Step checkpoints to keep')
+    parser.add_argument('--keep_best', type=int, default=1,
+                        help='Best checkpoints (by validation accuracy) to keep')
+    parser.add_argument('--cache_dir', type=str, default=None,
+                        help='Decode images once into a memory-mapped cache in this directory')
+    parser.add_argument('--num_workers', type=int, default=4,
+                        help='DataLoader worker processes')
+    parser.add_argument('--prefetch_factor', type=int, default=None,
+                        help='Batches each worker loads ahead (PyTorch default: 2)')
+    parser.add_argument('--autotune', action='store_true',
+                        help='Time a few steps per num_workers/prefetch_factor/batch size and train with the fastest')
+    parser.add_argument('--autotune_batch_sizes', type=int, nargs='+', default=None,
+                        help='Batch sizes --autotune tries (default: only --batch_size)')
+    parser.add_argument('--autotune_steps', type=int, default=5,
+                        help='Timed training steps per --autotune combination')
+    parser.add_argument('--augmentation', type=str, default='per_image',
+                        choices=['per_image', 'batch'],
+                        help='Augment single images in the loader workers or whole batches after collation')
+    parser.add_argument('--cpu_optimized', action='store_true',
+                        help='Train with bf16 autocast, channels_last and torch.compile (CPU-only machines)')
+    parser.add_argument('--no_compile', action='store_true',
+                        help='With --cpu_optimized, skip torch.compile')
+    parser.add_argument('--threads', type=int, default=0,
+                        help='Intra-op threads (0 = PyTorch default, or all CPUs with --cpu_optimized)')
+    parser.add_argument('--nproc', type=int, default=1,
+                        help='Data-parallel training processes on this host (DDP over gloo)')
+    parser.add_argument('--nnodes', type=int, default=1,
+                        help='Number of hosts taking part in distributed training')
+    parser.add_argument('--node_rank', type=int, default=0,
+                        help='Index of this host (0 runs the rendezvous)')
+    parser.add_argument('--master_addr', type=str, default='127.0.0.1',
+                        help='Address of host 0 for the rendezvous')
+    parser.add_argument('--master_port', type=int, default=29500,
+                        help='Port of the rendezvous on host 0')
+    parser.add_argument('--head_only', action='store_true',
+                        help='Freeze the pretrained backbone (resnet50 or vit) and train only its head')
+    parser.add_argument('--feature_cache_dir', type=str, default='./feature_cache',
+                        help='Where --head_only keeps the backbone features')
+    parser.add_argument('--vit_model', type=str, default='prithivMLmods/Deep-Fake-Detector-v2-Model',
+                        help='Hugging Face model (or local directory) used with --model_type vit')
     
     args = parser.parse_args()
+    if not args.data_dir and not args.manifest:
+        parser.error('one of --data_dir or --manifest is required')
+    if args.head_only and args.model_type == 'custom_cnn':
+        parser.error('--head_only needs a pretrained backbone: --model_type resnet50 or vit')
+    if args.model_type == 'vit' and not args.head_only:
+        parser.error('--model_type vit is only supported with --head_only')
+    if args.head_only and (args.nproc > 1 or args.nnodes > 1):
+        parser.error('--head_only trains in a single process')
+    
+    # Start the local processes of a distributed run (each one runs this script again)
+    if (args.nproc > 1 or args.nnodes > 1) and 'RANK' not in os.environ:
+        distributed.relaunch(args.nproc, args.nnodes, args.node_rank, args.master_addr, args.master_port)
+    is_distributed = distributed.init_from_env()
+    # Only rank 0 logs and writes checkpoints
+    is_main = distributed.is_main()
+    distributed.silence_non_main()
     
     # Create save directory
-    os.makedirs(args.save_dir, exist_ok=True)
+    if is_main:
+        os.makedirs(args.save_dir, exist_ok=True)
     
     # Device configuration
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     print(f'Using device: {device}')
     
-    # Data loaders
+    if args.head_only:
+        train_head_only(args, device)
+        return
+    
+    # Processes on one host share its CPUs
+    threads = args.threads or (distributed.threads_per_process() if is_distributed else 0)
+    if args.cpu_optimized:
+        mode = TrainingMode.cpu_optimized(threads, compile=not args.no_compile)
+    else:
+        mode = TrainingMode(threads=threads)
+    mode.configure_threads()
+    print(f'Training mode: {mode.describe()}')
+    if is_distributed:
+        print(f'Distributed training: {distributed.world_size()} processes (gloo)')
+    
+    # Datasets
     print('Loading data...')
-    train_loader, val_loader, classes = get_data_loaders(
-        args.data_dir, args.batch_size
-    )
+    train_dataset, val_dataset = get_datasets(args.data_dir, args.cache_dir, args.augmentation, args.manifest)
+    classes = train_dataset.classes
+    augment = BatchAugment() if args.augmentation == 'batch' else None
     print(f'Classes: {classes}')
-    print(f'Training samples: {len(train_loader.dataset)}')
-    print(f'Validation samples: {len(val_loader.dataset)}')
+    print(f'Training samples: {len(train_dataset)}')
+    print(f'Validation samples: {len(val_dataset)}')
     
     # Model
     if args.model_type == 'custom_cnn':
@@ -191,15 +525,60 @@ def main():
     
     # Resume training if checkpoint provided
     start_epoch = 0
+    # Samples of start_epoch this process already trained on
+    resume_samples = 0
+    global_step = 0
     best_val_acc = 0.0
+    resumed_history = {}
     
     if args.resume:
-        print(f'Resuming training from {args.resume}')
-        checkpoint = torch.load(args.resume)
+        resume_path = latest_checkpoint(args.save_dir) if args.resume == 'latest' else args.resume
+        if resume_path is None:
+            parser.error(f'--resume latest: no checkpoint in {args.save_dir}')
+        print(f'Resuming training from {resume_path}')
+        checkpoint = torch.load(resume_path, map_location=device)
         model.load_state_dict(checkpoint['model_state_dict'])
         optimizer.load_state_dict(checkpoint['optimizer_state_dict'])
+        if 'scheduler_state_dict' in checkpoint:
+            scheduler.load_state_dict(checkpoint['scheduler_state_dict'])
         start_epoch = checkpoint['epoch']
+        resume_samples = checkpoint.get('epoch_samples', 0)
+        global_step = checkpoint.get('step', 0)
         best_val_acc = checkpoint['best_val_acc']
+        resumed_history = checkpoint.get('training_history', {})
+        print(f'Continuing at epoch {start_epoch + 1}, step {global_step}')
+    
+    # Loader settings (every process must use the same batch size)
+    loader_settings = (args.num_workers, args.prefetch_factor, args.batch_size)
+    loader_autotune = None
+    if args.autotune:
+        if is_main:
+            loader_settings, loader_autotune = autotune_loader(
+                args, model, train_dataset, criterion, device, augment, mode
+            )
+        loader_settings, loader_autotune = distributed.broadcast((loader_settings, loader_autotune))
+    num_workers, prefetch_factor, batch_size = loader_settings
+    
+    # Data loaders
+    train_loader = make_loader(train_dataset, batch_size, shuffle=True, num_workers=num_workers,
+                               prefetch_factor=prefetch_factor)
+    val_loader = make_loader(val_dataset, batch_size, num_workers=num_workers, prefetch_factor=prefetch_factor)
+    
+    throughput_benchmark = None
+    if mode.optimized and is_main:
+        # Samples/sec of a few training steps on one batch, fp32 eager vs the chosen mode
+        data, target = next(iter(train_loader))
+        if augment is not None:
+            data = augment(data)
+        baseline = measure_samples_per_sec(model, data, target, criterion, TrainingMode(), device, args.lr)
+        optimized = measure_samples_per_sec(model, data, target, criterion, mode, device, args.lr)
+        throughput_benchmark = {'baseline_samples_per_sec': baseline, 'optimized_samples_per_sec': optimized}
+        print(f'Throughput: {baseline:.1f} samples/sec (fp32 eager) -> '
+              f'{optimized:.1f} samples/sec ({optimized / baseline:.2f}x)')
+    
+    # Module that runs the forward pass (DDP averages gradients across
+    # processes); checkpoints are saved from model itself
+    runner = mode.prepare(model, wrap=DistributedDataParallel if is_distributed else None)
     
     # Training loop
     print('Starting training...')
@@ -207,21 +586,75 @@ def main():
         'train_loss': [],
         'train_acc': [],
         'val_loss': [],
-        'val_acc': []
+        'val_acc': [],
+        # Samples/sec over all processes
+        'samples_per_sec': [],
+        'world_size': distributed.world_size(),
+        'training_mode': mode.describe(),
+        'throughput_benchmark': throughput_benchmark,
+        'loader_settings': {'num_workers': num_workers, 'prefetch_factor': prefetch_factor,
+                            'batch_size': batch_size},
+        'loader_autotune': loader_autotune,
+        # Rank 0's data-wait/compute split, samples/sec and worker utilization per epoch
+        'step_timing': []
     }
+    # Per-epoch results of the run this one continues
+    for key in ('train_loss', 'train_acc', 'val_loss', 'val_acc', 'samples_per_sec', 'step_timing'):
+        training_history[key] = list(resumed_history.get(key, []))
+    
+    # Checkpoints are written from a background thread on rank 0
+    checkpointer = None
+    if is_main:
+        checkpointer = AsyncCheckpointer(args.save_dir, args.model_type, args.keep_last, args.keep_best)
+    
+    def training_state(epoch, epoch_samples):
+        # Everything needed to continue at this step
+        return {
+            'epoch': epoch,
+            'epoch_samples': epoch_samples,
+            'step': global_step,
+            'model_state_dict': model.state_dict(),
+            'optimizer_state_dict': optimizer.state_dict(),
+            'scheduler_state_dict': scheduler.state_dict(),
+            'best_val_acc': best_val_acc,
+            'classes': classes,
+            'model_type': args.model_type,
+            'training_args': vars(args),
+            'training_history': training_history
+        }
+    
+    def on_step(batch_size):
+        nonlocal global_step, epoch_samples
+        global_step += 1
+        epoch_samples += batch_size
+        if checkpointer is not None and args.checkpoint_steps and global_step % args.checkpoint_steps == 0:
+            checkpointer.save(training_state(epoch, epoch_samples), global_step)
     
     for epoch in range(start_epoch, args.epochs):
         print(f'\nEpoch {epoch+1}/{args.epochs}')
         print('-' * 50)
         
+        # New shuffle for every epoch, identical on every process
+        train_loader.sampler.set_epoch(epoch)
+        epoch_samples = 0
+        if epoch == start_epoch and resume_samples:
+            # Continue the interrupted epoch after the samples it already trained on
+            train_loader.sampler.skip(resume_samples)
+            epoch_samples = resume_samples
+        
         # Train
+        epoch_start = time.perf_counter()
+        timer = StepTimer(num_workers)
         train_loss, train_acc = train_epoch(
-            model, train_loader, criterion, optimizer, device
+            runner, train_loader, criterion, optimizer, device, augment, mode, timer, on_step
         )
+        # Over all processes (a resumed epoch trains on fewer samples)
+        samples_per_sec = timer.samples * distributed.world_size() / (time.perf_counter() - epoch_start)
+        step_timing = timer.summary()
         
         # Validate
         val_loss, val_acc = validate(
-            model, val_loader, criterion, device
+            runner, val_loader, criterion, device, mode
         )
         
         # Update learning rate
@@ -232,59 +665,41 @@ def main():
         training_history['train_acc'].append(train_acc)
         training_history['val_loss'].append(val_loss)
         training_history['val_acc'].append(val_acc)
+        training_history['samples_per_sec'].append(samples_per_sec)
+        training_history['step_timing'].append(step_timing)
         
-        print(f'Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%')
+        print(f'Train Loss: {train_loss:.4f}, Train Acc: {train_acc:.2f}%, {samples_per_sec:.1f} samples/sec')
+        print(f'Step time: {step_timing["mean_step_ms"]:.1f} ms, '
+              f'waiting for data {step_timing["data_wait_fraction"]:.0%}, '
+              f'worker utilization {step_timing["worker_utilization"]:.0%}')
         print(f'Val Loss: {val_loss:.4f}, Val Acc: {val_acc:.2f}%')
         
-        # Save best model
-        if val_acc > best_val_acc:
-            best_val_acc = val_acc
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            best_model_path = os.path.join(
-                args.save_dir, 
-                f'best_model_{args.model_type}_{timestamp}.pth'
-            )
-            
-            torch.save({
-                'epoch': epoch,
-                'model_state_dict': model.state_dict(),
-                'optimizer_state_dict': optimizer.state_dict(),
-                'best_val_acc': best_val_acc,
-                'classes': classes,
-                'model_type': args.model_type,
-                'training_args': vars(args)
-            }, best_model_path)
-            
-            print(f'New best model saved: {best_model_path}')
-        
-        # Save checkpoint every 10 epochs
-        if (epoch + 1) % 10 == 0:
-            checkpoint_path = os.path.join(
-                args.save_dir, 
-                f'checkpoint_epoch_{epoch+1}.pth'
-            )
-            torch.save({
-                'epoch': epoch,
-                'model_state_dict': model.state_dict(),
-                'optimizer_state_dict': optimizer.state_dict(),
-                'best_val_acc': best_val_acc,
-                'classes': classes,
-                'model_type': args.model_type,
-                'training_args': vars(args)
-            }, checkpoint_path)
+        # Checkpoint the end of the epoch (also kept as a best model if val_acc ranks)
+        if is_main:
+            is_best = checkpointer.is_best(val_acc)
+            best_val_acc = max(best_val_acc, val_acc)
+            paths = checkpointer.save(training_state(epoch + 1, 0), global_step, metric=val_acc)
+            if is_best:
+                print(f'New best model saved: {paths[-1]}')
+    
+    distributed.cleanup()
+    if not is_main:
+        return
     
     # Save final model
     final_model_path = os.path.join(
         args.save_dir, 
         f'final_model_{args.model_type}.pth'
     )
-    torch.save({
+    checkpointer.write({
         'model_state_dict': model.state_dict(),
         'classes': classes,
         'model_type': args.model_type,
         'training_args': vars(args),
-        'final_val_acc': val_acc
+        'final_val_acc': training_history['val_acc'][-1] if training_history['val_acc'] else None
     }, final_model_path)
+    # Waits for the writes still in flight
+    checkpointer.close()
     
     # Save training history
     history_path = os.path.join(args.save_dir, 'training_history.json')
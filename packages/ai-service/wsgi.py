@@ -0,0 +1,20 @@
+"""
+Production WSGI entry point.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+gunicorn.conf.py enables preload_app, so this module is imported once in the
+master process. The model is loaded here, before workers are forked, so every
+worker shares the same weight pages copy-on-write instead of loading its own copy.
+"""
+
+import gc
+
+from app import app, get_model
+
+get_model()
+
+# Move everything allocated so far into the permanent generation. Otherwise the
+# cyclic GC in each worker writes to these objects' headers and un-shares the pages.
+gc.collect()
+gc.freeze()